@@ -1,10 +1,19 @@
+import collections
 import numpy as np
 import time
 import libdaq
+import libdaq_stream
 from ctypes import *
 from device import *
 # 全局变量用于保存初始化后的设备对象
 device = None
+# 全局采集会话，配置一次后保持连续采样
+session = None
+
+# 块采集结果：data 为 通道数 x 周期数 的float64数组（未四舍五入），
+# timestamp 为第一个周期的主机单调时钟时间（time.perf_counter），sample_index 为第一个周期自采集开始的周期序号，
+# dropped 为此块之前因缓冲区溢出丢弃的采样点数
+AcquisitionFrame = collections.namedtuple('AcquisitionFrame', ['data', 'timestamp', 'sample_index', 'dropped'])
 
 def init_device():
     """初始化DAQ设备，只需执行一次"""
@@ -32,50 +41,100 @@ def init_device():
         print("Device initialized successfully.")
         return device  # 返回设备实例
 
-def adc_sync_acquisition(sample_rate=10000):
-    """从硬件设备同步采集数据，指定采样率，采样周期为1，并返回一维数组"""
-    print("Acquiring hardware data with sample cycle = 1...")
-
-    device = init_device()
-
-    if device is None:
-        raise Exception("Device not initialized. Please call init_device() first.")
-
-    print(f"Acquiring data at {sample_rate} Hz...")
-
-    # 设置采样参数（4个通道）
-    channel_list = [0, 1, 2, 3]
-    samplepara = adc_samplepara()
-    samplepara.channel_list = channel_list
-    samplepara.sample_mode = libdaq.ADC_SAMPLE_MODE_SYNC  # 同步采样模式
-    samplepara.frequency = sample_rate  # 设置采样频率
-    samplepara.cycles = 1  # 采样周期为1
+class AcquisitionSession(object):
+    """
+    持续采集会话：ADC只配置一次并保持连续采样（cycles=0），
+    后台线程不断把数据读入环形缓冲区，每次读取直接返回最新N个周期的数据，不再访问USB
+    """
+
+    def __init__(self, device, channel_list, sample_rate, block_cycles=None, buffer_seconds=2.0):
+        self.channel_list = list(channel_list)
+        self.sample_rate = sample_rate
+        # 默认每次从设备读取约10ms的数据，保证缓冲区中的数据足够新；块采集时每块block_cycles个周期
+        self.block_cycles = block_cycles or max(1, int(sample_rate) // 100)
+        self.stream = libdaq_stream.AdcStream(device.adc, self.channel_list, sample_rate,
+                                              block_cycles=self.block_cycles,
+                                              buffer_seconds=max(buffer_seconds, 2.0 * self.block_cycles / sample_rate))
+
+    def start(self):
+        errorcode = self.stream.start()
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            raise Exception(f"Start acquisition failed, errorcode {errorcode}")
+
+    def stop(self):
+        self.stream.stop()
+
+    @property
+    def running(self):
+        return self.stream.running
+
+    def read_latest(self, cycles=1, timeout=1.0):
+        """
+        返回最新cycles个周期的数据，通道数 x cycles 的二维数组；
+        刚启动时等待数据到达，最多等待timeout秒
+        """
+        deadline = time.perf_counter() + timeout
+        while self.stream.stats()['cycles'] < cycles and self.stream.running and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        return self.stream.latest(cycles)
+
+    def read_block(self, timeout=1.0):
+        """
+        按顺序返回下一块block_cycles个周期的数据（AcquisitionFrame），块之间不重叠也不遗漏；
+        超时或会话已停止时返回None
+        """
+        block = self.stream.read(timeout)
+        if block is None:
+            return None
+        return AcquisitionFrame(block.data, block.timestamp, block.start_cycle, block.dropped)
+
+
+def get_session(sample_rate=10000, channel_list=(0, 1, 2, 3), block_cycles=None):
+    """获取已启动的采集会话，采样率、通道或块长度改变时才重新配置；block_cycles为None时沿用当前会话"""
+    global session
+
+    if session is not None and session.running and session.sample_rate == sample_rate \
+            and session.channel_list == list(channel_list) \
+            and (block_cycles is None or session.block_cycles == block_cycles):
+        return session
+    close_session()
+    session = AcquisitionSession(init_device(), channel_list, sample_rate, block_cycles)
+    session.start()
+    return session
+
+def close_session():
+    """停止采集会话"""
+    global session
+
+    if session is not None:
+        session.stop()
+        session = None
 
-    # 设置软件触发方式并应用采样参数
-    device.adc.select_triggerSrc(libdaq.ADC_TRIG_SRC_SW)
-    device.adc.set_sample_parameter(samplepara)
-
-    # 清除缓冲区并启动采样任务
-    device.adc.clear_buffer()
-    device.adc.start_task()
-    device.adc.send_trigger()  # 发送软件触发信号
-
-    # 计算采样数据长度并读取数据
-    data_len = len(channel_list)  # 每个通道采集一个周期的数据
-    (errorcode, result) = device.adc.read_analog_sync(data_len, 5000)
-
-    # 停止采样任务
-    device.adc.stop_task()
+def adc_sync_acquisition(sample_rate=10000):
+    """从硬件设备获取最新一个周期的数据（4个通道），并返回一维数组"""
+    # 第一次调用时配置并启动连续采样，之后只从缓冲区取最新数据
+    ch_matrix = get_session(sample_rate).read_latest(1)
 
-    # 将所有通道的数据拼接为一个一维数组
-    data = []
-    for ch_index in range(len(channel_list)):
-        ch_data = device.adc.extractChannelData(result, len(channel_list), ch_index)
-        data.extend([round(value, 4) for value in ch_data])
+    # 按通道顺序将所有通道的数据拼接为一个一维数组
+    data = round_values(ch_matrix)
 
     # 返回采集的数据
     return data
 
+def adc_block_acquisition(cycles, sample_rate=10000, channel_list=(0, 1, 2, 3), timeout=1.0):
+    """
+    块采集：一次返回cycles个周期的数据（AcquisitionFrame），data为 通道数 x cycles 的float64数组；
+    连续调用得到首尾相接的数据块，sample_index 可用于检查是否丢块；超时返回None
+    数据不做四舍五入，显示时再调用 round_values
+    """
+    return get_session(sample_rate, channel_list, block_cycles=cycles).read_block(timeout)
+
+def round_values(data, decimals=4):
+    """显示用：四舍五入并按通道顺序展开为一维列表，data可以是数组或AcquisitionFrame"""
+    if isinstance(data, AcquisitionFrame):
+        data = data.data
+    return np.round(data, decimals).ravel().tolist()
+
 def adc_config_channel(device):
     """配置4个通道"""
     ch_range = libdaq.CHANNEL_RANGE_N10V_P10V
@@ -98,4 +157,11 @@ if __name__ == "__main__":
     # 采集数据
     data = adc_sync_acquisition(5000)  # 实际采样率为5 Hz
     for i, value in enumerate(data):
-        print(f"Channel[{i}]: {value}")
\ No newline at end of file
+        print(f"Channel[{i}]: {value}")
+
+    # 块采集：每块1000个周期
+    for n in range(3):
+        frame = adc_block_acquisition(1000, 10000)
+        print(f"Block {frame.sample_index}: shape {frame.data.shape}, time {frame.timestamp:.6f}, "
+              f"mean {round_values(frame.data.mean(axis=1))}")
+    close_session()
\ No newline at end of file
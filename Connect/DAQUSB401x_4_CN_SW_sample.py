@@ -1,9 +1,15 @@
 import numpy as np
 import math
+import threading
+import concurrent.futures
 
 # 初始化全局变量，用于跟踪每个通道的采样时间点
 current_time_points = [0.0, 0.0, 0.0, 0.0]  # 4 个通道的时间点
 
+# 块生成器的全局状态：下一块第一个周期的序号（整数计数，避免浮点时间累加误差）和随机数发生器
+current_block_index = 0
+block_rng = np.random.default_rng()
+
 
 def generate_signal_value(signal_type, t, amplitude=10.0, offset=0.0):
     """
@@ -52,9 +58,163 @@ def adc_sync_acquisition_virtual(duration, signal_type, frequency):
     return new_values
 
 
+def generate_signal_block(signal_type, t, frequency=1.0, amplitude=10.0, phase=0.0, offset=0.0, rng=None):
+    """
+    向量化生成信号：t 为 N x 1 的时间列（秒），frequency/amplitude/phase(弧度)/offset 为标量或每通道一个值，
+    一次调用返回 N x 通道数 的数组
+    """
+    frequency = np.asarray(frequency, dtype=np.float64)
+    amplitude = np.asarray(amplitude, dtype=np.float64)
+    offset = np.asarray(offset, dtype=np.float64)
+    x = t * frequency + np.asarray(phase, dtype=np.float64) / (2 * np.pi)  # 以周期为单位的相位
+
+    if signal_type == 'sine':
+        return amplitude * np.sin(2 * np.pi * x) + offset
+    elif signal_type == 'square':
+        return amplitude * np.sign(np.sin(2 * np.pi * x)) + offset
+    elif signal_type == 'sawtooth':
+        return amplitude * (2 * (x % 1) - 1) + offset
+    elif signal_type == 'triangle':
+        return amplitude * (2 * np.abs(2 * (x % 1) - 1) - 1) + offset
+    elif signal_type == 'random':
+        rng = rng if rng is not None else block_rng
+        return rng.uniform(-1.0, 1.0, np.broadcast(x, amplitude).shape) * amplitude + offset
+    else:
+        raise ValueError(f"Unsupported signal type: {signal_type}")
+
+
+def adc_block_acquisition_virtual(cycles, signal_type, sample_rate, frequency=1.0, amplitude=10.0,
+                                  phase=0.0, noise=0.1, offset=0.0, channels=4):
+    """
+    模拟块采集：一次返回 cycles x 通道数 的数组，连续调用得到首尾相接的数据。
+    frequency(信号频率Hz)、amplitude、phase(弧度)、noise、offset 可以是标量或每通道一个值；
+    noise 为乘性噪声的标准差，与 adc_sync_acquisition_virtual 的缩放系数 N(1.0, 0.1) 相同
+    """
+    global current_block_index
+
+    values = _generate_block(current_block_index, cycles, signal_type, sample_rate, frequency, amplitude,
+                             phase, noise, offset, channels, block_rng, block_rng)
+    current_block_index += cycles
+    return values
+
+
+def _generate_block(first_index, cycles, signal_type, sample_rate, frequency, amplitude, phase, noise, offset,
+                    channels, rng, noise_rng):
+    # 每个周期的时间点，列向量与每通道参数广播
+    index = np.arange(first_index, first_index + cycles, dtype=np.float64)
+    t = (index / sample_rate)[:, np.newaxis]
+
+    values = generate_signal_block(signal_type, t, np.broadcast_to(frequency, (channels,)), amplitude, phase,
+                                   offset, rng)
+
+    # 每个采样点乘以随机缩放系数（模拟噪声）
+    noise = np.asarray(noise, dtype=np.float64)
+    if np.any(noise > 0):
+        values *= 1.0 + noise * noise_rng.standard_normal(values.shape)
+    return values
+
+
+class VirtualDAQ(object):
+    """
+    虚拟采集设备：每个实例有自己的时钟（周期序号）、随机数发生器和通道配置，
+    不使用任何全局状态，多个实例可以在多线程或多进程中同时运行；
+    相同seed和相同读取长度总和得到完全相同的数据，与每次读取的块长度无关
+    """
+
+    def __init__(self, signal_type='sine', sample_rate=10000, channels=4, frequency=1.0, amplitude=10.0,
+                 phase=0.0, noise=0.1, offset=0.0, seed=None):
+        """
+        frequency(信号频率Hz)、amplitude、phase(弧度)、noise、offset 可以是标量或每通道一个值；
+        seed 为整数或 np.random.SeedSequence，None 每次运行结果不同
+        """
+        if signal_type not in ('sine', 'square', 'sawtooth', 'triangle', 'random'):
+            raise ValueError(f"Unsupported signal type: {signal_type}")
+        self.signal_type = signal_type
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.phase = phase
+        self.noise = noise
+        self.offset = offset
+        self.seed = seed
+        self.__lock = threading.Lock()  # 同一实例被多个线程读取时保证数据首尾相接
+        self.reset()
+
+    @property
+    def time(self):
+        """当前虚拟时钟（秒）"""
+        return self.sample_index / self.sample_rate
+
+    def reset(self, seed=None):
+        """时钟归零，重新设置随机数种子；seed为None时使用创建时的种子"""
+        seed = self.seed if seed is None else seed
+        if isinstance(seed, np.random.SeedSequence):
+            sequence = np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key)  # 副本，spawn不改变原种子
+        else:
+            sequence = np.random.SeedSequence(seed)
+        # 信号和噪声使用两个独立的随机数流，结果才与读取块长度无关
+        signal_seed, noise_seed = sequence.spawn(2)
+        with self.__lock:
+            self.rng = np.random.default_rng(signal_seed)
+            self.noise_rng = np.random.default_rng(noise_seed)
+            self.sample_index = 0  # 下一个周期的序号
+
+    def read_block(self, cycles):
+        """返回 cycles x 通道数 的数组，并把时钟推进cycles个周期"""
+        with self.__lock:
+            values = _generate_block(self.sample_index, cycles, self.signal_type, self.sample_rate,
+                                     self.frequency, self.amplitude, self.phase, self.noise, self.offset,
+                                     self.channels, self.rng, self.noise_rng)
+            self.sample_index += cycles
+        return values
+
+    def read_sample(self):
+        """返回每个通道一个值的列表，与 adc_sync_acquisition_virtual 的返回格式相同"""
+        return self.read_block(1)[0].tolist()
+
+
+def _run_scenario(args):
+    # 进程池中执行：按场景参数创建设备并生成cycles个周期
+    scenario, cycles, block_cycles = args
+    device = VirtualDAQ(**scenario)
+    blocks = [device.read_block(min(block_cycles, cycles - n)) for n in range(0, cycles, block_cycles)]
+    return np.concatenate(blocks) if blocks else np.empty((0, device.channels))
+
+
+def run_virtual_batch(scenarios, cycles, seed=0, processes=None, block_cycles=100000):
+    """
+    批量运行无界面的虚拟采集场景，每个场景在进程池中独立生成cycles个周期的数据
+    scenarios: VirtualDAQ参数字典的列表；未指定seed（或seed为None）的场景由seed派生互不相关的独立种子，结果可复现
+    processes: 进程数，None为CPU核数，0在当前进程中顺序执行
+    返回：与scenarios顺序相同的 cycles x 通道数 数组列表
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(scenarios))
+    jobs = [(dict(scenario, seed=child if scenario.get('seed') is None else scenario['seed']), cycles, block_cycles)
+            for scenario, child in zip(scenarios, seeds)]
+    if processes == 0:
+        return [_run_scenario(job) for job in jobs]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_run_scenario, jobs))
+
+
 if __name__ == "__main__":
     # 测试逐次采样，每秒 10 个采样点
     print("Starting SW mode sampling...")
     for _ in range(10):  # 采样 10 次
         data = adc_sync_acquisition_virtual(1, 'sine', 10)
         print(f"Sampled data: {data}")
+
+    # 块生成：每块10000个周期，4个通道使用不同的频率和相位
+    block = adc_block_acquisition_virtual(10000, 'sine', 200000, frequency=[1, 2, 5, 10],
+                                          phase=[0, np.pi / 2, np.pi, 0])
+    print(f"Block shape: {block.shape}")
+
+    # 实例化的虚拟设备：相同种子得到相同数据
+    results = run_virtual_batch([{'signal_type': 'sine', 'sample_rate': 10000},
+                                 {'signal_type': 'square', 'sample_rate': 10000, 'frequency': [1, 2, 3, 4]}],
+                                10000, seed=42)
+    again = run_virtual_batch([{'signal_type': 'sine', 'sample_rate': 10000},
+                               {'signal_type': 'square', 'sample_rate': 10000, 'frequency': [1, 2, 3, 4]}],
+                              10000, seed=42, processes=0)
+    print(f"Batch reproducible: {all(np.array_equal(a, b) for a, b in zip(results, again))}")
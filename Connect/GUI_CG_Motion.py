@@ -1,12 +1,12 @@
+import os
 import sys
 import numpy as np
-import pandas as pd
 import time
 from datetime import datetime
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QWidget, QGridLayout, QSpinBox, QComboBox, QLineEdit, QFileDialog
+    QWidget, QGridLayout, QSpinBox, QComboBox, QLineEdit, QFileDialog, QCheckBox
 )
 from PyQt5.QtCore import QTimer, Qt
 from PyQt5.QtGui import QFont, QResizeEvent, QPalette, QColor
@@ -15,8 +15,9 @@ import pyqtgraph as pg
 from pyqtgraph import ArrowItem  # 在顶部导入 ArrowItem
 
 # from DAQ.Zishu_DAQ.USB_4010.DAQUSB401x_4_CN_HW_sample import init_device
-from DAQUSB401x_4_CN_SW_sample import adc_sync_acquisition_virtual
-from DAQUSB401x_4_CN_HW_sample import adc_sync_acquisition, init_device
+from DAQUSB401x_4_CN_HW_sample import init_device
+import libdaq_replay
+from acquisition_worker import AcquisitionWorker, SampleHistory, HARDWARE_MODE, SOFTWARE_MODE, REPLAY_MODE
 from Lab import Force_Sum
 
 
@@ -24,15 +25,18 @@ class DAQRealTimeApp(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.channel_data = {i: [] for i in range(4)}
+        self.history = SampleHistory(4)  # 显示用的历史数据（点数有上限，长时间采集时抽取）
+        self.record_path = None  # 最近一次全速率录制文件（.npy），导出时使用
         self.cg_data = []
         self.timestamp_data = []
-        self.sample_times = []
         self.sampling_rate = 10
+        self.refresh_rate = 30  # 界面刷新帧率（FPS）
         self.elapsed_time = 0
-        self.mode = "Software Mode"  # 默认模式
+        self.mode = SOFTWARE_MODE  # 默认模式
         self.timer_duration = None
         self.is_running = False
+        self.worker = None  # 采集线程
+        self.timer = None
 
         self.width = 2.0
         self.height = 2.0
@@ -58,7 +62,7 @@ class DAQRealTimeApp(QMainWindow):
 
         # 模式选择
         self.mode_selector = QComboBox(self)
-        self.mode_selector.addItems(["Software Mode", "Hardware Mode"])
+        self.mode_selector.addItems([SOFTWARE_MODE, HARDWARE_MODE, REPLAY_MODE])
         self.mode_selector.currentIndexChanged.connect(self.change_mode)
         control_layout.addWidget(QLabel('Select Mode:', self), 0, 0)
         control_layout.addWidget(self.mode_selector, 0, 1)
@@ -104,6 +108,17 @@ class DAQRealTimeApp(QMainWindow):
         control_layout.addWidget(QLabel('Rectangle Height (m):', self), 6, 0)
         control_layout.addWidget(self.height_input, 6, 1)
 
+        # 界面刷新帧率，与采样率无关
+        self.fps_input = QSpinBox(self)
+        self.fps_input.setRange(1, 60)
+        self.fps_input.setValue(self.refresh_rate)
+        control_layout.addWidget(QLabel('Refresh Rate (FPS):', self), 7, 0)
+        control_layout.addWidget(self.fps_input, 7, 1)
+
+        # 全速率数据写入磁盘（.npy），导出时使用；不勾选时只能导出显示用的抽取数据
+        self.record_checkbox = QCheckBox('Record Full Rate', self)
+        control_layout.addWidget(self.record_checkbox, 8, 0, 1, 2)
+
         left_layout.addLayout(control_layout)
 
         # 状态显示（带颜色）
@@ -112,6 +127,11 @@ class DAQRealTimeApp(QMainWindow):
         self.status_label.setAlignment(Qt.AlignCenter)
         left_layout.addWidget(self.status_label)
 
+        # 实际采样率和丢帧统计
+        self.rate_label = QLabel('Rate: -- Sa/s  Dropped: --', self)
+        self.rate_label.setAlignment(Qt.AlignCenter)
+        left_layout.addWidget(self.rate_label)
+
         # Channel Data 标签布局
         channel_data_layout = QGridLayout()
         for i in range(4):
@@ -169,6 +189,9 @@ class DAQRealTimeApp(QMainWindow):
         self.data_plot.setBackground('k')
         self.data_plot.showGrid(x=True, y=True)
         self.data_plot.addLegend()
+        # 长时间采集时只绘制可见部分并按像素降采样
+        self.data_plot.setClipToView(True)
+        self.data_plot.setDownsampling(auto=True, mode='peak')
 
         # 设置 X 和 Y 轴的标签和字体
         self.data_plot.setLabel('left', 'Amplitude', **self.get_font_style())
@@ -228,11 +251,11 @@ class DAQRealTimeApp(QMainWindow):
         self.mode = mode
         self.status_label.setText(f"Mode: {mode}")
 
-        # 禁用或启用信号类型选择
-        if mode == "Hardware Mode":
-            self.signal_type_selector.setEnabled(False)
-        else:
+        # 禁用或启用信号类型选择（只有软件模式使用）
+        if mode == SOFTWARE_MODE:
             self.signal_type_selector.setEnabled(True)
+        else:
+            self.signal_type_selector.setEnabled(False)
 
     def update_cg_range(self):
         """根据宽度和高度调整CG窗口的比例和坐标范围"""
@@ -294,35 +317,63 @@ class DAQRealTimeApp(QMainWindow):
             # 获取采样率和持续时间
             self.sampling_rate = self.freq_input.value()
             self.timer_duration = self.duration_input.value() or 3600  # 默认为 1 小时
+            self.refresh_rate = self.fps_input.value()
+
+            # 回放模式选择录制文件（export_data导出的CSV或.npy）
+            replay_path = None
+            if self.mode == REPLAY_MODE:
+                replay_path, _ = QFileDialog.getOpenFileName(self, "Open Recording", "",
+                                                             "Recording (*.csv *.npy)")
+                if not replay_path:
+                    return
+
+            # 全速率录制文件
+            record_path = None
+            if self.record_checkbox.isChecked():
+                record_path, _ = QFileDialog.getSaveFileName(self, "Save Recording", "Recording.npy",
+                                                             "Recording (*.npy)")
+                if not record_path:
+                    return
+                self.record_path = record_path
+
+            # 采集和计算在采集线程中进行，数据块通过队列送给界面
+            self.worker = AcquisitionWorker(self.mode, self.sampling_rate, self.signal_type_selector.currentText(),
+                                            width=self.width, height=self.height, replay_path=replay_path,
+                                            time_offset=self.elapsed_time, record_path=record_path)
+            self.worker.start()
 
-            # 清空数据
             self.is_running = True
             self.update_status_color('green')
             self.status_label.setText(f'Status: Running ({self.mode})')
 
-            # 根据采样率设置定时器
+            # 界面按固定帧率刷新
             self.timer = QTimer()
             self.timer.timeout.connect(self.update_data)
-            interval = int( 1000 / self.sampling_rate)  # 采样间隔（毫秒）
-            self.timer.start(interval)
+            self.timer.start(int(1000 / self.refresh_rate))
 
             # 如果 duration 为 0，表示无限采样
             if self.timer_duration > 0:
                 # 在指定时长后自动停止采样
                 QTimer.singleShot(self.timer_duration * 1000, self.stop_acquisition)
 
-            # 立即更新一次数据，确保开始时有数据
-            self.update_data()
-
     def stop_acquisition(self):
         self.update_status_color('red')
         self.status_label.setText('Status: Stopped')
-        self.timer.stop()
+        if self.timer is not None:
+            self.timer.stop()
         self.is_running = False
+        if self.worker is not None:
+            # 停止采集线程（硬件模式同时停止连续采样），等待有上限，界面不会卡住
+            if not self.worker.stop(timeout=2.0):
+                self.status_label.setText('Status: Stopped (worker not responding)')
+                return
+            self.update_data()  # 显示队列中剩余的数据
+            if self.worker.error is not None:
+                self.status_label.setText(f'Status: Stopped ({self.worker.error})')
 
     def clear_data(self):
-        self.channel_data = {i: [] for i in range(4)}
-        self.sample_times.clear()
+        self.history.clear()
+        self.record_path = None
         self.elapsed_time = 0
         for curve in self.data_curves.values():
             curve.clear()
@@ -353,59 +404,41 @@ class DAQRealTimeApp(QMainWindow):
         return np.linalg.norm(delta_px)
 
     def update_data(self):
-        """根据所选模式更新数据，并计算重心位置"""
-        # 从用户输入的控件中获取采样时长和频率
-        sampling_rate = self.freq_input.value()
-        duration = self.duration_input.value() or 3600  # 默认为 1 小时
-        forward_avg_time = self.forward_avg_input.value()  # 获取前向平均时间
-
-        # 根据所选模式更新数据
-        if self.mode == "Hardware Mode":
-            # 从硬件采集最新数据
-            data = adc_sync_acquisition(sampling_rate)
-        else:
-            # 从虚拟采集函数获取当前时间点的最新数据
-            data = adc_sync_acquisition_virtual(1, self.signal_type_selector.currentText(), sampling_rate)
-
-        sampling_rate = self.freq_input.value()  # 获取采样率
-        sampling_interval = 1.0 / sampling_rate  # 每次采样的时间间隔 (秒)
-
-        # 更新时间戳并记录时间序列（x轴为时间）
-        self.elapsed_time += sampling_interval
-        self.sample_times.append(self.elapsed_time)
-
-        map = [195.7555170, 198.2143588, 196.2374373, 192.8436289]
-        Force_Sum = sum(d * m for d, m in zip(data, map))
+        """按界面帧率取出采集线程送来的数据块，更新曲线、标签和重心位置"""
+        if self.worker is None:
+            return
+        self.update_rate_label()
+        blocks = self.worker.get_blocks()
+        if not blocks:
+            # 采集线程结束（回放结束或出错）时自动停止
+            if self.is_running and not self.worker.is_alive():
+                self.stop_acquisition()
+            return
+
+        for block in blocks:
+            self.history.append(block.times, block.values)
+        latest = blocks[-1]
+        self.elapsed_time = latest.times[-1]
+        times = self.history.times
+        values = self.history.values
+
+        # 前向平均（按全速率数据块计算，与显示抽取无关）
+        forward_avg_time = self.forward_avg_input.value()  # 前向平均时间
+        avg_values = self.history.mean(max(1, int(forward_avg_time * self.worker.sample_rate)))
 
         # 更新每个通道的数据和曲线
         for i in range(4):
-
-            value = data[i] * map[i]  # 获取最新数据点的值
-            self.channel_data[i].append(value)  # 将新值加入通道数据
+            value = latest.values[-1, i]  # 最新数据点的值
 
             # 更新数据标签和曲线
             self.data_labels[i].setText(f"Channel {i} Data: {value:.12f}")
-            self.data_curves[i].setData(self.sample_times, self.channel_data[i])
-
-            # 计算前向平均值
-            forward_avg_time = self.forward_avg_input.value()  # 前向平均时间
-            samples_to_avg = int(forward_avg_time * sampling_rate)
-            samples_to_avg = min(samples_to_avg, len(self.channel_data[i]))  # 避免数组越界
+            self.data_curves[i].setData(times, values[:, i])
 
-            avg_value = np.mean(self.channel_data[i][-samples_to_avg:])  # 计算平均值
+            avg_value = avg_values[i]
             self.avg_labels[i].setText(f"Channel {i} Avg: {avg_value:.12f}")
 
-        # 定义每个通道的物理位置
-        positions = np.array([
-            [-self.width / 2, -self.height / 2],  # 通道 0 的位置（左下）
-            [self.width / 2, -self.height / 2],  # 通道 1 的位置（右下）
-            [-self.width / 2, self.height / 2],  # 通道 2 的位置（左上）
-            [self.width / 2, self.height / 2]  # 通道 3 的位置（右上）
-        ])
-
-        # 使用通道数据计算加权重心
-        sensor_values = np.array(data)  # 假设 data 是 [value1, value2, value3, value4]
-        cg = np.average(positions, axis=0, weights=sensor_values)
+        # 最新一个周期的重心（采集线程中已按通道位置加权计算）
+        cg = latest.cg[-1]
 
         # 计算上次重心位置与当前重心位置的物理距离
         delta = cg - self.previous_position
@@ -438,14 +471,29 @@ class DAQRealTimeApp(QMainWindow):
         # 将当前重心位置保存为上次位置
         self.previous_position = cg
 
+    def update_rate_label(self):
+        """显示实际采样率和丢帧数"""
+        stats = self.worker.stats()
+        self.rate_label.setText(f"Rate: {stats['rate']:.0f} Sa/s  Dropped: {stats['dropped_frames']} frames, "
+                                f"{stats['dropped_samples']} samples")
+
     def export_data(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Data", "Sample.csv", "CSV (*.csv)")
+        if not path:
+            return
+        if self.record_path is not None and os.path.exists(self.record_path):
+            # 导出最近一次全速率录制（逐块写出，不占用内存）
+            libdaq_replay.export_csv(self.record_path, path)
+            return
+
+        import pandas as pd  # 仅导出时使用，避免拖慢程序启动
+
+        # 没有录制时导出显示用的历史数据（长时间采集时为抽取后的数据）
         df = pd.DataFrame({
-            'Timestamp': self.sample_times,
-            **{f'Channel {i}': self.channel_data[i] for i in range(4)}
+            'Timestamp': self.history.times,
+            **{f'Channel {i}': self.history.values[:, i] for i in range(4)}
         })
-        path, _ = QFileDialog.getSaveFileName(self, "Save Data", "Sample.csv", "CSV (*.csv)")
-        if path:
-            df.to_csv(path, index=False)
+        df.to_csv(path, index=False)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
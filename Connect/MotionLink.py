@@ -1,15 +1,14 @@
+import os
 import sys
 import numpy as np
-import pandas as pd
 import time
 import socket
 import struct
-import matplotlib.pyplot as plt
 from datetime import datetime
 from PyQt5 import QtCore
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QWidget, QGridLayout, QSpinBox, QComboBox, QLineEdit, QFileDialog
+    QWidget, QGridLayout, QSpinBox, QComboBox, QLineEdit, QFileDialog, QCheckBox
 )
 from PyQt5.QtCore import QTimer, Qt
 from PyQt5.QtGui import QFont, QResizeEvent, QPalette, QColor
@@ -18,23 +17,27 @@ import pyqtgraph as pg
 from pyqtgraph import ArrowItem  # 在顶部导入 ArrowItem
 
 # from DAQ.Zishu_DAQ.USB_4010.DAQUSB401x_4_CN_HW_sample import init_device
-from DAQUSB401x_4_CN_SW_sample import adc_sync_acquisition_virtual
-from DAQUSB401x_4_CN_HW_sample import adc_sync_acquisition, init_device
+from DAQUSB401x_4_CN_HW_sample import init_device
+import libdaq_replay
+from acquisition_worker import AcquisitionWorker, SampleHistory, HARDWARE_MODE, SOFTWARE_MODE, REPLAY_MODE
 
 
 class Real_Time_Simulation(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        self.channel_data = {i: [] for i in range(4)}
+        self.history = SampleHistory(4)  # 显示用的历史数据（点数有上限，长时间采集时抽取）
+        self.record_path = None  # 最近一次全速率录制文件（.npy），导出时使用
         self.cg_data = []
         self.timestamp_data = []
-        self.sample_times = []
         self.sampling_rate = 10
+        self.refresh_rate = 30  # 界面刷新帧率（FPS）
         self.elapsed_time = 0
-        self.mode = "Software Mode"  # 默认模式
+        self.mode = SOFTWARE_MODE  # 默认模式
         self.timer_duration = None
         self.is_running = False
+        self.worker = None  # 采集线程
+        self.timer = None
 
         self.width = 2.0
         self.height = 2.0
@@ -51,6 +54,7 @@ class Real_Time_Simulation(QMainWindow):
         self.e = [0]
         self.integral_e = [0]
         self.u_discrete = [0]
+        self.a_heave_data = []
 
         self.m = 10
         self.k = 1000
@@ -83,7 +87,7 @@ class Real_Time_Simulation(QMainWindow):
 
         # 模式选择
         self.mode_selector = QComboBox(self)
-        self.mode_selector.addItems(["Software Mode", "Hardware Mode"])
+        self.mode_selector.addItems([SOFTWARE_MODE, HARDWARE_MODE, REPLAY_MODE])
         self.mode_selector.currentIndexChanged.connect(self.change_mode)
         control_layout.addWidget(QLabel('Select Mode:', self), 0, 0)
         control_layout.addWidget(self.mode_selector, 0, 1)
@@ -129,6 +133,22 @@ class Real_Time_Simulation(QMainWindow):
         control_layout.addWidget(QLabel('Rectangle Height (m):', self), 6, 0)
         control_layout.addWidget(self.height_input, 6, 1)
 
+        # 界面刷新帧率，与采样率和控制周期无关
+        self.fps_input = QSpinBox(self)
+        self.fps_input.setRange(1, 60)
+        self.fps_input.setValue(self.refresh_rate)
+        control_layout.addWidget(QLabel('Refresh Rate (FPS):', self), 7, 0)
+        control_layout.addWidget(self.fps_input, 7, 1)
+
+        # 平台控制（需要运动控制器在线），默认只在硬件模式下开启
+        self.control_checkbox = QCheckBox('Platform Control', self)
+        self.control_checkbox.setChecked(self.mode == HARDWARE_MODE)
+        control_layout.addWidget(self.control_checkbox, 8, 0, 1, 2)
+
+        # 全速率数据写入磁盘（.npy），导出时使用；不勾选时只能导出显示用的抽取数据
+        self.record_checkbox = QCheckBox('Record Full Rate', self)
+        control_layout.addWidget(self.record_checkbox, 9, 0, 1, 2)
+
         left_layout.addLayout(control_layout)
 
         # 状态显示（带颜色）
@@ -137,6 +157,11 @@ class Real_Time_Simulation(QMainWindow):
         self.status_label.setAlignment(Qt.AlignCenter)
         left_layout.addWidget(self.status_label)
 
+        # 实际采样率和丢帧统计
+        self.rate_label = QLabel('Rate: -- Sa/s  Dropped: --', self)
+        self.rate_label.setAlignment(Qt.AlignCenter)
+        left_layout.addWidget(self.rate_label)
+
         # Channel Data 标签布局
         channel_data_layout = QGridLayout()
         for i in range(4):
@@ -209,6 +234,9 @@ class Real_Time_Simulation(QMainWindow):
         self.data_plot.setBackground('k')
         self.data_plot.showGrid(x=True, y=True)
         self.data_plot.addLegend()
+        # 长时间采集时只绘制可见部分并按像素降采样
+        self.data_plot.setClipToView(True)
+        self.data_plot.setDownsampling(auto=True, mode='peak')
 
         # 设置 X 和 Y 轴的标签和字体
         self.data_plot.setLabel('left', 'Amplitude', **self.get_font_style())
@@ -268,11 +296,14 @@ class Real_Time_Simulation(QMainWindow):
         self.mode = mode
         self.status_label.setText(f"Mode: {mode}")
 
-        # 禁用或启用信号类型选择
-        if mode == "Hardware Mode":
-            self.signal_type_selector.setEnabled(False)
-        else:
+        # 禁用或启用信号类型选择（只有软件模式使用）
+        if mode == SOFTWARE_MODE:
             self.signal_type_selector.setEnabled(True)
+        else:
+            self.signal_type_selector.setEnabled(False)
+
+        # 软件模式和回放模式默认不控制平台
+        self.control_checkbox.setChecked(mode == HARDWARE_MODE)
 
     def update_cg_range(self):
         """根据宽度和高度调整CG窗口的比例和坐标范围"""
@@ -333,35 +364,65 @@ class Real_Time_Simulation(QMainWindow):
             # 获取采样率和持续时间
             self.sampling_rate = self.freq_input.value()
             self.timer_duration = self.duration_input.value() or 3600  # 默认为 1 小时
+            self.refresh_rate = self.fps_input.value()
+
+            # 回放模式选择录制文件（export_data导出的CSV或.npy）
+            replay_path = None
+            if self.mode == REPLAY_MODE:
+                replay_path, _ = QFileDialog.getOpenFileName(self, "Open Recording", "",
+                                                             "Recording (*.csv *.npy)")
+                if not replay_path:
+                    return
+
+            # 全速率录制文件
+            record_path = None
+            if self.record_checkbox.isChecked():
+                record_path, _ = QFileDialog.getSaveFileName(self, "Save Recording", "Recording.npy",
+                                                             "Recording (*.npy)")
+                if not record_path:
+                    return
+                self.record_path = record_path
+
+            # 采集、计算和平台控制（勾选时）在采集线程中进行，每块 dt_discrete 秒执行一次控制
+            process = self.control_step if self.control_checkbox.isChecked() else None
+            self.worker = AcquisitionWorker(self.mode, self.sampling_rate, self.signal_type_selector.currentText(),
+                                            block_seconds=self.dt_discrete, width=self.width, height=self.height,
+                                            replay_path=replay_path, time_offset=self.elapsed_time,
+                                            process=process, record_path=record_path)
+            self.worker.start()
 
-            # 清空数据
             self.is_running = True
             self.update_status_color('green')
             self.status_label.setText(f'Status: Running ({self.mode})')
 
-            # 根据采样率设置定时器
+            # 界面按固定帧率刷新
             self.timer = QTimer()
             self.timer.timeout.connect(self.update_data)
-            interval = int(1000 / self.sampling_rate)  # 采样间隔（毫秒）
-            self.timer.start(interval)
+            self.timer.start(int(1000 / self.refresh_rate))
 
             # 如果 duration 为 0，表示无限采样
             if self.timer_duration > 0:
                 # 在指定时长后自动停止采样
                 QTimer.singleShot(self.timer_duration * 1000, self.stop_acquisition)
 
-            # 立即更新一次数据，确保开始时有数据
-            self.update_data()
-
     def stop_acquisition(self):
         self.update_status_color('red')
         self.status_label.setText('Status: Stopped')
-        self.timer.stop()
+        if self.timer is not None:
+            self.timer.stop()
         self.is_running = False
+        if self.worker is not None:
+            # 停止采集线程（硬件模式同时停止连续采样），等待有上限，界面不会卡住
+            if not self.worker.stop(timeout=2.0):
+                self.status_label.setText('Status: Stopped (worker not responding)')
+                return
+            self.update_data()  # 显示队列中剩余的数据
+            if self.worker.error is not None:
+                self.status_label.setText(f'Status: Stopped ({self.worker.error})')
 
     def clear_data(self):
-        self.channel_data = {i: [] for i in range(4)}
-        self.sample_times.clear()
+        self.history.clear()
+        self.record_path = None
         self.elapsed_time = 0
         for curve in self.data_curves.values():
             curve.clear()
@@ -392,62 +453,41 @@ class Real_Time_Simulation(QMainWindow):
         return np.linalg.norm(delta_px)
 
     def update_data(self):
-        """根据所选模式更新数据，并计算重心位置"""
-        # 从用户输入的控件中获取采样时长和频率
-        sampling_rate = self.freq_input.value()
-        duration = self.duration_input.value() or 3600  # 默认为1小时
-        forward_avg_time = self.forward_avg_input.value()  # 获取前向平均时间
-
-        # 根据所选模式更新数据
-        if self.mode == "Hardware Mode":
-            # 从硬件采集最新数据
-            data = adc_sync_acquisition(sampling_rate)
-        else:
-            # 从虚拟采集函数获取当前时间点的最新数据
-            data = adc_sync_acquisition_virtual(1, self.signal_type_selector.currentText(), sampling_rate)
-
-        sampling_rate = self.freq_input.value()  # 获取采样率
-        sampling_interval = 1.0 / sampling_rate  # 每次采样的时间间隔 (秒)
-
-        # 更新时间戳并记录时间序列（x轴为时间）
-        self.elapsed_time += sampling_interval
-        self.sample_times.append(self.elapsed_time)
+        """按界面帧率取出采集线程送来的数据块，更新曲线、标签和重心位置"""
+        if self.worker is None:
+            return
+        self.update_rate_label()
+        blocks = self.worker.get_blocks()
+        if not blocks:
+            # 采集线程结束（回放结束或出错）时自动停止
+            if self.is_running and not self.worker.is_alive():
+                self.stop_acquisition()
+            return
+
+        for block in blocks:
+            self.history.append(block.times, block.values)
+        latest = blocks[-1]
+        self.elapsed_time = latest.times[-1]
+        times = self.history.times
+        values = self.history.values
+
+        # 前向平均（按全速率数据块计算，与显示抽取无关）
+        forward_avg_time = self.forward_avg_input.value()  # 前向平均时间
+        avg_values = self.history.mean(max(1, int(forward_avg_time * self.worker.sample_rate)))
 
-        map = [195.7555170, 198.2143588, 196.2374373, 192.8436289]
-        Force_Sum = sum(d * m for d, m in zip(data, map))
-
-        # 新增逻辑，初始化Initial_Force_Sum
-        if self.Initial_Force_Sum is None:
-            self.Initial_Force_Sum = Force_Sum
-        self.platform_mass = abs(self.initial_F_discrete / 9.81)
         # 更新每个通道的数据和曲线
         for i in range(4):
-            value = data[i] * map[i]  # 获取最新数据点的值
-            self.channel_data[i].append(value)  # 将新值加入通道数据
+            value = latest.values[-1, i]  # 最新数据点的值
 
             # 更新数据标签和曲线
             self.data_labels[i].setText(f"Channel {i} Data: {value:.12f}")
-            self.data_curves[i].setData(self.sample_times, self.channel_data[i])
+            self.data_curves[i].setData(times, values[:, i])
 
-            # 计算前向平均值
-            forward_avg_time = self.forward_avg_input.value()  # 前向平均时间
-            samples_to_avg = int(forward_avg_time * sampling_rate)
-            samples_to_avg = min(samples_to_avg, len(self.channel_data[i]))  # 避免数组越界
-
-            avg_value = np.mean(self.channel_data[i][-samples_to_avg:])  # 计算平均值
+            avg_value = avg_values[i]
             self.avg_labels[i].setText(f"Channel {i} Avg: {avg_value:.12f}")
 
-        # 定义每个通道的物理位置
-        positions = np.array([
-            [-self.width / 2, -self.height / 2],  # 通道0的位置（左下）
-            [self.width / 2, -self.height / 2],  # 通道1的位置（右下）
-            [-self.width / 2, self.height / 2],  # 通道2的位置（左上）
-            [self.width / 2, self.height / 2]  # 通道3的位置（右上）
-        ])
-
-        # 使用通道数据计算加权重心
-        sensor_values = np.array(data)  # 假设data是 [value1, value2, value3, value4]
-        cg = np.average(positions, axis=0, weights=sensor_values)
+        # 最新一个周期的重心（采集线程中已按通道位置加权计算）
+        cg = latest.cg[-1]
 
         # 计算上次重心位置与当前重心位置的物理距离
         delta = cg - self.previous_position
@@ -480,9 +520,30 @@ class Real_Time_Simulation(QMainWindow):
         # 将当前重心位置保存为上次位置
         self.previous_position = cg
 
-        attitudes = self.receive_status()
-        a_heave = self.calculate_heave_acceleration(attitudes)
-        print(f"a_heave at {self.elapsed_time:.3f}s: {a_heave}")
+        # 更新控制结果标签（最新一个控制周期，未开启平台控制时没有结果）
+        result = latest.result
+        if result is None:
+            return
+        self.Force_sum_label.setText(f"Force Sum: {result['force_sum']:.12f} N")
+        self.pid_output_label.setText(f"PID Output: {result['pid_output']:.12f}")
+        if result['attitudes'] is not None:
+            self.attitude_5_label.setText(f"Attitude[5]: {result['attitudes'][5]:.12f}")
+
+    def control_step(self, block):
+        """
+        在采集线程中对每个数据块（dt_discrete 秒）执行一次控制：
+        合力 -> 虚拟力 -> 弹簧模型 -> PID -> 平台 heave 指令
+        返回标签显示的 force_sum、pid_output 和 attitudes
+        """
+        Force_Sum = float(np.mean(block.force_sum))  # 控制周期内的平均合力
+
+        # 新增逻辑，初始化Initial_Force_Sum
+        if self.Initial_Force_Sum is None:
+            self.Initial_Force_Sum = Force_Sum
+        self.platform_mass = abs(self.Initial_Force_Sum / 9.81)
+
+        attitudes = receive_status()
+        a_heave = self.calculate_heave_acceleration(attitudes) if attitudes is not None else 0.0
         self.a_heave_data.append(a_heave)
 
         virtual_force = self.calculate_virtual_force(a_heave)
@@ -490,20 +551,33 @@ class Real_Time_Simulation(QMainWindow):
         F_change = Force_Sum - self.Initial_Force_Sum + virtual_force
         spring_output = self.Spring(F_change)
         pid_output = self.pid_control(spring_output)
-        self.follow_mode(0, 0, 0, 0, 0, 0.5 * pid_output)
-
-        # 更新 Force_Sum 标签
-        Force_Sum = sum(d * m for d, m in zip(data, map))
-        self.Force_sum_label.setText(f"Force Sum: {Force_Sum:.12f} N")
-
-        # 更新 pid_output 标签
-        pid_output = self.pid_control(spring_output)
-        self.pid_output_label.setText(f"PID Output: {pid_output:.12f}")
-
-        # 更新 attitudes[5] 标签
-        attitudes = self.receive_status()
-        if attitudes is not None:
-            self.attitude_5_label.setText(f"Attitude[5]: {attitudes[5]:.12f}")
+        follow_mode(0, 0, 0, 0, 0, 0.5 * pid_output)
+
+        return {'force_sum': Force_Sum, 'pid_output': pid_output, 'attitudes': attitudes}
+
+    def update_rate_label(self):
+        """显示实际采样率和丢帧数"""
+        stats = self.worker.stats()
+        self.rate_label.setText(f"Rate: {stats['rate']:.0f} Sa/s  Dropped: {stats['dropped_frames']} frames, "
+                                f"{stats['dropped_samples']} samples")
+
+    def export_data(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Data", "Sample.csv", "CSV (*.csv)")
+        if not path:
+            return
+        if self.record_path is not None and os.path.exists(self.record_path):
+            # 导出最近一次全速率录制（逐块写出，不占用内存）
+            libdaq_replay.export_csv(self.record_path, path)
+            return
+
+        import pandas as pd  # 仅导出时使用，避免拖慢程序启动
+
+        # 没有录制时导出显示用的历史数据（长时间采集时为抽取后的数据）
+        df = pd.DataFrame({
+            'Timestamp': self.history.times,
+            **{f'Channel {i}': self.history.values[:, i] for i in range(4)}
+        })
+        df.to_csv(path, index=False)
 
     def calculate_virtual_force(self, a_heave):
         """
@@ -526,9 +600,6 @@ class Real_Time_Simulation(QMainWindow):
             self.last_attitudes.pop(0)  # 移除最早的一个姿态值
             self.last_attitudes.append(attitudes)  # 添加最新的姿态值
 
-            # 调试信息
-            print(f"last_attitudes: {self.last_attitudes}")
-
             # 计算加速度
             delta_attitude_1 = [self.last_attitudes[1][5] - self.last_attitudes[0][5]]
             delta_attitude_2 = [self.last_attitudes[2][5] - self.last_attitudes[1][5]]
@@ -611,8 +682,10 @@ USER_IP = "192.168.0.131"
 USER_PORT = 10000
 CONTROLLER_IP = "192.168.0.125"
 CONTROLLER_PORT = 5000
+STATUS_TIMEOUT = 0.005  # 等待状态回复的最长时间（秒），小于一个控制周期
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.bind((USER_IP, USER_PORT))
+sock.settimeout(STATUS_TIMEOUT)  # 控制器不在线时采集线程不会阻塞
 
 
 def send_command(command):
@@ -622,7 +695,8 @@ def send_command(command):
         print(f"Error sending command: {e}")
 
 
-def receive_status():
+def receive_status(verbose=False):
+    """接收平台状态，返回姿态数组；超时或出错返回None；verbose为True时打印全部状态（调试用）"""
     try:
         data, addr = sock.recvfrom(408)
         id_, status, di, rev1, *rest, version, timestamp = struct.unpack('<BBBB 6f 6f 6f 6f II', data)
@@ -637,18 +711,21 @@ def receive_status():
         motor_codes = motor_codes[:6]
         torques = torques[:6]
 
-        print("接收到状态信息:")
-        print("标识位:", id_)
-        print("当前状态:", status)
-        print("数字输入:", di)
-        print("保留位:", rev1)
-        print("实际姿态:", attitudes)
-        print("错误代码:", error_codes)
-        print("电机码值:", motor_codes)
-        print("电机力矩:", torques)
-        print("固件版本:", version)
-        print("时间戳:", timestamp)
+        if verbose:
+            print("接收到状态信息:")
+            print("标识位:", id_)
+            print("当前状态:", status)
+            print("数字输入:", di)
+            print("保留位:", rev1)
+            print("实际姿态:", attitudes)
+            print("错误代码:", error_codes)
+            print("电机码值:", motor_codes)
+            print("电机力矩:", torques)
+            print("固件版本:", version)
+            print("时间戳:", timestamp)
         return attitudes  # 返回姿态数组
+    except socket.timeout:
+        return None  # 控制器没有回复
     except (socket.error) as e:
         print(f"Error receiving status: {e}")
         return None
@@ -0,0 +1,316 @@
+import collections
+import os
+import queue
+import threading
+import time
+import numpy as np
+import libdaq_replay
+from DAQUSB401x_4_CN_SW_sample import VirtualDAQ
+from DAQUSB401x_4_CN_HW_sample import get_session, close_session
+
+# 采集模式（与界面中模式选择框的文字相同）
+SOFTWARE_MODE = "Software Mode"
+HARDWARE_MODE = "Hardware Mode"
+REPLAY_MODE = "Replay Mode"
+
+# 四个称重传感器 电压->力 的换算系数（与 update_data 中的 map 相同）
+FORCE_MAP = np.array([195.7555170, 198.2143588, 196.2374373, 192.8436289])
+
+# 采集线程送给界面的数据块：
+# times: n个周期的时间（秒），raw: n x 4 原始电压，values: n x 4 换算后的力，force_sum: 每个周期的合力，
+# cg: n x 2 每个周期的重心，sample_index: 第一个周期的序号，dropped: 此块之前设备丢失的采样点数，
+# result: process 回调的返回值
+AcquisitionBlock = collections.namedtuple('AcquisitionBlock', ['times', 'raw', 'values', 'force_sum', 'cg',
+                                                               'sample_index', 'dropped', 'result'])
+
+
+def sensor_positions(width, height):
+    """四个通道的物理位置：左下、右下、左上、右上"""
+    return np.array([
+        [-width / 2, -height / 2],
+        [width / 2, -height / 2],
+        [-width / 2, height / 2],
+        [width / 2, height / 2]
+    ])
+
+
+def compute_cg(raw, width, height):
+    """向量化计算每个周期以通道数据为权重的重心，n x 4 -> n x 2；权重和为0的周期重心为原点"""
+    total = raw.sum(axis=1)
+    safe = np.where(total == 0, 1.0, total)
+    cg = raw @ sensor_positions(width, height) / safe[:, np.newaxis]
+    cg[total == 0] = 0.0
+    return cg
+
+
+class SampleHistory(object):
+    """
+    界面显示用的历史数据，内存有上限：保存的点数超过 max_points 时抽取间隔加倍，已保存的点隔一个保留一个，
+    整个采集过程都能显示而内存不随时间增长；全速率数据需要导出时用 Recorder 写入磁盘
+    前向平均按数据块累计（与抽取无关），最多保留 average_blocks 块
+    """
+
+    def __init__(self, channels=4, max_points=100000, average_blocks=4096):
+        self.channels = channels
+        self.max_points = max_points
+        self.step = 1                   # 当前抽取间隔（周期）
+        self.__times = np.empty(max_points)
+        self.__values = np.empty((max_points, channels))
+        self.__block_sums = collections.deque(maxlen=average_blocks)
+        self.clear()
+
+    def append(self, times, values):
+        n = len(times)
+        if n == 0:
+            return
+        self.__block_sums.append((n, values.sum(axis=0)))
+        while True:
+            index = np.arange(self.__next - self.__total, n, self.step)
+            if self.__count + len(index) <= self.max_points:
+                break
+            self.__decimate()
+        count = len(index)
+        self.__times[self.__count:self.__count + count] = times[index]
+        self.__values[self.__count:self.__count + count] = values[index]
+        self.__count += count
+        if count:
+            self.__next = self.__total + index[-1] + self.step
+        self.__total += n
+
+    def __decimate(self):
+        # 抽取间隔加倍：保留第0、2、4...个点，下一个保存的周期接在最后保留的点之后
+        last = self.__next - self.step  # 最后一个保存点的周期序号
+        keep = (self.__count + 1) // 2
+        self.__times[:keep] = self.__times[:self.__count:2]
+        self.__values[:keep] = self.__values[:self.__count:2]
+        if self.__count % 2 == 0 and self.__count:
+            last -= self.step
+        self.__count = keep
+        self.step *= 2
+        self.__next = last + self.step if keep else self.__next
+
+    def mean(self, cycles):
+        """最近约 cycles 个周期（按整块）的各通道平均值，没有数据时为nan"""
+        total = 0
+        sums = np.zeros(self.channels)
+        for n, block_sum in reversed(self.__block_sums):
+            total += n
+            sums += block_sum
+            if total >= cycles:
+                break
+        return sums / total if total else np.full(self.channels, np.nan)
+
+    def clear(self):
+        self.step = 1
+        self.__count = 0
+        self.__total = 0    # 已追加的周期数
+        self.__next = 0     # 下一个保存的周期序号
+        self.__block_sums.clear()
+
+    def __len__(self):
+        return self.__count
+
+    @property
+    def times(self):
+        return self.__times[:self.__count]
+
+    @property
+    def values(self):
+        return self.__values[:self.__count]
+
+
+class Recorder(object):
+    """
+    把全速率数据逐块写入磁盘，close() 时生成 libdaq_replay 可回放的 .npy 录制文件和JSON说明文件；
+    默认单位为换算后的力（与 export_data 导出的CSV相同）
+    """
+
+    def __init__(self, path, frequency, channels=4, units='force', **metadata):
+        self.path = path
+        self.frequency = frequency
+        self.channels = channels
+        self.metadata = dict(metadata, units=units)
+        self.cycles = 0
+        self.__part = path + '.part'
+        self.__file = open(self.__part, 'wb')
+
+    def write(self, values):
+        np.ascontiguousarray(values, dtype=np.float64).tofile(self.__file)
+        self.cycles += len(values)
+
+    def close(self, chunk_cycles=1000000):
+        """结束录制，返回 .npy 文件路径"""
+        if self.__file is None:
+            return self.path
+        self.__file.close()
+        self.__file = None
+        shape = (self.cycles, self.channels)
+        if self.cycles:
+            data = np.memmap(self.__part, dtype=np.float64, mode='r', shape=shape)
+            out = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float64, shape=shape)
+            for begin in range(0, self.cycles, chunk_cycles):
+                out[begin:begin + chunk_cycles] = data[begin:begin + chunk_cycles]
+            out.flush()
+            del data, out
+        else:
+            np.save(self.path, np.empty(shape))
+        os.remove(self.__part)
+        libdaq_replay.write_sidecar(self.path, self.frequency, channels=self.channels, **self.metadata)
+        return self.path
+
+
+class AcquisitionWorker(threading.Thread):
+    """
+    采集线程：按块读取硬件、虚拟信号或回放文件，计算力和重心后通过队列交给界面；
+    界面以固定帧率取数据，采样率不再受Qt定时器和界面重绘限制
+    """
+
+    def __init__(self, mode, sample_rate, signal_type='sine', block_seconds=0.02, width=2.0, height=2.0,
+                 replay_path=None, replay_speed=1.0, time_offset=0.0, process=None, max_blocks=100,
+                 record_path=None):
+        """
+        mode: SOFTWARE_MODE、HARDWARE_MODE 或 REPLAY_MODE
+        sample_rate: 每通道采样率（Hz），回放模式使用录制文件的采样率
+        block_seconds: 每块的时长（秒），块越短延迟越低
+        replay_path: 回放文件（export_data导出的.csv或.npy），回放模式使用
+        replay_speed: 回放速度，1.0为实时，None为尽可能快
+        time_offset: 第一个周期的时间（秒），接续上一次采集的时间轴
+        process: 可选回调 process(block)，在采集线程中对每块执行（如平台控制），返回值放入 block.result
+        max_blocks: 队列长度，界面来不及取时丢弃新块并计入 dropped_frames
+        record_path: 可选 .npy 文件，全速率的力数据写入磁盘（Recorder），供导出和回放
+        """
+        super().__init__(name='AcquisitionWorker', daemon=True)
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.signal_type = signal_type
+        self.block_seconds = block_seconds
+        self.block_cycles = max(1, int(round(sample_rate * block_seconds)))
+        self.width = width
+        self.height = height
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.time_offset = time_offset
+        self.process = process
+        self.record_path = record_path
+        self.recorder = None
+        self.blocks = queue.Queue(max_blocks)
+        self.error = None           # 采集线程中的异常
+        self.__stop_event = threading.Event()
+        self.cycles = 0
+        self.block_count = 0
+        self.dropped_frames = 0     # 界面来不及处理而丢弃的块
+        self.dropped_samples = 0    # 设备缓冲区溢出丢失的采样点
+        self.process_time = 0.0
+        self.start_time = None
+
+    def stop(self, timeout=2.0):
+        """通知采集线程停止并最多等待 timeout 秒，返回线程是否已结束"""
+        self.__stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        return not self.is_alive()
+
+    def run(self):
+        try:
+            if self.mode == HARDWARE_MODE:
+                self.__run_hardware()
+            elif self.mode == REPLAY_MODE:
+                self.__run_replay()
+            else:
+                self.__run_virtual()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def __start_recording(self):
+        if self.record_path is not None:
+            self.recorder = Recorder(self.record_path, self.sample_rate,
+                                     start_time=self.time_offset + 1.0 / self.sample_rate)
+
+    def __run_hardware(self):
+        # 连续采样会话在采集线程中创建，每块 block_cycles 个周期
+        session = get_session(self.sample_rate, block_cycles=self.block_cycles)
+        self.__start_recording()
+        self.start_time = time.perf_counter()
+        try:
+            while not self.__stop_event.is_set():
+                frame = session.read_block(timeout=0.5)
+                if frame is None:
+                    if not session.running:
+                        break
+                    continue
+                self.__deliver(frame.data.T, frame.sample_index, frame.dropped)
+        finally:
+            close_session()
+
+    def __run_virtual(self):
+        # 虚拟信号按实际时间节拍生成，采样率与硬件模式一致
+        device = VirtualDAQ(self.signal_type, self.sample_rate)
+        self.__start_recording()
+        self.start_time = time.perf_counter()
+        while not self.__stop_event.is_set():
+            due = self.start_time + (device.sample_index + self.block_cycles) / self.sample_rate
+            wait = due - time.perf_counter()
+            if wait > 0 and self.__stop_event.wait(wait):
+                break
+            sample_index = device.sample_index
+            self.__deliver(device.read_block(self.block_cycles), sample_index, 0)
+
+    def __run_replay(self):
+        stream = libdaq_replay.ReplayStream.open(self.replay_path, speed=self.replay_speed)
+        # 录制的单位由元数据决定：export_data 导出的CSV及其转换的.npy保存的是换算后的力，回放时换算回电压
+        if stream.metadata.get('units', 'volts') == 'force':
+            stream.gain = 1.0 / FORCE_MAP
+        # 采样率和块长度以录制文件为准
+        self.sample_rate = stream.frequency
+        self.block_cycles = stream.block_cycles = max(1, int(round(stream.frequency * self.block_seconds)))
+        self.__start_recording()
+        self.start_time = time.perf_counter()
+        with stream:
+            while not self.__stop_event.is_set():
+                block = stream.read(timeout=0.5)
+                if block is None:
+                    if not stream.running:
+                        break  # 回放结束
+                    continue
+                self.__deliver(block.data.T, block.start_cycle, block.dropped)
+
+    def __deliver(self, raw, sample_index, dropped):
+        # raw: n x 4 原始电压
+        begin = time.perf_counter()
+        raw = np.asarray(raw, dtype=np.float64)
+        times = self.time_offset + (sample_index + np.arange(1, len(raw) + 1)) / self.sample_rate
+        values = raw * FORCE_MAP
+        block = AcquisitionBlock(times, raw, values, values.sum(axis=1), compute_cg(raw, self.width, self.height),
+                                 sample_index, dropped, None)
+        if self.recorder is not None:
+            self.recorder.write(values)
+        if self.process is not None:
+            block = block._replace(result=self.process(block))
+        self.cycles += len(raw)
+        self.block_count += 1
+        self.dropped_samples += dropped
+        self.process_time += time.perf_counter() - begin
+        try:
+            self.blocks.put_nowait(block)
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def get_blocks(self):
+        """取出队列中的所有数据块（界面线程调用，不阻塞）"""
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.blocks.get_nowait())
+            except queue.Empty:
+                return blocks
+
+    def stats(self):
+        """采集统计：rate 实际采样率（周期/秒），blocks，dropped_frames，dropped_samples，queued，process_ms"""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        return {'rate': self.cycles / elapsed if elapsed > 0 else 0.0, 'blocks': self.block_count,
+                'dropped_frames': self.dropped_frames, 'dropped_samples': self.dropped_samples,
+                'queued': self.blocks.qsize(),
+                'process_ms': self.process_time * 1000 / self.block_count if self.block_count else 0.0}
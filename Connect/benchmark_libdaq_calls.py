@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  micro benchmark of libdaq per-call overhead for common ADC, DAC and GPIO calls
+
+  before: function without argtypes/restype, ctypes temporaries built by hand (old wrapper)
+  after:  function declared by libdaq.LIBDAQ_PROTOTYPES, called with plain python values
+  wrapper: same call through the public libdaq_adc/libdaq_dac/libdaq_gpio wrapper method
+
+  usage: python benchmark_libdaq_calls.py [calls]
+  without device connected the driver returns error at once, the result is the call overhead itself
+'''
+
+import sys
+import time
+import ctypes
+import libdaq
+
+
+def time_per_call(func, calls):
+    """return average time of func() in us"""
+    func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def legacy_calls(device_name):
+    """calls the way wrappers did before prototypes were declared"""
+    daqdll = libdaq.libdaq_load_library()
+    raw = {name: daqdll[name] for name in libdaq.LIBDAQ_PROTOTYPES}  # new function objects, no argtypes
+
+    def adc_read_analog(datalen=64):
+        actual_len = ctypes.c_uint(0)
+        _datalen = ctypes.c_uint(datalen)
+        type_double_arrary = ctypes.c_double * datalen
+        data_buf = type_double_arrary(0)
+        data_buf_p = ctypes.POINTER(ctypes.c_double)()
+        data_buf_p.contents = data_buf
+        raw['libdaq_adc_read_analog'](device_name, b'ADC', data_buf_p, _datalen, ctypes.byref(actual_len))
+        return list(data_buf[0:actual_len.value])
+
+    def adc_config_channel_ex():
+        raw['libdaq_adc_config_channel_ex'](device_name, b'ADC', ctypes.c_ubyte(0),
+                                            ctypes.c_ubyte(libdaq.CHANNEL_RANGE_N10V_P10V),
+                                            ctypes.c_ubyte(libdaq.ADC_CHANNEL_DC_COUPLE),
+                                            ctypes.c_ubyte(libdaq.ADC_CHANNEL_REFGND_RSE))
+
+    def dac_set_value():
+        raw['libdaq_dac_set_value'](device_name, b'DAC', ctypes.c_double(1.0))
+
+    def gpio_write_bit():
+        raw['libdaq_gpio_write_bit'](device_name, b'GPIOOUT', 0, ctypes.c_uint8(1))
+
+    def gpio_read_bit():
+        bit_val = ctypes.c_uint8(0)
+        raw['libdaq_gpio_read_bit'](device_name, b'GPIOIN', 0, ctypes.byref(bit_val))
+        return bit_val.value
+
+    return {
+        'adc.read_analog(64)': adc_read_analog,
+        'adc.config_channel_ex': adc_config_channel_ex,
+        'dac.set_value': dac_set_value,
+        'gpio.write_bit': gpio_write_bit,
+        'gpio.read_bit': gpio_read_bit,
+    }
+
+
+def prototyped_calls(device_name):
+    """calls through the functions declared by LIBDAQ_PROTOTYPES, plain python values as arguments"""
+    adc = libdaq.libdaq_adc(device_name, b'ADC')
+    bit_val = ctypes.c_uint8(0)
+    bit_val_p = ctypes.byref(bit_val)
+
+    def gpio_read_bit():
+        libdaq._libdaq_gpio_read_bit(device_name, b'GPIOIN', 0, bit_val_p)
+        return bit_val.value
+
+    return {
+        'adc.read_analog(64)': lambda: adc.read_analog(64),
+        'adc.config_channel_ex': lambda: libdaq._libdaq_adc_config_channel_ex(device_name, b'ADC', 0,
+                                                                              libdaq.CHANNEL_RANGE_N10V_P10V,
+                                                                              libdaq.ADC_CHANNEL_DC_COUPLE,
+                                                                              libdaq.ADC_CHANNEL_REFGND_RSE),
+        'dac.set_value': lambda: libdaq._libdaq_dac_set_value(device_name, b'DAC', 1.0),
+        'gpio.write_bit': lambda: libdaq._libdaq_gpio_write_bit(device_name, b'GPIOOUT', 0, 1),
+        'gpio.read_bit': gpio_read_bit,
+    }
+
+
+def wrapper_calls(device_name):
+    """calls through the public wrapper classes, include argument check of the wrapper"""
+    adc = libdaq.libdaq_adc(device_name, b'ADC')
+    dac = libdaq.libdaq_dac(device_name, b'DAC')
+    gpioin = libdaq.libdaq_gpio(device_name, b'GPIOIN')
+    gpioout = libdaq.libdaq_gpio(device_name, b'GPIOOUT')
+    return {
+        'adc.read_analog(64)': lambda: adc.read_analog(64),
+        'adc.config_channel_ex': lambda: adc.config_channel_ex(0, libdaq.CHANNEL_RANGE_N10V_P10V,
+                                                               libdaq.ADC_CHANNEL_DC_COUPLE,
+                                                               libdaq.ADC_CHANNEL_REFGND_RSE),
+        'dac.set_value': lambda: dac.set_value(1.0),
+        'gpio.write_bit': lambda: gpioout.write_bit(0, 1),
+        'gpio.read_bit': lambda: gpioin.read_bit(0),
+    }
+
+
+def main(calls=20000):
+    libdaq.libdaq_init()
+    device_name = b'DAQ-USB4012'
+    if libdaq.libdaq_device_get_count() > 0:
+        (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    print("device: %s, %d calls each" % (device_name, calls))
+
+    mismatch = libdaq.libdaq_check_prototypes()
+    for line in mismatch:
+        print("prototype mismatch:", line)
+
+    before = legacy_calls(device_name)
+    after = prototyped_calls(device_name)
+    wrapper = wrapper_calls(device_name)
+    print("%-24s %12s %12s %8s %12s" % ("call", "before(us)", "after(us)", "speedup", "wrapper(us)"))
+    for name in before:
+        t_before = time_per_call(before[name], calls)
+        t_after = time_per_call(after[name], calls)
+        t_wrapper = time_per_call(wrapper[name], calls)
+        print("%-24s %12.3f %12.3f %7.2fx %12.3f" % (name, t_before, t_after, t_before / t_after, t_wrapper))
+
+    libdaq.libdaq_exit()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
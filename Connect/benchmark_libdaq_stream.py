@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  latency/throughput benchmark of continuous ADC acquisition
+
+  sweeps sample rate x read block length x set_realtime, each combination streams
+  through libdaq_stream.AdcStream for a fixed time and measures
+      throughput   achieved cycles/s of each channel against the requested rate
+      latency      age of the newest sample of a block when the consumer gets it
+                   (block end time to read() return), percentiles in ms
+      read call    time of each libdaq_adc_read_analog_sync call (libdaq instrumentation), us
+      overruns     ring overruns, dropped samples, read timeouts and errors
+
+  usage:
+      python benchmark_libdaq_stream.py --rates 10000 100000 --blocks 100 1000 10000 --realtime none 1 10
+      LIBDAQ_BACKEND=sim python benchmark_libdaq_stream.py --duration 2 --output sim.json
+      python benchmark_libdaq_stream.py --output new.json --baseline old.json
+
+  the report is JSON (host, backend, library version, one result per combination and the
+  combination with the lowest p99 latency without loss), --baseline compares with an older
+  report and lists combinations with higher latency or lower throughput
+  the simulated backend stores realtime_ms without modelling it, results there show host overhead only
+'''
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import numpy as np
+import libdaq
+import libdaq_stream
+
+REPORT_VERSION = 1
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """return dict p50, p90, p99 and max of values, None values when empty"""
+    if len(values) == 0:
+        result = {'p%d' % p: None for p in points}
+        result['max'] = None
+        return result
+    values = np.asarray(values, dtype=np.float64)
+    result = {'p%d' % p: float(v) for p, v in zip(points, np.percentile(values, points))}
+    result['max'] = float(values.max())
+    return result
+
+
+def run_case(adc, channel_list, frequency, block_cycles, realtime_ms, duration, buffer_seconds):
+    """
+    stream one parameter combination for duration seconds
+    Returns: result dict
+    """
+    stream = libdaq_stream.AdcStream(adc, channel_list, frequency, block_cycles=block_cycles,
+                                     buffer_seconds=buffer_seconds, realtime_ms=realtime_ms)
+    block_time = block_cycles/float(frequency)
+    latencies = []
+    libdaq.libdaq_instrumentation_snapshot(reset=True)
+    errorcode = stream.start()
+    if errorcode != libdaq.LIBDAQ_SUCCESS:
+        return {'frequency': frequency, 'block_cycles': block_cycles, 'realtime_ms': realtime_ms,
+                'error': errorcode, 'error_desc': libdaq.libdaq_get_error_desc(errorcode)}
+    try:
+        end = time.perf_counter() + duration
+        while time.perf_counter() < end:
+            block = stream.read(max(1.0, 4*block_time))
+            if block is None:
+                break
+            latencies.append(time.perf_counter() - (block.timestamp + block_time))
+    finally:
+        stream.stop()
+
+    stats = stream.stats()
+    calls = libdaq.libdaq_instrumentation_snapshot(reset=True).get('libdaq_adc_read_analog_sync', {})
+    latency = percentiles(np.asarray(latencies)*1e3)
+    return {'frequency': frequency, 'block_cycles': block_cycles, 'realtime_ms': realtime_ms,
+            'channels': len(channel_list), 'duration': duration,
+            'achieved_rate': stats['rate'], 'throughput': stats['rate']/frequency,
+            'blocks': len(latencies), 'latency_ms': latency,
+            'read_call_us': {'calls': calls.get('calls', 0), 'mean': calls.get('mean_us'),
+                             'p50': calls.get('p50_us'), 'p99': calls.get('p99_us'), 'max': calls.get('max_us')},
+            'overruns': stats['overruns'], 'dropped': stats['dropped'], 'timeouts': stats['timeouts'],
+            'errors': stats['errors'], 'last_error': stats['last_error']}
+
+
+def lossless(result, min_throughput=0.99):
+    return 'error' not in result and result['overruns'] == 0 and result['dropped'] == 0 and \
+        result['errors'] == 0 and result['throughput'] >= min_throughput
+
+
+def best_case(results):
+    """combination with the lowest p99 latency of the lossless ones, None when all lost samples"""
+    candidates = [r for r in results if lossless(r) and r['latency_ms']['p99'] is not None]
+    if not candidates:
+        return None
+    best = min(candidates, key=lambda r: r['latency_ms']['p99'])
+    return {'frequency': best['frequency'], 'block_cycles': best['block_cycles'],
+            'realtime_ms': best['realtime_ms'], 'latency_p99_ms': best['latency_ms']['p99']}
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    find regressions against an older report
+    Args: tolerance: allowed relative increase of p99 latency
+    Returns: list of text lines
+    """
+    def key(r):
+        return (r['frequency'], r['block_cycles'], r['realtime_ms'])
+    old = {key(r): r for r in baseline.get('results', [])}
+    lines = []
+    for new in report['results']:
+        ref = old.get(key(new))
+        if ref is None or 'error' in ref:
+            continue
+        name = "rate %d block %d realtime %s" % key(new)
+        if 'error' in new:
+            lines.append("%s: error %d, was ok" % (name, new['error']))
+            continue
+        if lossless(ref) and not lossless(new):
+            lines.append("%s: lost samples (overruns %d, dropped %d, throughput %.3f)" %
+                         (name, new['overruns'], new['dropped'], new['throughput']))
+        p99_old, p99_new = ref['latency_ms']['p99'], new['latency_ms']['p99']
+        if p99_old and p99_new and p99_new > p99_old*(1 + tolerance):
+            lines.append("%s: p99 latency %.3f ms, was %.3f ms" % (name, p99_new, p99_old))
+    return lines
+
+
+def parse_realtime(text):
+    return None if text.lower() == 'none' else int(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ADC latency/throughput sweep")
+    parser.add_argument('--rates', type=int, nargs='+', default=[10000, 50000, 100000], help="sample rates (Hz)")
+    parser.add_argument('--blocks', type=int, nargs='+', default=[100, 1000, 10000], help="block lengths (cycles)")
+    parser.add_argument('--realtime', type=parse_realtime, nargs='+', default=[None, 1, 10],
+                        help="set_realtime values in ms, none leaves the device default")
+    parser.add_argument('--channels', type=int, nargs='+', default=[0, 1, 2, 3], help="channel list")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per combination")
+    parser.add_argument('--buffer', type=float, default=2.0, help="AdcStream ring length (s)")
+    parser.add_argument('--output', default='benchmark_libdaq_stream.json', help="report file")
+    parser.add_argument('--baseline', help="older report to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative p99 latency increase")
+    args = parser.parse_args(argv)
+
+    libdaq.libdaq_init()
+    if libdaq.libdaq_device_get_count() < 1:
+        raise Exception("No device detected!")
+    (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    device = libdaq.libdaq_device_class(device_name, libdaq.DAQUSB401x)(device_name)
+    adc = libdaq.libdaq_device_adcs(device)[0]
+    for channel in args.channels:
+        adc.config_channel_ex(channel, libdaq.CHANNEL_RANGE_N10V_P10V,
+                              libdaq.ADC_CHANNEL_DC_COUPLE, libdaq.ADC_CHANNEL_REFGND_RSE)
+    (errorcode, version) = libdaq.libdaq_get_version()
+    libdaq.libdaq_set_instrumentation(True)
+
+    print("device: %s, %.1f s per combination" % (device_name, args.duration))
+    print("%8s %7s %8s %10s %7s %9s %9s %9s %9s %8s %7s" % ("rate", "block", "realtime", "achieved", "thru",
+                                                            "p50(ms)", "p99(ms)", "max(ms)", "read p99", "overrun",
+                                                            "dropped"))
+    results = []
+    for frequency in args.rates:
+        for block_cycles in args.blocks:
+            for realtime_ms in args.realtime:
+                result = run_case(adc, args.channels, frequency, block_cycles, realtime_ms,
+                                  args.duration, args.buffer)
+                results.append(result)
+                if 'error' in result:
+                    print("%8d %7d %8s  error %d %s" % (frequency, block_cycles, realtime_ms, result['error'],
+                                                        result['error_desc']))
+                    continue
+                latency = result['latency_ms']
+                print("%8d %7d %8s %10.0f %7.3f %9s %9s %9s %9s %8d %7d" % (
+                    frequency, block_cycles, realtime_ms, result['achieved_rate'], result['throughput'],
+                    '%.3f' % latency['p50'] if latency['p50'] is not None else '-',
+                    '%.3f' % latency['p99'] if latency['p99'] is not None else '-',
+                    '%.3f' % latency['max'] if latency['max'] is not None else '-',
+                    '%.0f' % result['read_call_us']['p99'] if result['read_call_us']['p99'] is not None else '-',
+                    result['overruns'], result['dropped']))
+    libdaq.libdaq_set_instrumentation(False)
+
+    report = {'version': REPORT_VERSION,
+              'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'host': {'name': platform.node(), 'platform': platform.platform(), 'machine': platform.machine(),
+                       'python': platform.python_version(), 'numpy': np.__version__},
+              'backend': type(libdaq.libdaq_load_library()).__name__,
+              'library_version': '%d.%d.%d' % (version.major_ver, version.minor_ver, version.micro_ver)
+              if errorcode == libdaq.LIBDAQ_SUCCESS else None,
+              'device': device_name.decode('utf-8', 'replace') if isinstance(device_name, bytes) else device_name,
+              'parameters': {'rates': args.rates, 'blocks': args.blocks, 'realtime': args.realtime,
+                             'channels': args.channels, 'duration': args.duration, 'buffer': args.buffer},
+              'results': results,
+              'best': best_case(results)}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("report written to %s, best: %s" % (args.output, report['best']))
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("regression:", line)
+        if not regressions:
+            print("no regression against %s" % args.baseline)
+        status = 1 if regressions else 0
+    libdaq.libdaq_exit()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
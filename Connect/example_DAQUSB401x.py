@@ -9,9 +9,9 @@ import time
 import sys
 #import daqlib.libdaq as libdaq
 import libdaq
+import libdaq_waveform
 from ctypes import *
 from device import *
-import math
 
 def dac_example( device ):
     #输出3个0.5V到1.0V阶跃信号
@@ -26,18 +26,13 @@ def dac_example( device ):
     device.dac.stop()
 
     #输出正弦波，同样的方法可以输出三角波，锯齿波等
-    print("output 1kHz sin wave")
-    points=100 #一个周期取100个点
-    amplitude=1.0;#幅度,1.0V
-    offset=1.2;   #偏置,1.2V
-    buf=[]
-    for x in range(0,points):
-        #angle change to arc
-        buf.append(amplitude*(math.sin(x*(2*math.pi/points)))+offset)
+    print("output 100Hz sin wave")
+    #一个周期取100个点，幅度1.0V，偏置1.2V；libdaq_waveform另有方波、三角波、锯齿波、扫频等
+    buf=libdaq_waveform.sine(100,10000,amplitude=1.0,offset=1.2)
 
     dac_cfg.buf=buf
     dac_cfg.cycles=0 # Continuous output
-    dac_cfg.frequency=10000  #point update frequency 10kHz,so sin wave frequency is 1kHz
+    dac_cfg.frequency=10000  #point update frequency 10kHz,so sin wave frequency is 100Hz
     dac_cfg.trigger_mode=libdaq.DAC_TRIGGER_MODE_SOFT # soft trigger mode
     device.dac.set_wavepara(dac_cfg)
     device.dac.start()
@@ -93,15 +88,15 @@ def adc_soft_trigger_example( device):
     device.adc.send_trigger() #默认为软件触发,发送软件触发命令
 
     data_len=samplepara.cycles*len(channel_list) #计算数据个数
-    (errorcode,result)=device.adc.read_analog_sync(data_len,1000) #读取采样数据
+    (errorcode,result)=device.adc.read_analog_sync(data_len,1000,as_array=True) #读取采样数据
     device.adc.stop_task()#停止采样任务
 
     #打印采样结果
     print("ADC sample, soft trigger, get data len: %d"%(len(result)))
+    ch_matrix=device.adc.extractChannelMatrix(result,channel_list) #每行为一个通道的数据
     for ch_index in range(0,len(channel_list)):
-        ch_data=device.adc.extractChannelData(result,len(channel_list),ch_index)
         sys.stdout.write("ch_%02d: " % (ch_index))
-        for data in ch_data :
+        for data in ch_matrix[ch_index] :
             sys.stdout.write("%2.4f " % (data))
         print("")
 
@@ -125,15 +120,15 @@ def adc_hw_trigger_example( device):
     device.adc.start_task()   #启动采样任务
 
     data_len=samplepara.cycles*len(channel_list) #计算数据个数
-    (errorcode,result)=device.adc.read_analog_sync(data_len,10000)
+    (errorcode,result)=device.adc.read_analog_sync(data_len,10000,as_array=True)
     device.adc.stop_task()#停止采样任务
 
     #打印采样结果
     print("ADC sample, hard trigger, get data len: %d"%(len(result)))
+    ch_matrix=device.adc.extractChannelMatrix(result,channel_list) #每行为一个通道的数据
     for ch_index in range(0,len(channel_list)):
-        ch_data=device.adc.extractChannelData(result,len(channel_list),ch_index)
         sys.stdout.write("ch_%02d: " % (ch_index))
-        for data in ch_data :
+        for data in ch_matrix[ch_index] :
             sys.stdout.write("%2.4f " % (data))
         print("")
 
@@ -18,69 +18,150 @@ import ctypes
 from ctypes import byref
 import platform
 import os
-# detect python version
-architecture=platform.architecture()
-
-#  load dll
+import sys
+import threading
+import re
+import collections
+import functools
+import hashlib
+import time
+import numpy as np
+
+#  native library, loaded on first API call, see libdaq_load_library()
 dir=os.path.dirname(os.path.abspath(__file__))
-if architecture[0] == '64bit':
-    dll_path = os.path.join(dir,'./daqlib/MS64/daqlib.dll')
-else:
-    dll_path = os.path.join(dir,'./daqlib/MS32/daqlib.dll')
-
-daqdll = ctypes.cdll.LoadLibrary(dll_path)
-
-# API for library
-_libdaq_init = daqdll.libdaq_init
-_libdaq_exit = daqdll.libdaq_exit
-_libdaq_set_option = daqdll.libdaq_set_option
-_libdaq_get_version =daqdll.libdaq_get_version
-_libdaq_get_error_desc = daqdll.libdaq_get_error_desc
-_libdaq_get_error_str  = daqdll.libdaq_get_error_str
-
-# API for devices
-_libdaq_device_get_count = daqdll.libdaq_device_get_count
-_libdaq_device_rename_byindex = daqdll.libdaq_device_rename_byindex
-_libdaq_device_rename_byname = daqdll.libdaq_device_rename_byname
-_libdaq_device_get_name = daqdll.libdaq_device_get_name
-_libdaq_device_get_version=daqdll.libdaq_device_get_version
-_libdaq_device_setUID_byindex=daqdll.libdaq_device_setUID_byindex
-_libdaq_device_setUID_byname=daqdll.libdaq_device_setUID_byname
-
-# API for GPIO
-_libdaq_gpio_get_iocount=daqdll.libdaq_gpio_get_iocount
-_libdaq_gpio_get_ioattrs=daqdll.libdaq_gpio_get_ioattrs
-_libdaq_gpio_get_config=daqdll.libdaq_gpio_get_config
-_libdaq_gpio_set_config=daqdll.libdaq_gpio_set_config
-_libdaq_gpio_write_bit = daqdll.libdaq_gpio_write_bit
-_libdaq_gpio_write_port = daqdll.libdaq_gpio_write_port
-_libdaq_gpio_read_bit = daqdll.libdaq_gpio_read_bit
-_libdaq_gpio_read_port = daqdll.libdaq_gpio_read_port
-
-# API for DAC
-_libdaq_dac_set_wavepara = daqdll.libdaq_dac_set_wavepara
-_libdaq_dac_set_value=daqdll.libdaq_dac_set_value
-_libdaq_dac_start = daqdll.libdaq_dac_start
-_libdaq_dac_stop = daqdll.libdaq_dac_stop
-
-# API for ADC
-_libdaq_adc_config_channel=daqdll.libdaq_adc_config_channel
-_libdaq_adc_config_channel_ex=daqdll.libdaq_adc_config_channel_ex
-_libdaq_adc_calibrate_channel=daqdll.libdaq_adc_calibrate_channel
-_libdaq_adc_singleSample=daqdll.libdaq_adc_singleSample
-_libdaq_adc_set_sample_parameter    = daqdll.libdaq_adc_set_sample_parameter
-_libdaq_adc_set_sample_parameter_ex = daqdll.libdaq_adc_set_sample_parameter_ex
-_libdaq_adc_clear_buffer=daqdll.libdaq_adc_clear_buffer
-_libdaq_adc_read_analog = daqdll.libdaq_adc_read_analog
-_libdaq_adc_read_analog_sync = daqdll.libdaq_adc_read_analog_sync
-_libdaq_adc_send_trigger=daqdll.libdaq_adc_send_trigger
-_libdaq_adc_stop=daqdll.libdaq_adc_stop
-_libdaq_adc_start_task=daqdll.libdaq_adc_start_task
-_libdaq_adc_stop_task=daqdll.libdaq_adc_stop_task
-_libdaq_adc_config_triggerSrc=daqdll.libdaq_adc_config_triggerSrc
-_libdaq_adc_select_triggerSrc=daqdll.libdaq_adc_select_triggerSrc
-_libdaq_adc_extractChannelData=daqdll.libdaq_adc_extractChannelData
-_libdaq_adc_set_realtime=daqdll.libdaq_adc_set_realtime
+LIBDAQ_LIBRARY_PATH_ENV = 'LIBDAQ_LIBRARY_PATH' # full path of daqlib.dll/libdaqlib.so, overrides platform detection
+LIBDAQ_CACHE_DIR_ENV = 'LIBDAQ_CACHE_DIR'       # where vendored linux tarball is unpacked, default ~/.cache/libdaq
+
+LIBDAQ_BACKEND_ENV = 'LIBDAQ_BACKEND'           # 'native'(default) or 'sim' for libdaq_sim simulated devices
+LIBDAQ_INSTRUMENT_ENV = 'LIBDAQ_INSTRUMENT'     # 1: record per-call latency and errors, see libdaq_set_instrumentation()
+LIBDAQ_INSTRUMENT_INTERVAL_ENV = 'LIBDAQ_INSTRUMENT_INTERVAL' # seconds between summaries on stderr when instrumented
+
+daqdll = None
+_daqdll_lock = threading.Lock()
+_backend = None
+_raw_api = {}   # API name -> function of loaded library, without instrumentation
+
+# machine name -> vendored linux library in daqlib/
+_LINUX_ARCH = {
+    'x86_64': 'linux-x86_64',
+    'amd64': 'linux-x86_64',
+    'aarch64': 'linux-arm64',
+    'arm64': 'linux-arm64',
+}
+
+def _unpack_linux_library(arch):
+    """
+    unpack daqlib/<arch>.tar.gz into cache directory once
+    Returns: path of libdaqlib.so in cache directory
+    """
+    cache_dir=os.environ.get(LIBDAQ_CACHE_DIR_ENV) or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),'.cache'),'libdaq')
+    lib_path=os.path.join(cache_dir,arch,'libdaqlib.so')
+    if os.path.exists(lib_path):
+        return lib_path
+
+    tar_path=os.path.join(dir,'daqlib',arch+'.tar.gz')
+    if not os.path.exists(tar_path):
+        raise OSError("libdaq library package not found: %s" % tar_path)
+    import tarfile,tempfile,shutil
+    os.makedirs(cache_dir,exist_ok=True)
+    # unpack to a temporary directory then rename, another process may unpack at the same time
+    tmp_dir=tempfile.mkdtemp(prefix=arch+'.',dir=cache_dir)
+    try:
+        with tarfile.open(tar_path) as tar:
+            if hasattr(tarfile,'data_filter'):
+                tar.extractall(tmp_dir,filter='data')
+            else:
+                tar.extractall(tmp_dir)
+        try:
+            os.rename(os.path.join(tmp_dir,arch),os.path.join(cache_dir,arch))
+        except OSError:
+            if not os.path.exists(lib_path):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+    return lib_path
+
+def libdaq_library_path():
+    """
+    get path of native libdaq library for this platform
+    Args: None
+    Returns: LIBDAQ_LIBRARY_PATH environment variable if set,
+             daqlib/MS64 or MS32 daqlib.dll on windows,
+             libdaqlib.so unpacked next to or from the vendored daqlib/linux-*.tar.gz on linux
+    Raises: OSError when platform is not supported
+    """
+    path=os.environ.get(LIBDAQ_LIBRARY_PATH_ENV)
+    if path:
+        return path
+
+    if sys.platform.startswith(('win','cygwin')):
+        if ctypes.sizeof(ctypes.c_void_p) == 8: # 64bit python
+            return os.path.join(dir,'./daqlib/MS64/daqlib.dll')
+        return os.path.join(dir,'./daqlib/MS32/daqlib.dll')
+
+    if sys.platform.startswith('linux'):
+        machine=platform.machine().lower()
+        arch=_LINUX_ARCH.get(machine,'linux-arm' if machine.startswith('arm') else None)
+        if arch is None:
+            raise OSError("libdaq is not provided for linux on %s" % machine)
+        # unpacked in daqlib/ as daqlib/readme.txt describes
+        local_path=os.path.join(dir,'daqlib',arch,'libdaqlib.so')
+        if os.path.exists(local_path):
+            return local_path
+        return _unpack_linux_library(arch)
+
+    raise OSError("libdaq is not provided for %s" % sys.platform)
+
+def libdaq_set_backend(backend):
+    """
+    select library used by all API functions, takes effect on next API call
+    Args: backend: 'native' load daqlib.dll/libdaqlib.so,
+                   'sim' use simulated devices of libdaq_sim,
+                   or a library object providing the libdaq functions (e.g. libdaq_sim.SimulatedDaqlib instance)
+    Returns: None
+    """
+    global daqdll, _backend
+    libdaq_invalidate_config()  # other library, other devices
+    with _daqdll_lock:
+        _backend = backend
+        daqdll = None
+        _raw_api.clear()
+        libdaq_get_error_desc.cache_clear()
+        libdaq_get_error_str.cache_clear()
+        for name in LIBDAQ_PROTOTYPES:
+            globals()['_'+name]=_lazy_api(name)
+
+def libdaq_load_library():
+    """
+    load libdaq library of selected backend and bind all API functions, called on first API call
+    backend is set by libdaq_set_backend() or LIBDAQ_BACKEND environment variable, default native
+    Args: None
+    Returns: library handle
+    """
+    global daqdll
+    with _daqdll_lock:
+        if daqdll is None:
+            backend=_backend or os.environ.get(LIBDAQ_BACKEND_ENV) or 'native'
+            if backend == 'native':
+                lib=ctypes.cdll.LoadLibrary(libdaq_library_path())
+            elif backend == 'sim':
+                import libdaq_sim
+                lib=libdaq_sim.SimulatedDaqlib()
+            elif isinstance(backend,str):
+                raise ValueError("unknown libdaq backend: %s" % backend)
+            else:
+                lib=backend
+            for name,(restype,argtypes) in LIBDAQ_PROTOTYPES.items():
+                func=getattr(lib,name)
+                func.restype=restype
+                func.argtypes=argtypes
+                _raw_api[name]=func
+            if _instrument_enabled is None and os.environ.get(LIBDAQ_INSTRUMENT_ENV,'0') not in ('','0'):
+                libdaq_set_instrumentation(True,float(os.environ.get(LIBDAQ_INSTRUMENT_INTERVAL_ENV,'0')))
+            _apply_instrumentation()
+            daqdll=lib
+    return daqdll
 
 
 class hw_version_c(ctypes.Structure):
@@ -95,7 +176,7 @@ class ioattr_c(ctypes.Structure):
 
 class dac_wavepara_c(ctypes.Structure):
     _fields_ = [("buf", ctypes.POINTER(ctypes.c_double)),
-                ("buflen", ctypes.c_uint16),
+                ("buflen", ctypes.c_uint),
                 ("cycles", ctypes.c_uint32),
                 ("frequency", ctypes.c_double),
                 ("trigger_mode", ctypes.c_uint8)]
@@ -115,10 +196,297 @@ class adc_samplepara_c(ctypes.Structure):
               ("group_interval",ctypes.c_uint)] #only used in group mode(us)
 
 
+'''
+    prototype of every libdaq API used by this module, same as daqlib/include/libdaq.h
+    name: (restype, argtypes), check with libdaq_check_prototypes()
+'''
+_c_str=ctypes.c_char_p   # const char* device_name, module_name
+_c_u8=ctypes.c_ubyte     # unsigned char
+_c_u8_p=ctypes.POINTER(ctypes.c_ubyte)
+_c_double_p=ctypes.POINTER(ctypes.c_double)
+_c_uint_p=ctypes.POINTER(ctypes.c_uint)
+
+LIBDAQ_PROTOTYPES = {
+    # API for library
+    'libdaq_init':                  (ctypes.c_int, []),
+    'libdaq_exit':                  (ctypes.c_int, []),
+    'libdaq_scan_device':           (ctypes.c_int, []),
+    'libdaq_set_option':            (None, [ctypes.c_int]),
+    'libdaq_get_version':           (ctypes.c_int, [ctypes.POINTER(ctypes.c_byte)]*3),
+    'libdaq_get_error_desc':        (ctypes.c_char_p, [ctypes.c_int]),
+    'libdaq_get_error_str':         (ctypes.c_char_p, [ctypes.c_int]),
+    # API for devices
+    'libdaq_device_get_count':      (ctypes.c_int, []),
+    'libdaq_device_rename_byindex': (ctypes.c_int, [ctypes.c_uint, _c_str]),
+    'libdaq_device_rename_byname':  (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_device_get_name':       (ctypes.c_int, [ctypes.c_uint, _c_str, ctypes.c_int]),
+    'libdaq_device_get_version':    (ctypes.c_int, [_c_str, ctypes.POINTER(hw_version_c)]),
+    'libdaq_device_setUID_byindex': (ctypes.c_int, [ctypes.c_uint, _c_u8]),
+    'libdaq_device_setUID_byname':  (ctypes.c_int, [_c_str, _c_u8]),
+    # API for GPIO
+    'libdaq_gpio_get_iocount':      (ctypes.c_int, [_c_str, _c_str, _c_u8_p]),
+    'libdaq_gpio_get_ioattrs':      (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(ioattr_c)]),
+    'libdaq_gpio_get_config':       (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(ctypes.c_int)]),
+    'libdaq_gpio_set_config':       (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(ctypes.c_int)]),
+    'libdaq_gpio_write_bit':        (ctypes.c_int, [_c_str, _c_str, _c_u8, _c_u8]),
+    'libdaq_gpio_write_port':       (ctypes.c_int, [_c_str, _c_str, _c_u8_p]),
+    'libdaq_gpio_read_bit':         (ctypes.c_int, [_c_str, _c_str, _c_u8, _c_u8_p]),
+    'libdaq_gpio_read_port':        (ctypes.c_int, [_c_str, _c_str, _c_u8_p]),
+    # API for DAC
+    'libdaq_dac_set_wavepara':      (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(dac_wavepara_c)]),
+    'libdaq_dac_set_value':         (ctypes.c_int, [_c_str, _c_str, ctypes.c_double]),
+    'libdaq_dac_start':             (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_dac_stop':              (ctypes.c_int, [_c_str, _c_str]),
+    # API for ADC
+    'libdaq_adc_config_channel':    (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(adc_channelpara_c), _c_u8]),
+    'libdaq_adc_config_channel_ex': (ctypes.c_int, [_c_str, _c_str, _c_u8, _c_u8, _c_u8, _c_u8]),
+    'libdaq_adc_calibrate_channel': (ctypes.c_int, [_c_str, _c_str, _c_u8, ctypes.c_double, ctypes.c_double]),
+    'libdaq_adc_singleSample':      (ctypes.c_int, [_c_str, _c_str, _c_u8_p, ctypes.c_uint, _c_double_p]),
+    'libdaq_adc_set_sample_parameter':    (ctypes.c_int, [_c_str, _c_str, ctypes.POINTER(adc_samplepara_c)]),
+    'libdaq_adc_set_sample_parameter_ex': (ctypes.c_int, [_c_str, _c_str, _c_u8_p, _c_u8, _c_u8,
+                                                          ctypes.c_uint, ctypes.c_uint, ctypes.c_uint]),
+    'libdaq_adc_clear_buffer':      (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_adc_read_analog':       (ctypes.c_int, [_c_str, _c_str, _c_double_p, ctypes.c_uint, _c_uint_p]),
+    'libdaq_adc_read_analog_sync':  (ctypes.c_int, [_c_str, _c_str, _c_double_p, ctypes.c_uint, _c_uint_p, ctypes.c_int]),
+    'libdaq_adc_send_trigger':      (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_adc_stop':              (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_adc_start_task':        (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_adc_stop_task':         (ctypes.c_int, [_c_str, _c_str]),
+    'libdaq_adc_config_triggerSrc': (ctypes.c_int, [_c_str, _c_str, _c_u8, _c_u8, _c_u8, _c_u8, _c_u8, ctypes.c_int]),
+    'libdaq_adc_select_triggerSrc': (ctypes.c_int, [_c_str, _c_str, _c_u8]),
+    'libdaq_adc_extractChannelData':(ctypes.c_int, [_c_double_p, ctypes.c_uint, _c_u8, _c_u8, _c_double_p]),
+    'libdaq_adc_set_realtime':      (ctypes.c_int, [_c_str, _c_str, ctypes.c_int]),
+}
+
+class _lazy_api(object):
+    """
+    placeholder of an API function until the native library is loaded,
+    the first call loads the library and replaces every placeholder by the declared function
+    """
+    __slots__=('name',)
+
+    def __init__(self,name):
+        self.name=name
+
+    def __call__(self,*args):
+        libdaq_load_library()
+        return globals()['_'+self.name](*args)
+
+def _bind(name):
+    """
+    get API function by name, bound lazily so that importing this module does not load the library
+    """
+    if name not in LIBDAQ_PROTOTYPES:
+        raise KeyError("no prototype declared for %s" % name)
+    return _lazy_api(name)
+
+# per-call instrumentation, functions are wrapped at bind time only when enabled
+_instrument_enabled = None    # None: not set, LIBDAQ_INSTRUMENT environment variable decides on load
+_instrument_stats = {}        # API name -> _call_stats
+_instrument_reporter = None
+_LATENCY_BUCKETS = 40         # bucket i counts calls of 2**(i-1) <= latency_ns < 2**i
+
+class _call_stats(object):
+    __slots__=('calls','total_ns','max_ns','histogram','errors')
+
+    def __init__(self):
+        self.histogram=[0]*_LATENCY_BUCKETS
+        self.errors={}   # errorcode -> count
+        self.reset()
+
+    def reset(self):
+        # in place, wrappers keep references to histogram and errors
+        self.calls=0
+        self.total_ns=0
+        self.max_ns=0
+        self.histogram[:]=[0]*_LATENCY_BUCKETS
+        self.errors.clear()
+
+def _instrumented(name, func):
+    """
+    wrap API function to record call count, latency histogram and negative error codes,
+    counters are updated without lock to keep overhead low, a few counts may be lost under contention
+    """
+    stats=_instrument_stats.setdefault(name,_call_stats())
+    histogram=stats.histogram
+    errors=stats.errors
+    clock=time.perf_counter_ns
+    last=_LATENCY_BUCKETS-1
+
+    def call(*args):
+        start=clock()
+        result=func(*args)
+        ns=clock()-start
+        stats.calls+=1
+        stats.total_ns+=ns
+        if ns>stats.max_ns:
+            stats.max_ns=ns
+        histogram[min(ns.bit_length(),last)]+=1
+        if result.__class__ is int and result<0:
+            errors[result]=errors.get(result,0)+1
+        return result
+    call.__name__=name
+    call.__wrapped__=func
+    return call
+
+def _apply_instrumentation():
+    # bind loaded functions, instrumented or raw; placeholders stay until the library is loaded
+    for name,func in _raw_api.items():
+        globals()['_'+name]=_instrumented(name,func) if _instrument_enabled else func
+
+def libdaq_set_instrumentation(enable, report_interval=0):
+    """
+    enable or disable per-call instrumentation of all API functions, overrides LIBDAQ_INSTRUMENT
+    Args: enable: True record call counts, latency histograms and error codes
+          report_interval: > 0 print libdaq_instrumentation_summary() to stderr every report_interval seconds
+    Returns: None
+    """
+    global _instrument_enabled, _instrument_reporter
+    _instrument_enabled=bool(enable)
+    if _raw_api:
+        _apply_instrumentation()
+    if _instrument_reporter is not None:
+        _instrument_reporter.set()
+        _instrument_reporter=None
+    if enable and report_interval>0:
+        stop=_instrument_reporter=threading.Event()
+        def report():
+            while not stop.wait(report_interval):
+                sys.stderr.write(libdaq_instrumentation_summary()+'\n')
+        threading.Thread(target=report,name='libdaq-instrument',daemon=True).start()
+
+def libdaq_instrumentation_snapshot(reset=False):
+    """
+    get instrumentation counters of called API functions
+    Args: reset: True clear counters after taking the snapshot
+    Returns: dict API name -> dict with calls, total_ms, mean_us, max_us, p50_us, p99_us
+             (upper bound of the log2 histogram bucket), histogram {bucket upper bound us: count},
+             errors {errorcode: (count, description)}
+    """
+    snapshot={}
+    for name,stats in list(_instrument_stats.items()):
+        if stats.calls==0:
+            continue
+        histogram=list(stats.histogram)
+        calls=sum(histogram)
+        percentile={}
+        for p in (50,99):
+            target=calls*p/100.0
+            total=0
+            for bucket,count in enumerate(histogram):
+                total+=count
+                if total>=target:
+                    percentile[p]=min(1<<bucket,stats.max_ns)/1000.0
+                    break
+        snapshot[name]={
+            'calls':stats.calls,
+            'total_ms':stats.total_ns/1e6,
+            'mean_us':stats.total_ns/1000.0/stats.calls,
+            'max_us':stats.max_ns/1000.0,
+            'p50_us':percentile.get(50,0.0),
+            'p99_us':percentile.get(99,0.0),
+            'histogram':{(1<<bucket)/1000.0:count for bucket,count in enumerate(histogram) if count},
+            'errors':{code:(count,libdaq_get_error_desc(code)) for code,count in list(stats.errors.items())},
+        }
+        if reset:
+            stats.reset()
+    return snapshot
+
+def libdaq_instrumentation_summary(reset=False):
+    """
+    instrumentation counters as text table, most total time first
+    Args: reset: True clear counters
+    Returns: str
+    """
+    snapshot=libdaq_instrumentation_snapshot(reset)
+    lines=['%-34s %9s %10s %9s %9s %9s %10s  %s' % ('function','calls','total(ms)','mean(us)','p99(us)','max(us)','errors','')]
+    for name,item in sorted(snapshot.items(),key=lambda kv:-kv[1]['total_ms']):
+        errors=', '.join('%d x%d %s' % (code,count,desc) for code,(count,desc) in sorted(item['errors'].items()))
+        lines.append('%-34s %9d %10.1f %9.1f %9.1f %9.1f %10d  %s' % (name,item['calls'],item['total_ms'],item['mean_us'],
+                     item['p99_us'],item['max_us'],sum(count for count,desc in item['errors'].values()),errors))
+    return '\n'.join(lines)
+
+# API for library
+_libdaq_init = _bind('libdaq_init')
+_libdaq_exit = _bind('libdaq_exit')
+_libdaq_scan_device = _bind('libdaq_scan_device')
+_libdaq_set_option = _bind('libdaq_set_option')
+_libdaq_get_version =_bind('libdaq_get_version')
+_libdaq_get_error_desc = _bind('libdaq_get_error_desc')
+_libdaq_get_error_str  = _bind('libdaq_get_error_str')
+
+# API for devices
+_libdaq_device_get_count = _bind('libdaq_device_get_count')
+_libdaq_device_rename_byindex = _bind('libdaq_device_rename_byindex')
+_libdaq_device_rename_byname = _bind('libdaq_device_rename_byname')
+_libdaq_device_get_name = _bind('libdaq_device_get_name')
+_libdaq_device_get_version=_bind('libdaq_device_get_version')
+_libdaq_device_setUID_byindex=_bind('libdaq_device_setUID_byindex')
+_libdaq_device_setUID_byname=_bind('libdaq_device_setUID_byname')
+
+# API for GPIO
+_libdaq_gpio_get_iocount=_bind('libdaq_gpio_get_iocount')
+_libdaq_gpio_get_ioattrs=_bind('libdaq_gpio_get_ioattrs')
+_libdaq_gpio_get_config=_bind('libdaq_gpio_get_config')
+_libdaq_gpio_set_config=_bind('libdaq_gpio_set_config')
+_libdaq_gpio_write_bit = _bind('libdaq_gpio_write_bit')
+_libdaq_gpio_write_port = _bind('libdaq_gpio_write_port')
+_libdaq_gpio_read_bit = _bind('libdaq_gpio_read_bit')
+_libdaq_gpio_read_port = _bind('libdaq_gpio_read_port')
+
+# API for DAC
+_libdaq_dac_set_wavepara = _bind('libdaq_dac_set_wavepara')
+_libdaq_dac_set_value=_bind('libdaq_dac_set_value')
+_libdaq_dac_start = _bind('libdaq_dac_start')
+_libdaq_dac_stop = _bind('libdaq_dac_stop')
+
+# API for ADC
+_libdaq_adc_config_channel=_bind('libdaq_adc_config_channel')
+_libdaq_adc_config_channel_ex=_bind('libdaq_adc_config_channel_ex')
+_libdaq_adc_calibrate_channel=_bind('libdaq_adc_calibrate_channel')
+_libdaq_adc_singleSample=_bind('libdaq_adc_singleSample')
+_libdaq_adc_set_sample_parameter    = _bind('libdaq_adc_set_sample_parameter')
+_libdaq_adc_set_sample_parameter_ex = _bind('libdaq_adc_set_sample_parameter_ex')
+_libdaq_adc_clear_buffer=_bind('libdaq_adc_clear_buffer')
+_libdaq_adc_read_analog = _bind('libdaq_adc_read_analog')
+_libdaq_adc_read_analog_sync = _bind('libdaq_adc_read_analog_sync')
+_libdaq_adc_send_trigger=_bind('libdaq_adc_send_trigger')
+_libdaq_adc_stop=_bind('libdaq_adc_stop')
+_libdaq_adc_start_task=_bind('libdaq_adc_start_task')
+_libdaq_adc_stop_task=_bind('libdaq_adc_stop_task')
+_libdaq_adc_config_triggerSrc=_bind('libdaq_adc_config_triggerSrc')
+_libdaq_adc_select_triggerSrc=_bind('libdaq_adc_select_triggerSrc')
+_libdaq_adc_extractChannelData=_bind('libdaq_adc_extractChannelData')
+_libdaq_adc_set_realtime=_bind('libdaq_adc_set_realtime')
+
 '''
     libdaq wrapped definition
 '''
 
+# error code
+LIBDAQ_SUCCESS                     =0   #Success (no error)
+LIBDAQ_ERROR_IO                    =-1  #Input/output error
+LIBDAQ_ERROR_INVALID_PARAM         =-2  #Invalid parameter
+LIBDAQ_ERROR_ACCESS                =-3  #Access denied (insufficient permissions)
+LIBDAQ_ERROR_NO_DEVICE             =-4  #No such device (it may have been disconnected)
+LIBDAQ_ERROR_NOT_FOUND             =-5  #Entity not found
+LIBDAQ_ERROR_BUSY                  =-6  #Resource busy
+LIBDAQ_ERROR_TIMEOUT               =-7  #Operation timed out
+LIBDAQ_ERROR_OVERFLOW              =-8  #Overflow
+LIBDAQ_ERROR_PIPE                  =-9  #Pipe error
+LIBDAQ_ERROR_INTERRUPTED           =-10 #System call interrupted (perhaps due to signal)
+LIBDAQ_ERROR_NO_MEM                =-11 #Insufficient memory
+LIBDAQ_ERROR_NOT_SUPPORTED         =-12 #Operation not supported or unimplemented on this platform
+LIBDAQ_ERROR_NO_MODULE             =-13 #no such module
+LIBDAQ_ERROR_MODULE_TYPE           =-14 #module not match
+LIBDAQ_ERROR_NO_GPIOPIN            =-15 #no such gpio pin
+LIBDAQ_ERROR_GPIO_CONFIG           =-16 #gpio pin with config error
+LIBDAQ_ERROR_GPIO_INDEX            =-17 #gpio pin with index error
+LIBDAQ_ERROR_GPIOPIN_NOT_SUPPORTED =-18 #operarion on such pin is not supported
+LIBDAQ_ERROR_REPLY                 =-19 #deivce reply error
+LIBDAQ_ERROE_TRANSFER              =-20 #device transfer status error
+LIBDAQ_ERROR_OTHER                 =-99 #Other error
+
 # libdaq access mode
 LIBDAQ_ACCESS_MODE_DEV_NAME_SN_BOTH =0x00  #defaut，both device name and SN can bt used 
 LIBDAQ_ACCESS_MODE_DEV_NAME_ONLY    =0x01  #only device name can bt used  
@@ -167,10 +535,42 @@ CHANNEL_RANGE_N20mA_P20mA       =65 #range:+/-20mA
 CHANNEL_RANGE_0_P40mA           =66 #range:0-40mA
 CHANNEL_RANGE_N40mA_P40mA       =67 #range:+/-40mA
 
+# channel range -> (low, high) limit, in V for voltage range and mA for current range
+CHANNEL_RANGE_LIMITS = {
+    CHANNEL_RANGE_0_P1V: (0.0, 1.0),
+    CHANNEL_RANGE_0_P2V: (0.0, 2.0),
+    CHANNEL_RANGE_0_P2V5: (0.0, 2.5),
+    CHANNEL_RANGE_0_P5V: (0.0, 5.0),
+    CHANNEL_RANGE_0_P10V: (0.0, 10.0),
+    CHANNEL_RANGE_N78mV125_P78mV125: (-0.078125, 0.078125),
+    CHANNEL_RANGE_N156mV25_P156mV25: (-0.15625, 0.15625),
+    CHANNEL_RANGE_N312mV5_P312mV5: (-0.3125, 0.3125),
+    CHANNEL_RANGE_N0V256_P0V256: (-0.256, 0.256),
+    CHANNEL_RANGE_N0V512_P0V512: (-0.512, 0.512),
+    CHANNEL_RANGE_N0V625_P0V625: (-0.625, 0.625),
+    CHANNEL_RANGE_N1V_P1V: (-1.0, 1.0),
+    CHANNEL_RANGE_N1V024_P1V024: (-1.024, 1.024),
+    CHANNEL_RANGE_N1V25_P1V25: (-1.25, 1.25),
+    CHANNEL_RANGE_N2V_P2V: (-2.0, 2.0),
+    CHANNEL_RANGE_N2V048_P2V048: (-2.048, 2.048),
+    CHANNEL_RANGE_N2V5_P2V5: (-2.5, 2.5),
+    CHANNEL_RANGE_N4V096_P4V096: (-4.096, 4.096),
+    CHANNEL_RANGE_N5V_P5V: (-5.0, 5.0),
+    CHANNEL_RANGE_N10V_P10V: (-10.0, 10.0),
+    CHANNEL_RANGE_0_P20mA: (0.0, 20.0),
+    CHANNEL_RANGE_N20mA_P20mA: (-20.0, 20.0),
+    CHANNEL_RANGE_0_P40mA: (0.0, 40.0),
+    CHANNEL_RANGE_N40mA_P40mA: (-40.0, 40.0),
+}
+
 # dac trigger mode
 DAC_TRIGGER_MODE_AUTO=0x00  # auto start
 DAC_TRIGGER_MODE_SOFT=0x01  # soft trigger
 DAC_TRIGGER_MODE_HARD=0x02  # hard trigger,now is not supported
+# max wave points of one upload: buflen of dac_wavepara is unsigned int in libdaq.h; libdaq.h documents
+# no device buffer size, waves the device cannot hold are rejected by the driver with its error code
+DAC_MAX_WAVE_POINTS=0xFFFFFFFF
+DAC_OUTPUT_RANGE=(-10.0,10.0) # DAC output voltage range (V)
 
 # adc sample mode
 ADC_SAMPLE_MODE_SEQUENCE  = 0x00 #sequence mode
@@ -243,6 +643,7 @@ def libdaq_init():
 	Returns: errorcode
 	Raises: None
 	"""
+    libdaq_invalidate_config()
     errorcode = _libdaq_init()
     return errorcode
 
@@ -252,8 +653,18 @@ def libdaq_exit():
 	Args: None
 	Returns: None
 	"""
+    libdaq_invalidate_config()
     _libdaq_exit()
 
+def libdaq_scan_device():
+    """
+    rescan the bus for devices plugged or unplugged after libdaq_init, without re-init of the library;
+    call it through libdaq_exclusive while streams may be running
+    Args: None
+    Returns: errorcode
+    """
+    return _libdaq_scan_device()
+
 def libdaq_set_option(option):
     """
 	set libdaq access mode
@@ -263,16 +674,97 @@ def libdaq_set_option(option):
         LIBDAQ_ACCESS_MODE_DEV_SN_ONLY   : only device SN can bt used 
 	Returns: None
 	"""
+    global _access_option
     _libdaq_set_option(option)
-'''
+    _access_option = option
+
+# access coordination: long running users of devices by name (streams, pollers) register with
+# libdaq_access_begin/libdaq_access_end, libdaq_exclusive (device rescan, access mode switch) runs only while none runs
+_access_cond = threading.Condition()
+_access_users = 0
+_access_exclusive = False
+_access_option = LIBDAQ_ACCESS_MODE_DEV_NAME_SN_BOTH  # driver default
+
+def libdaq_get_option():
+    """
+    get access mode last set by libdaq_set_option, LIBDAQ_ACCESS_MODE_DEV_NAME_SN_BOTH when never set
+    Returns: option
+    """
+    return _access_option
+
+def libdaq_access_begin():
+    """
+    register a long running user of devices by name, e.g. a stream thread; waits while
+    libdaq_exclusive runs
+    Returns: None
+    """
+    global _access_users
+    with _access_cond:
+        while _access_exclusive:
+            _access_cond.wait()
+        _access_users += 1
+
+def libdaq_access_end():
+    """end a registration of libdaq_access_begin"""
+    global _access_users
+    with _access_cond:
+        _access_users -= 1
+        _access_cond.notify_all()
+
+def libdaq_exclusive(func):
+    """
+    call func() only when no user is registered by libdaq_access_begin, users starting meanwhile wait
+    Args: func: callable without arguments
+    Returns: (True, result of func), or (False, None) when devices are in use and func was not called
+    """
+    global _access_exclusive
+    with _access_cond:
+        if _access_users or _access_exclusive:
+            return False, None
+        _access_exclusive = True
+    try:
+        return True, func()
+    finally:
+        with _access_cond:
+            _access_exclusive = False
+            _access_cond.notify_all()
+
+def libdaq_with_option(option, func):
+    """
+    call func() with access mode option set, then restore the previous access mode; by libdaq_exclusive
+    Args: option: LIBDAQ_ACCESS_MODE_*, func: callable without arguments
+    Returns: (True, result of func), or (False, None) when devices are in use and the mode was not switched
+    """
+    def switched():
+        previous = _access_option
+        libdaq_set_option(option)
+        try:
+            return func()
+        finally:
+            libdaq_set_option(previous)
+    return libdaq_exclusive(switched)
+
+@functools.lru_cache(maxsize=64)
 def libdaq_get_error_desc(error_code):
-    rst= _libdaq_get_error_desc(error_code)
-    return ctypes.string_at(rst).decode("utf-8")
+    """
+    get description of error code, e.g. 'Operation timed out'
+    Args: error_code
+    Returns: str
+    """
+    libdaq_load_library()
+    rst=_raw_api['libdaq_get_error_desc'](error_code)
+    return rst.decode("utf-8",'replace') if rst else ''
 
+@functools.lru_cache(maxsize=64)
 def libdaq_get_error_str(error_code):
-    rst= libdaq_get_error_str(error_code)
-    return ctypes.string_at(rst).decode("utf-8")
-'''
+    """
+    get name of error code, e.g. 'LIBDAQ_ERROR_TIMEOUT'
+    Args: error_code
+    Returns: str
+    """
+    libdaq_load_library()
+    rst=_raw_api['libdaq_get_error_str'](error_code)
+    return rst.decode("utf-8",'replace') if rst else ''
 
 def libdaq_get_version():
     """
@@ -309,7 +801,7 @@ def libdaq_device_get_name(index):
 	"""
     device_name = ctypes.create_string_buffer(b'0', 255) # default max device name length is 255
 
-    errorcode = _libdaq_device_get_name(index, ctypes.byref(device_name), 100)
+    errorcode = _libdaq_device_get_name(index, device_name, 100)
     return errorcode,device_name.value
 
 def libdaq_device_rename_byindex(index, newname):
@@ -350,6 +842,8 @@ def libdaq_device_get_version(device_name):
 	"""
     _hw_version_c=hw_version_c() 
     errorcode = _libdaq_device_get_version(device_name, ctypes.byref(_hw_version_c))
+    if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+        _device_lost(device_name)
     _hw_version=hw_version()
     _hw_version.firmware_major=_hw_version_c.firmware_major
     _hw_version.firmware_minor=_hw_version_c.firmware_minor
@@ -372,7 +866,7 @@ def libdaq_device_setUID_byindex(index,state):
     if not state in [UID_ON,UID_OFF]:
         raise TypeError("state  type must be value of UID_state")
     
-    errorcode=_libdaq_device_setUID_byindex(index,ctypes.c_uint8(state))
+    errorcode=_libdaq_device_setUID_byindex(index,state)
     return errorcode
 
 def libdaq_device_setUID_byname(device_name,state):
@@ -386,19 +880,115 @@ def libdaq_device_setUID_byname(device_name,state):
 
     if not state in [UID_ON,UID_OFF]:
         raise TypeError("state  type must be value of UID_state")		
-    errorcode=_libdaq_device_setUID_byname(device_name,ctypes.c_uint8(state))
+    errorcode=_libdaq_device_setUID_byname(device_name,state)
+    if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+        _device_lost(device_name)
     return errorcode
 
+# C scalar types in libdaq.h and the ctypes type they map to
+_C_SCALAR_TYPES = {
+    'void': None,
+    'int': ctypes.c_int,
+    'unsigned int': ctypes.c_uint,
+    'unsigned char': ctypes.c_ubyte,
+    'double': ctypes.c_double,
+}
+
+def _is_pointer_type(ctype):
+    return ctype in (ctypes.c_char_p, ctypes.c_void_p) or issubclass(ctype, ctypes._Pointer)
+
+def _parse_c_type(decl):
+    """
+    get C type of a parameter or return value declaration in libdaq.h
+    Returns: 'pointer' or C scalar type name
+    """
+    if '*' in decl:
+        return 'pointer'
+    words=decl.replace('const ','').split()
+    if len(words) > 1 and ' '.join(words) not in _C_SCALAR_TYPES:
+        words=words[:-1] # drop parameter name
+    return ' '.join(words)
+
+def libdaq_check_prototypes(header_path=None):
+    """
+    check LIBDAQ_PROTOTYPES against the C declarations in libdaq.h
+    Args: header_path: path of libdaq.h, default is daqlib/include/libdaq.h
+    Returns: list of mismatch description, empty if all prototypes match
+    """
+    if header_path is None:
+        header_path=os.path.join(dir,'daqlib','include','libdaq.h')
+    with open(header_path,encoding='utf-8-sig') as f:
+        header=re.sub(r'//[^\n]*','',f.read())
+
+    declarations={}
+    for restype,name,args in re.findall(r'DLL_API[ \t]+([^\n;]+?)\s*DLL_CALL\s+(\w+)\s*\((.*?)\)\s*;',header,re.S):
+        args=[arg.strip() for arg in args.split(',') if arg.strip() not in ('','void')]
+        declarations[name]=(_parse_c_type(restype),[_parse_c_type(arg) for arg in args])
+
+    mismatch=[]
+    for name,(restype,argtypes) in LIBDAQ_PROTOTYPES.items():
+        if name not in declarations:
+            mismatch.append('%s: not declared in libdaq.h' % name)
+            continue
+        c_restype,c_argtypes=declarations[name]
+        expected=[restype]+list(argtypes)
+        for pos,(c_type,ctype) in enumerate(zip([c_restype]+c_argtypes,expected)):
+            if c_type == 'pointer':
+                ok = ctype is not None and _is_pointer_type(ctype)
+            else:
+                ok = c_type in _C_SCALAR_TYPES and _C_SCALAR_TYPES[c_type] is ctype
+            if not ok:
+                what='return type' if pos == 0 else 'argument %d' % pos
+                mismatch.append('%s: %s is %s in libdaq.h, declared as %s' % (name,what,c_type,getattr(ctype,'__name__',ctype)))
+        if len(c_argtypes) != len(argtypes):
+            mismatch.append('%s: %d arguments in libdaq.h, declared with %d' % (name,len(c_argtypes),len(argtypes)))
+    return mismatch
+
+@functools.lru_cache(maxsize=256)
+def _array_type(ctype, length):
+    """
+    cached ctypes array type, avoid building a new type as ctype*length on every call
+    Args: ctype: ctypes element type, length: array length
+    Returns: ctypes array type
+    """
+    return ctype*length
+
+def _ndarray_buffer(out, datalen):
+    """
+    check caller supplied buffer for zero-copy ADC read
+    Args: out: C-contiguous float64 numpy.ndarray
+          datalen: data count the driver will write
+    Returns: 1-D float64 ndarray, at least datalen long
+    Raises: TypeError, ValueError
+    """
+    if not isinstance(out, np.ndarray) or out.dtype != np.float64:
+        raise TypeError("out type must be numpy.ndarray of float64")
+    if not out.flags['C_CONTIGUOUS'] or not out.flags['WRITEABLE']:
+        raise ValueError("out must be C-contiguous and writeable")
+    if out.size < datalen:
+        raise ValueError("out size must be not less than datalen")
+    return out.reshape(-1)
+
 
 class libdaq_gpio(object):
     def __init__(self, device_name, module_name):
         self.__device_name = device_name
         self.__module_name = module_name
         (errorcode,self.__io_count)=self.get_iocount()
+        # port buffer reused by every port read/write
+        self.__port_buf=_array_type(ctypes.c_uint8,self.__io_count)()
+        self.__bit_val=ctypes.c_uint8(0)
+        self.__bit_val_p=ctypes.byref(self.__bit_val)
+
+    @property
+    def io_count(self):
+        return self.__io_count
 
     def get_iocount(self):
         iocount=ctypes.c_uint8(0)
         errorcode=_libdaq_gpio_get_iocount(self.__device_name,self.__module_name,ctypes.byref(iocount))
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode,iocount.value
 
     def write_bit(self,ioIndex,BitVal):
@@ -407,8 +997,9 @@ class libdaq_gpio(object):
 
         if not isinstance(BitVal, int):
             raise TypeError("BitVal  type must be int")
-        _BitVal=ctypes.c_uint8(BitVal)
-        errorcode=_libdaq_gpio_write_bit(self.__device_name, self.__module_name, ioIndex, _BitVal)
+        errorcode=_libdaq_gpio_write_bit(self.__device_name, self.__module_name, ioIndex, BitVal)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode
 
     def write_port(self,PortVal):
@@ -418,156 +1009,462 @@ class libdaq_gpio(object):
         if len(PortVal) < self.__io_count:
             raise ValueError('input argurment PortVal size must same as iocount!')
 
-        type_c_uint8_array_IO=ctypes.c_uint8*self.__io_count
-        _PortVal=type_c_uint8_array_IO(*PortVal) # 操作符 * 展开参数 
-        errorcode=_libdaq_gpio_write_port(self.__device_name,self.__module_name,ctypes.byref(_PortVal))
+        self.__port_buf[:]=PortVal[0:self.__io_count]
+        errorcode=_libdaq_gpio_write_port(self.__device_name,self.__module_name,self.__port_buf)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        return errorcode
+
+    def write_port_mask(self,mask):
+        """
+        write all output pins from a bitmask
+        Args: mask: int, bit i is the level of pin i
+        Returns: errorcode
+        """
+        port_buf=self.__port_buf
+        for i in range(self.__io_count):
+            port_buf[i]=(mask>>i)&1
+        errorcode=_libdaq_gpio_write_port(self.__device_name,self.__module_name,port_buf)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode
         
     def read_bit(self,ioIndex):
-        BitVal=ctypes.c_uint8(0)
-        errorcode=_libdaq_gpio_read_bit(self.__device_name,self.__module_name,ioIndex,ctypes.byref(BitVal))
-        return errorcode,BitVal.value
+        errorcode=_libdaq_gpio_read_bit(self.__device_name,self.__module_name,ioIndex,self.__bit_val_p)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        return errorcode,self.__bit_val.value
         
     def read_port(self):
-        type_c_uint8_array_IO=ctypes.c_uint8*self.__io_count
-        _PortVal=type_c_uint8_array_IO()
-        errorcode=_libdaq_gpio_read_port(self.__device_name,self.__module_name,ctypes.byref(_PortVal))
-        return errorcode , list(_PortVal)
+        errorcode=_libdaq_gpio_read_port(self.__device_name,self.__module_name,self.__port_buf)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        return errorcode , list(self.__port_buf)
+
+    def read_port_mask(self):
+        """
+        read all pins as bitmask
+        Returns: errorcode, int with bit i set when pin i is high
+        """
+        errorcode=_libdaq_gpio_read_port(self.__device_name,self.__module_name,self.__port_buf)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        mask=0
+        for i,value in enumerate(self.__port_buf):
+            if value:
+                mask|=1<<i
+        return errorcode,mask
+
+# configuration last sent to each device module, shared by all wrapper objects of the module;
+# _config_lock guards the table, the generation and clearing/storing values across threads
+_config_shadows = {}
+_config_generation = 0
+_config_lock = threading.Lock()
+_MISSING = object()
+
+class _config_shadow(object):
+    """
+    shadow copy of device module configuration, a setting equal to the shadow is not sent again;
+    cleared by libdaq_init/libdaq_exit/libdaq_set_backend/libdaq_invalidate_config, when any call
+    of the device returns LIBDAQ_ERROR_NO_DEVICE and on DeviceRegistry hot-plug events
+    """
+    def __init__(self):
+        self.values = {}
+        self.generation = _config_generation
+        self.avoided = 0
+        self.sent = 0
+
+    def get(self, key, default=None):
+        if self.generation != _config_generation:
+            with _config_lock:
+                if self.generation != _config_generation:
+                    self.values.clear()
+                    self.generation = _config_generation
+        return self.values.get(key, default)
+
+    def unchanged(self, key, value):
+        if self.get(key, _MISSING) == value:
+            self.avoided += 1
+            return True
+        return False
+
+    def update(self, key, value, errorcode):
+        # LIBDAQ_ERROR_NO_DEVICE has already cleared all modules of the device (_device_lost)
+        self.sent += 1
+        with _config_lock:
+            if errorcode == LIBDAQ_SUCCESS:
+                self.values[key] = value
+            else:
+                self.values.pop(key, None)
+
+def _config_shadow_of(device_name, module_name):
+    key = (device_name, module_name)
+    shadow = _config_shadows.get(key)
+    if shadow is None:
+        with _config_lock:
+            shadow = _config_shadows.setdefault(key, _config_shadow())
+    return shadow
+
+def libdaq_invalidate_config(device_name=None):
+    """
+    forget configuration shadow, next configuration calls are sent to the driver again,
+    e.g. after device reset or reconnect
+    Args: device_name: only this device, None all devices
+    Returns: None
+    """
+    global _config_generation
+    with _config_lock:
+        if device_name is None:
+            _config_generation += 1
+            return
+        for (name, module_name), shadow in _config_shadows.items():
+            if name == device_name:
+                shadow.values.clear()
+
+def _device_lost(device_name):
+    # a call returned LIBDAQ_ERROR_NO_DEVICE: unplugged or reset, the device comes back with default settings
+    libdaq_invalidate_config(device_name)
+
+def _wave_array(wave_buf):
+    """
+    DAC wave data as C-contiguous float64 ndarray, float64 arrays are used without copy
+    Args: wave_buf: list or numpy.ndarray
+    Returns: 1-D float64 ndarray
+    Raises: TypeError
+    """
+    if isinstance(wave_buf, np.ndarray):
+        wave = np.ascontiguousarray(wave_buf, dtype=np.float64)
+        return wave if wave.ndim == 1 else wave.reshape(-1)
+    if isinstance(wave_buf, list):
+        return np.array(wave_buf, dtype=np.float64)
+    raise TypeError("wave_buf type must be list or numpy.ndarray")
+
+def _wave_digest(wave):
+    """
+    content hash of float64 wave array
+    """
+    return hashlib.blake2b(wave, digest_size=16).digest()
+
 
 class libdaq_dac(object):
-    def __init__(self, device_name, module_name):
+    def __init__(self, device_name, module_name, cache_bytes=64*1024*1024):
         self.__device_name = device_name
         self.__module_name = module_name
+        # list profiles converted before, least recently used first:
+        # id(list) -> (shallow copy, (content hash, length), prepared read-only float64 array);
+        # an unchanged list is recognised by comparing with the copy, without conversion and hashing.
+        # arrays are not kept: they are uploaded as passed and hashed on every call
+        self.__list_cache = collections.OrderedDict()
+        self.__cache_bytes = cache_bytes
+        self.__cached_bytes = 0
+        self.__shadow = _config_shadow_of(device_name, module_name)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.uploads_skipped = 0
+
+    @staticmethod
+    def __entry_bytes(entry):
+        # prepared array plus the pointer array of the list copy; the float objects are shared with the caller
+        return entry[2].nbytes + 8*len(entry[0])
+
+    def __lookup(self, wave_buf):
+        """
+        cache key and float64 array of wave_buf; arrays are used as passed (C-contiguous float64 without copy),
+        lists are converted once and taken from the list cache while unchanged
+        Returns: ((content hash, length), 1-D float64 ndarray)
+        """
+        if not isinstance(wave_buf, list):
+            wave = _wave_array(wave_buf)
+            return (_wave_digest(wave), wave.size), wave
+
+        cache = self.__list_cache
+        entry = cache.get(id(wave_buf))
+        if entry is not None and entry[0] == wave_buf:
+            # same list profile as before: no conversion, no hashing
+            self.cache_hits += 1
+            cache.move_to_end(id(wave_buf))
+            return entry[1], entry[2]
+
+        self.cache_misses += 1
+        wave = _wave_array(wave_buf)
+        wave.setflags(write=False)
+        key = (_wave_digest(wave), wave.size)
+        if entry is not None:
+            self.__cached_bytes -= self.__entry_bytes(cache.pop(id(wave_buf)))
+        entry = (list(wave_buf), key, wave)
+        size = self.__entry_bytes(entry)
+        if size <= self.__cache_bytes:
+            cache[id(wave_buf)] = entry
+            self.__cached_bytes += size
+            while self.__cached_bytes > self.__cache_bytes:
+                self.__cached_bytes -= self.__entry_bytes(cache.popitem(last=False)[1])
+        return key, wave
+
+    def __upload(self, wave_buf, cycles, frequency, trigger_mode):
+        wave_key, wave = self.__lookup(wave_buf)
+        key = wave_key + (cycles, frequency, trigger_mode)
+
+        shadow = self.__shadow
+        if shadow.unchanged('wave', key):
+            # same wave and playback parameters already on the device, skip upload
+            self.uploads_skipped += 1
+            if trigger_mode != DAC_TRIGGER_MODE_AUTO or (shadow.get('playing') and cycles == 0):
+                return LIBDAQ_SUCCESS
+            return self.start()  # auto mode starts output on upload, restart instead
+
+        errorcode = self.write_wave(wave, cycles, frequency, trigger_mode)
+        shadow.update('wave', key, errorcode)
+        return errorcode
+
+    def write_wave(self, wave, cycles, frequency, trigger_mode):
+        """
+        upload wave without the wave cache, e.g. for chunks of a streamed wave
+        Args:
+            wave: C-contiguous 1-D float64 numpy.ndarray, 1..DAC_MAX_WAVE_POINTS points
+            cycles, frequency, trigger_mode: as set_wavepara_ex
+        Returns: errorcode
+        Raises: ValueError
+        """
+        if wave.size == 0 or wave.size > DAC_MAX_WAVE_POINTS:
+            raise ValueError("wave length must be 1..%d" % DAC_MAX_WAVE_POINTS)
+        dac_cfg = dac_wavepara_c()
+        dac_cfg.buf = wave.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+        dac_cfg.buflen = wave.size
+        dac_cfg.cycles = cycles
+        dac_cfg.frequency = frequency
+        dac_cfg.trigger_mode = trigger_mode
+        values = self.__shadow.values
+        values.pop('wave', None)
+        values.pop('value', None)
+        errorcode = _libdaq_dac_set_wavepara(self.__device_name,self.__module_name,ctypes.byref(dac_cfg))
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        values['playing'] = errorcode == LIBDAQ_SUCCESS and trigger_mode == DAC_TRIGGER_MODE_AUTO
+        return errorcode
 
     def set_wavepara_ex(self, wave_buf, cycles, frequency, trigger_mode):
         """
         libdaq dac config API
         Args:
-            wave_buf:dac wave data list
+            wave_buf: dac wave data list, or numpy.ndarray (C-contiguous float64 is used without copy)
             cycles,
             frequency,
             startmode
-        Returns:
-        Raises:
+        Returns: errorcode, upload is skipped when the same wave and parameters are already on the device
+        Raises: TypeError, ValueError when wave is empty or longer than DAC_MAX_WAVE_POINTS
         """
-        if not isinstance(wave_buf, list):
-            raise TypeError("wave_buf  type must be list")
-
-        dac_cfg=dac_wavepara_c()        
-        type_double_arrary=ctypes.c_double*len(wave_buf) # double array
-        
-        buf=type_double_arrary(*wave_buf)
-        buf_p=ctypes.POINTER(ctypes.c_double)()
-        buf_p.contents=buf
-
-        dac_cfg.buf=buf_p
-        dac_cfg.buflen=len(wave_buf)
-        dac_cfg.cycles=cycles #the data in buf output three times
-        dac_cfg.frequency=frequency #10KHz
-        dac_cfg.trigger_mode=trigger_mode # auto trigger mode
-
-        errorcode = _libdaq_dac_set_wavepara(self.__device_name,self.__module_name,ctypes.byref(dac_cfg))
-        return errorcode
+        return self.__upload(wave_buf, cycles, frequency, trigger_mode)
 
     def set_wavepara(self, wavepara):
         """
         libdaq dac config API
         Args:
-            dac_wavepara
-        Returns:
-        Raises:
+            dac_wavepara, buf may be list or numpy.ndarray
+        Returns: errorcode, upload is skipped when the same wave and parameters are already on the device
+        Raises: TypeError, ValueError when wave is empty or longer than DAC_MAX_WAVE_POINTS
         """
         if not isinstance(wavepara, dac_wavepara):
             raise TypeError("wavepara  type must be dac_wavepara")
+        return self.__upload(wavepara.buf, wavepara.cycles, wavepara.frequency, wavepara.trigger_mode)
 
-        dac_cfg=dac_wavepara_c()        
-        type_double_arrary=ctypes.c_double*len(wavepara.buf) # double array
-        
-        buf=type_double_arrary(*wavepara.buf)
-        buf_p=ctypes.POINTER(ctypes.c_double)()
-        buf_p.contents=buf
+    def cache_stats(self):
+        """
+        get wave cache counters
+        Returns: dict with hits (unchanged list profile, no conversion and hashing), misses (list converted),
+                 uploads_skipped (wave and parameters already on the device), waves (list profiles in cache),
+                 bytes (memory held by the cache), capacity (cache_bytes) and
+                 resident (True when a wave uploaded by this object is on the device)
+        """
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'uploads_skipped': self.uploads_skipped,
+                'waves': len(self.__list_cache), 'bytes': self.__cached_bytes, 'capacity': self.__cache_bytes,
+                'resident': self.__shadow.get('wave') is not None}
 
-        dac_cfg.buf=buf_p
-        dac_cfg.buflen=len(wavepara.buf)
-        dac_cfg.cycles=wavepara.cycles #the data in buf output three times
-        dac_cfg.frequency=wavepara.frequency #10KHz
-        dac_cfg.trigger_mode=wavepara.trigger_mode # auto trigger mode
+    def config_stats(self):
+        """
+        get configuration shadow counters of this module
+        Returns: dict with avoided (calls not sent because nothing changed) and sent
+        """
+        return {'avoided': self.__shadow.avoided, 'sent': self.__shadow.sent}
 
-        errorcode = _libdaq_dac_set_wavepara(self.__device_name,self.__module_name,ctypes.byref(dac_cfg))
-        return errorcode
+    def invalidate_cache(self):
+        """forget the wave and value on the device, next calls are sent again, e.g. after device reconnect"""
+        self.__shadow.values.clear()
 
     def set_value(self,value):
-        _value = ctypes.c_double(value)
-        errorcode =_libdaq_dac_set_value(self.__device_name,self.__module_name,_value)
+        shadow = self.__shadow
+        if shadow.unchanged('value', value):
+            return LIBDAQ_SUCCESS
+        shadow.values.pop('wave', None)
+        shadow.values['playing'] = False
+        errorcode =_libdaq_dac_set_value(self.__device_name,self.__module_name,value)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        shadow.update('value', value, errorcode)
         return errorcode
 
     def start(self):
         errorcode =_libdaq_dac_start(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        self.__shadow.values['playing'] = errorcode == LIBDAQ_SUCCESS
         return errorcode
 
     def stop(self):
         errorcode =_libdaq_dac_stop(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        self.__shadow.values['playing'] = False
         return errorcode
 
-
 class libdaq_adc(object):
-    def __init__(self, device_name, module_name):
+    def __init__(self, device_name, module_name, pool_size=8, shadow_config=True):
         self.__device_name = device_name
         self.__module_name = module_name
-    
-    def config_channel_ex(self,channel,chrange,couplemode,refground):
-        _channel = ctypes.c_ubyte(channel)
-        _chrange = ctypes.c_ubyte(chrange)
-        _couplemode = ctypes.c_ubyte(couplemode)
-        _refground  = ctypes.c_ubyte(refground)
-        errorcode=_libdaq_adc_config_channel_ex(self.__device_name,self.__module_name, _channel, _chrange, _couplemode, _refground)
+        # settings equal to the last ones sent to this module are skipped, see config_stats()
+        self.__shadow = _config_shadow_of(device_name, module_name) if shadow_config else None
+        # read buffer pool keyed by data length, least recently used buffer is evicted first;
+        # list reads copy out of it, arrays are views of it only with pooled=True
+        self.__pool = collections.OrderedDict()
+        self.__pool_size = pool_size
+        self.pool_hits = 0
+        self.pool_misses = 0
+
+    def __pooled_buffer(self, datalen):
+        entry = self.__pool.get(datalen)
+        if entry is not None:
+            self.pool_hits += 1
+            self.__pool.move_to_end(datalen)
+            return entry
+        self.pool_misses += 1
+        data_buf = np.zeros(datalen, dtype=np.float64)
+        entry = (data_buf, data_buf.ctypes.data_as(ctypes.POINTER(ctypes.c_double)))
+        self.__pool[datalen] = entry
+        if len(self.__pool) > self.__pool_size:
+            self.__pool.popitem(last=False)
+        return entry
+
+    def __read_buffer(self, datalen, as_array, pooled, out):
+        # buffer the driver fills: out, a new array, or the pooled one (list reads and pooled=True)
+        if out is not None:
+            data_buf=_ndarray_buffer(out,datalen)
+        elif as_array and not pooled:
+            data_buf=np.empty(datalen, dtype=np.float64)
+        else:
+            return self.__pooled_buffer(datalen)
+        return data_buf, data_buf.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+
+    def pool_stats(self):
+        """
+        get read buffer pool counters
+        Returns: dict with hits, misses, buffers(count in pool) and capacity
+        """
+        return {'hits': self.pool_hits, 'misses': self.pool_misses,
+                'buffers': len(self.__pool), 'capacity': self.__pool_size}
+
+    def clear_pool(self):
+        self.__pool.clear()
+        self.pool_hits = 0
+        self.pool_misses = 0
+
+    def __configure(self, key, value, func, *args):
+        # call func unless value of key is already set on the device
+        shadow=self.__shadow
+        if shadow is not None and shadow.unchanged(key,value):
+            return LIBDAQ_SUCCESS
+        errorcode=func(self.__device_name,self.__module_name,*args)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if shadow is not None:
+            shadow.update(key,value,errorcode)
         return errorcode
 
+    def config_stats(self):
+        """
+        get configuration shadow counters of this module
+        Returns: dict with avoided (calls not sent because nothing changed) and sent
+        """
+        if self.__shadow is None:
+            return {'avoided': 0, 'sent': 0}
+        return {'avoided': self.__shadow.avoided, 'sent': self.__shadow.sent}
+
+    def invalidate_config(self):
+        """send all settings of this module again, e.g. after device reset"""
+        if self.__shadow is not None:
+            self.__shadow.values.clear()
+
+    def config_channel_ex(self,channel,chrange,couplemode,refground):
+        return self.__configure(('channel',channel),(chrange,couplemode,refground),
+                                _libdaq_adc_config_channel_ex,channel,chrange,couplemode,refground)
+
     def calibrate_channel(self,channel,gain, offset):
-        _channel = ctypes.c_ubyte(channel)
-        _gain = ctypes.c_double(gain)
-        _offset = ctypes.c_double(offset)
-        errorcode=_libdaq_adc_calibrate_channel(self.__device_name,self.__module_name, _channel, _gain, _offset)
+        shadow=self.__shadow
+        if shadow is not None:
+            calibration=shadow.get('calibration')
+            if calibration is not None:
+                # {channel: (gain, offset)}, 0xFF means all channels
+                if channel==0xFF and calibration=={0xFF:(gain,offset)} or \
+                        channel!=0xFF and calibration.get(channel,calibration.get(0xFF))==(gain,offset):
+                    shadow.avoided+=1
+                    return LIBDAQ_SUCCESS
+        errorcode=_libdaq_adc_calibrate_channel(self.__device_name,self.__module_name, channel, gain, offset)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if shadow is not None:
+            calibration=dict(shadow.get('calibration') or {})
+            if channel==0xFF:
+                calibration={0xFF:(gain,offset)}
+            else:
+                calibration[channel]=(gain,offset)
+            shadow.update('calibration',calibration,errorcode)
         return errorcode
 
     def singleSample(self,channel_list):
         ch_len=len(channel_list)
-        type_uint8_arrary=ctypes.c_uint8*ch_len # uint8 array,
+        type_uint8_arrary=_array_type(ctypes.c_uint8,ch_len) # uint8 array,
         channel_list=type_uint8_arrary(*channel_list)
         channel_list_p=ctypes.POINTER(ctypes.c_uint8)()
         channel_list_p.contents=channel_list
 
-        type_double_arrary=ctypes.c_double*ch_len # uint8 array,
+        type_double_arrary=_array_type(ctypes.c_double,ch_len) # uint8 array,
         result_buf=type_double_arrary(0)
         result_buf_p=ctypes.POINTER(ctypes.c_double)()
         result_buf_p.contents=result_buf
 
         errorcode=_libdaq_adc_singleSample(self.__device_name,self.__module_name,channel_list_p, ch_len, result_buf_p)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode,list(result_buf)
 
     def set_sample_parameter_ex(self,channel_list,sample_mode,frequency,cycles,group_interval):
+        shadow=self.__shadow
+        value=(tuple(channel_list),sample_mode,frequency,cycles,group_interval)
+        if shadow is not None and shadow.unchanged('sample',value):
+            return LIBDAQ_SUCCESS
 
         channel_count=len(channel_list)
-        type_uint8_arrary=ctypes.c_uint8*channel_count # uint8 array,
+        type_uint8_arrary=_array_type(ctypes.c_uint8,channel_count) # uint8 array,
         channel_list=type_uint8_arrary(*channel_list)
         channel_list_p=ctypes.POINTER(ctypes.c_uint8)()
         channel_list_p.contents=channel_list
 
-        _channel_count=ctypes.c_uint(channel_count)
-        _sample_mode=ctypes.c_uint(sample_mode)
-        _frequency=ctypes.c_int(frequency)
-        _cycles=ctypes.c_int(cycles)
-        _group_interval=ctypes.c_int(group_interval)
-
-        errorcode=_libdaq_adc_set_sample_parameter_ex(self.__device_name,self.__module_name,channel_list_p,_channel_count,_sample_mode,_frequency,_cycles,_group_interval)
+        errorcode=_libdaq_adc_set_sample_parameter_ex(self.__device_name,self.__module_name,channel_list_p,channel_count,sample_mode,frequency,cycles,group_interval)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if shadow is not None:
+            shadow.update('sample',value,errorcode)
         return errorcode
 
     def set_sample_parameter(self,adc_samplepara):
+        shadow=self.__shadow
+        value=(tuple(adc_samplepara.channel_list),adc_samplepara.sample_mode,adc_samplepara.frequency,
+               adc_samplepara.cycles,adc_samplepara.group_interval)
+        if shadow is not None and shadow.unchanged('sample',value):
+            return LIBDAQ_SUCCESS
 
         _samplepara_c=adc_samplepara_c()
 
         channel_count=len(adc_samplepara.channel_list)
-        type_uint8_arrary=ctypes.c_uint8*channel_count # uint8 array,
+        type_uint8_arrary=_array_type(ctypes.c_uint8,channel_count) # uint8 array,
         channel_list=type_uint8_arrary(*adc_samplepara.channel_list)
         channel_list_p=ctypes.POINTER(ctypes.c_uint8)()
         channel_list_p.contents=channel_list
@@ -580,73 +1477,100 @@ class libdaq_adc(object):
         _samplepara_c.group_interval=adc_samplepara.group_interval
 
         errorcode=_libdaq_adc_set_sample_parameter(self.__device_name,self.__module_name,ctypes.byref(_samplepara_c))
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if shadow is not None:
+            shadow.update('sample',value,errorcode)
         return errorcode
 
 
     def clear_buffer(self):
         errorcode=_libdaq_adc_clear_buffer(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode
 
-    def read_analog(self,datalen):
+    def read_analog(self,datalen,as_array=False,out=None,pooled=False):
+        """
+        read ADC data already in the buffer, return immediately
+        Args:
+            datalen: max data count to read
+            as_array: if True, return numpy.ndarray filled by driver instead of list
+            out: optional C-contiguous float64 numpy.ndarray (size >= datalen) filled in place, implies as_array
+            pooled: with as_array, return a view over the pooled buffer of this datalen instead of a new array;
+                    no allocation, but the view is overwritten by the next read of the same datalen
+        Returns: errorcode, data list or ndarray with actual read length
+        """
+        data_buf,data_buf_p=self.__read_buffer(datalen,as_array,pooled,out)
         actual_len=ctypes.c_uint(0)
-        _datalen=ctypes.c_uint(datalen)
 
-        type_double_arrary=ctypes.c_double*datalen # double array,
-        data_buf=type_double_arrary(0)
-        data_buf_p=ctypes.POINTER(ctypes.c_double)()
-        data_buf_p.contents=data_buf
+        errorcode=_libdaq_adc_read_analog(self.__device_name,self.__module_name, data_buf_p, datalen, ctypes.byref(actual_len))
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if as_array or out is not None:
+            return errorcode, data_buf[0:actual_len.value]
+        return errorcode, data_buf[0:actual_len.value].tolist()
 
-        errorcode=_libdaq_adc_read_analog(self.__device_name,self.__module_name, data_buf_p, _datalen, ctypes.byref(actual_len))
-        result=list(data_buf[0:actual_len.value])
-        return errorcode, result
-
-    def read_analog_sync(self,datalen,timeout):
+    def read_analog_sync(self,datalen,timeout,as_array=False,out=None,pooled=False):
+        """
+        read ADC data, wait until datalen data is read or timeout
+        Args:
+            datalen: data count to read
+            timeout: timeout in ms
+            as_array: if True, return numpy.ndarray filled by driver instead of list
+            out: optional C-contiguous float64 numpy.ndarray (size >= datalen) filled in place, implies as_array
+            pooled: with as_array, return a view over the pooled buffer of this datalen instead of a new array;
+                    no allocation, but the view is overwritten by the next read of the same datalen
+        Returns: errorcode, data list or ndarray with actual read length
+        """
+        data_buf,data_buf_p=self.__read_buffer(datalen,as_array,pooled,out)
         actual_len=ctypes.c_uint(0)
-        _datalen=ctypes.c_uint(datalen)
-
-        type_double_arrary=ctypes.c_double*datalen # double array,
-        data_buf=type_double_arrary(0)
-        data_buf_p=ctypes.POINTER(ctypes.c_double)()
-        data_buf_p.contents=data_buf
 
-        errorcode=_libdaq_adc_read_analog_sync(self.__device_name,self.__module_name, data_buf_p, _datalen, ctypes.byref(actual_len),ctypes.c_int(timeout))
-        result=list(data_buf[0:actual_len.value])
-        return errorcode, result
+        errorcode=_libdaq_adc_read_analog_sync(self.__device_name,self.__module_name, data_buf_p, datalen, ctypes.byref(actual_len), timeout)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
+        if as_array or out is not None:
+            return errorcode, data_buf[0:actual_len.value]
+        return errorcode, data_buf[0:actual_len.value].tolist()
 
     def send_trigger(self):
         errorcode=_libdaq_adc_send_trigger(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode   
 
     def stop(self):
         errorcode=_libdaq_adc_stop(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode   
     
     def start_task(self):
         errorcode=_libdaq_adc_start_task(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode
 
     def stop_task(self):
         errorcode=_libdaq_adc_stop_task(self.__device_name,self.__module_name)
+        if errorcode==LIBDAQ_ERROR_NO_DEVICE:
+            _device_lost(self.__device_name)
         return errorcode
 
     def set_realtime(self,realtime_ms):
-        _realtime_ms = ctypes.c_int(realtime_ms)
-        errorcode=_libdaq_adc_set_realtime(self.__device_name,self.__module_name,_realtime_ms)
-        return errorcode
+        return self.__configure('realtime',realtime_ms,_libdaq_adc_set_realtime,realtime_ms)
 
     def config_triggerSrc(self, trigger_source, trigger_channel,trigger_type,trigger_edge,trigger_level,trigger_delay):
-        _trigger_source=ctypes.c_ubyte(trigger_source) 
-        _trigger_channel=ctypes.c_ubyte(trigger_channel) 
-        _trigger_type=ctypes.c_ubyte(trigger_type) 
-        _trigger_edge=ctypes.c_ubyte(trigger_edge) 
-        _trigger_level=ctypes.c_ubyte(trigger_level) 
-        _trigger_delay=ctypes.c_ubyte(trigger_delay) 
-        errorcode=_libdaq_adc_config_triggerSrc(self.__device_name,self.__module_name,_trigger_source, _trigger_channel,_trigger_type,_trigger_edge,_trigger_level,_trigger_delay)
-        return errorcode
+        # only the trigger configuration is shadowed, the source is selected by select_triggerSrc
+        return self.__configure('trigger_config',(trigger_source,trigger_channel,trigger_type,trigger_edge,trigger_level,trigger_delay),
+                                _libdaq_adc_config_triggerSrc,trigger_source,trigger_channel,trigger_type,trigger_edge,trigger_level,trigger_delay)
 
     def select_triggerSrc(self, trigger_source):
-        _trigger_source=ctypes.c_ubyte(trigger_source) 
-        errorcode=_libdaq_adc_select_triggerSrc(self.__device_name,self.__module_name,_trigger_source)
+        errorcode=self.__configure('trigger_source',trigger_source,_libdaq_adc_select_triggerSrc,trigger_source)
+        if self.__shadow is not None:
+            config=self.__shadow.values.get('trigger_config')
+            if config is not None and config[0]!=trigger_source:
+                del self.__shadow.values['trigger_config']
         return errorcode
 
     def extractChannelData(self,all_data, ch_listlen,ch_index):
@@ -654,6 +1578,30 @@ class libdaq_adc(object):
         ch_data=all_data[ch_index:all_datalen:ch_listlen]
         return ch_data
 
+    def extractChannelMatrix(self,all_data,channel_list,channel_major=True):
+        """
+        split interleaved sample data of all channels into a 2-D array in one step
+        Args:
+            all_data: interleaved data list or ndarray, as returned by read_analog/read_analog_sync
+            channel_list: sampled channel list, or channel count
+            channel_major: True return (channels x cycles) array, False return (cycles x channels) array
+        Returns: float64 ndarray, a view of all_data when it is already a float64 ndarray;
+                 trailing data of an incomplete cycle is dropped
+        """
+        if isinstance(channel_list, int):
+            ch_listlen=channel_list
+        else:
+            ch_listlen=len(channel_list)
+        if ch_listlen <= 0:
+            raise ValueError("channel_list must not be empty")
+
+        all_data=np.asarray(all_data,dtype=np.float64).reshape(-1)
+        cycles=all_data.size//ch_listlen
+        ch_matrix=all_data[0:cycles*ch_listlen].reshape(cycles,ch_listlen)
+        if channel_major:
+            return ch_matrix.T
+        return ch_matrix
+
 class DAQUSB3212(object):
     def __init__(self, device_name):
         self.__device_name = device_name
@@ -692,6 +1640,38 @@ class DAQUSB401x(object):
         self.adc=libdaq_adc(self.__device_name,b'ADC')
         pass
 
+# model number in device name -> device class, e.g. b'DAQ-USB4012' is DAQUSB401x
+DEVICE_CLASSES=[
+    ('USB401',DAQUSB401x),
+    ('USB3212',DAQUSB3212),
+    ('USB3213',DAQUSB3213),
+    ('USB3214',DAQUSB3214),
+    ('USB1140',DAQUSB1140),
+    ('USB1141',DAQUSB1141),
+]
+
+def libdaq_device_class(device_name, default=None):
+    """
+    find device class by model number in device name
+    Args: device_name: name returned by libdaq_device_get_name
+          default: returned when no model number matches (e.g. renamed device)
+    Returns: device class, e.g. DAQUSB401x
+    """
+    if isinstance(device_name, bytes):
+        device_name=device_name.decode('utf-8','replace')
+    name=device_name.upper().replace('-','').replace('_','')
+    for model,device_class in DEVICE_CLASSES:
+        if model in name:
+            return device_class
+    return default
+
+def libdaq_device_adcs(device):
+    """
+    ADC modules of a device object, e.g. [adc] of DAQUSB401x, [adc1, adc2] of DAQUSB1140
+    Returns: list of libdaq_adc sorted by attribute name
+    """
+    return [module for name,module in sorted(vars(device).items()) if isinstance(module,libdaq_adc)]
+
 if __name__ == '__main__':
     libdaq_init()
     errorcode,device_name=libdaq_device_get_name(0)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  asyncio interface of libdaq devices
+
+  every libdaq call of a device runs on a single worker thread owned by that device,
+  so a slow USB call only delays calls of the same device and never blocks the event loop:
+
+      async with await libdaq_async.open_device(0) as device:
+          await device.adc.set_sample_parameter_ex([0, 1], libdaq.ADC_SAMPLE_MODE_SYNC, 10000, 1000, 0)
+          await device.adc.start_task()
+          await device.adc.send_trigger()
+          data = await device.adc.read_block(2000, 1000)
+
+          async with device.adc.stream([0, 1], 10000, block_cycles=1000) as stream:
+              async for block in stream:
+                  ...
+'''
+
+import asyncio
+import concurrent.futures
+import functools
+import numpy as np
+import libdaq
+import libdaq_stream
+
+
+class _AsyncModule(object):
+    """run methods of a libdaq module object on the executor of its device"""
+
+    def __init__(self, module, device):
+        self.module = module
+        self.device = device
+
+    def __getattr__(self, name):
+        method = getattr(self.module, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await self.device.run(method, *args, **kwargs)
+        return call
+
+
+class AsyncAdc(_AsyncModule):
+    """
+    awaitable libdaq_adc, every libdaq_adc method is available as coroutine,
+    e.g. await adc.start_task()
+    """
+
+    async def read_block(self, datalen, timeout):
+        """
+        wait for datalen ADC data without blocking the event loop
+        Args: datalen: data count to read
+              timeout: timeout in ms
+        Returns: errorcode, float64 ndarray with actual read length (own copy, not the pooled buffer)
+        """
+        out = np.empty(datalen, dtype=np.float64)
+        return await self.device.run(self.module.read_analog_sync, datalen, timeout, out=out)
+
+    def stream(self, channel_list, frequency, **kwargs):
+        """
+        continuous acquisition, keyword arguments are passed to libdaq_stream.AdcStream
+        Returns: AsyncAdcStream, use with async with and async for
+        """
+        return AsyncAdcStream(libdaq_stream.AdcStream(self.module, channel_list, frequency, **kwargs), self.device)
+
+
+class AsyncDac(_AsyncModule):
+    """awaitable libdaq_dac, e.g. await dac.set_wavepara_ex(wave, 0, 10000, libdaq.DAC_TRIGGER_MODE_AUTO)"""
+
+
+class AsyncAdcStream(object):
+    """async iterator of StreamBlock of an AdcStream"""
+
+    poll_interval = 0.25  # max time a waiting thread is held, so cancelled iterations do not leave threads waiting
+
+    def __init__(self, stream, device):
+        self.stream = stream
+        self.device = device
+
+    async def start(self):
+        errorcode = await self.device.run(self.stream.start)
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            raise RuntimeError("start ADC stream failed, errorcode %d" % errorcode)
+
+    async def stop(self):
+        await self.device.run(self.stream.stop)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        block = await self.read()
+        if block is None:
+            raise StopAsyncIteration
+        return block
+
+    async def read(self, timeout=None):
+        """
+        next block of the stream
+        Args: timeout: max wait in seconds, None wait until block is ready or stream stopped
+        Returns: StreamBlock, or None on timeout or stream stopped
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - loop.time())
+            # waiting for the reader thread is not a device call, run it on the default executor
+            block = await loop.run_in_executor(None, self.stream.read, max(wait, 0))
+            if block is not None or not self.stream.running:
+                return block
+            if deadline is not None and loop.time() >= deadline:
+                return None
+
+    def stats(self):
+        return self.stream.stats()
+
+
+class AsyncDevice(object):
+    """
+    asyncio wrapper of a device object of libdaq, e.g. DAQUSB401x
+    attributes adc and dac are AsyncAdc and AsyncDac when the device has these modules
+    """
+
+    def __init__(self, device_name, device_class=libdaq.DAQUSB401x):
+        self.device_name = device_name
+        name = device_name.decode('utf-8', 'replace') if isinstance(device_name, bytes) else str(device_name)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='libdaq-'+name)
+        self.device = device_class(device_name)
+        if hasattr(self.device, 'adc'):
+            self.adc = AsyncAdc(self.device.adc, self)
+        if hasattr(self.device, 'dac'):
+            self.dac = AsyncDac(self.device.dac, self)
+
+    async def run(self, func, *args, **kwargs):
+        """run func(*args, **kwargs) on the worker thread of this device"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        """wait for pending calls and stop the worker thread"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.executor.shutdown, True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+async def open_device(index=0, device_class=libdaq.DAQUSB401x):
+    """
+    init libdaq and open device by index
+    Returns: AsyncDevice
+    Raises: Exception when there is no such device
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, libdaq.libdaq_init)
+    count = await loop.run_in_executor(None, libdaq.libdaq_device_get_count)
+    if index >= count:
+        raise Exception("No device detected!")
+    (errorcode, device_name) = await loop.run_in_executor(None, libdaq.libdaq_device_get_name, index)
+    return AsyncDevice(device_name, device_class)
+
+
+async def _example():
+    async def heartbeat(stop):
+        # shows the event loop keeps running while the device is read, e.g. for the UDP motion link
+        ticks = 0
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return ticks
+
+    async with await open_device(0) as device:
+        wave = [float(i % 100)/100*5 for i in range(1000)]
+        await device.dac.set_wavepara_ex(wave, 0, 10000, libdaq.DAC_TRIGGER_MODE_AUTO)
+        await device.dac.start()
+
+        stop = asyncio.Event()
+        beat = asyncio.ensure_future(heartbeat(stop))
+        async with device.adc.stream([0, 1, 2, 3], 100000, block_cycles=10000) as stream:
+            async for block in stream:
+                print("cycle %8d  ch0 mean %.4f  dropped %d" % (block.start_cycle, block.data[0].mean(), block.dropped))
+                if block.start_cycle >= 190000:
+                    break
+        stop.set()
+        print("event loop ticks during acquisition: %d" % await beat)
+        await device.dac.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(_example())
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  event capture with pre-trigger history on top of a continuous AdcStream
+
+  the stream keeps running, a rolling history of the newest cycles is held in memory
+  and only a pre-/post-trigger segment around each trigger is kept, e.g. impact loads
+  on the platform without recording the idle time in between:
+
+      stream = libdaq_stream.AdcStream(device.adc, [0, 1, 2, 3], 100000, block_cycles=1000)
+      trigger = libdaq_capture.LevelTrigger(channel=0, level=0.5, hysteresis=0.05)
+      with libdaq_capture.EventCapture(stream, pre_cycles=2000, post_cycles=8000, trigger=trigger) as capture:
+          for event in capture.events(10):
+              event.data[:, event.trigger_index]     # sample of the trigger cycle
+
+  triggers:
+      LevelTrigger   software detected level crossing of one channel, sample accurate;
+                     a hardware trigger line (e.g. the digital trigger of adc_hw_trigger_example)
+                     wired to a spare ADC channel is captured sample accurately the same way
+      mark()         external trigger by cycle or host time, e.g. from a GpioPoller event,
+                     accurate to the poll period
+
+  triggers are detected on the stream without stopping it, so re-arm costs nothing and
+  no sample is lost between events; windows of close triggers may overlap, use
+  holdoff_cycles to ignore triggers following an accepted one
+'''
+
+import collections
+import queue
+import threading
+import time
+import numpy as np
+import libdaq
+import libdaq_stream
+
+RISING = 'rising'
+FALLING = 'falling'
+BOTH = 'both'
+
+# data: channels x cycles float64 array, trigger_index: column of the trigger cycle in data,
+# trigger_cycle: cycle index since stream start, timestamp: host time.perf_counter() of the trigger cycle,
+# source: 'level' or 'mark', edge: RISING/FALLING or None,
+# complete: False when samples of the window were lost by stream overrun (NaN) or the history was shorter
+CaptureEvent = collections.namedtuple('CaptureEvent', ['data', 'trigger_index', 'trigger_cycle', 'timestamp',
+                                                       'source', 'edge', 'complete'])
+
+
+class LevelTrigger(object):
+    def __init__(self, channel=0, level=0.0, edge=RISING, hysteresis=0.0):
+        """
+        Args:
+            channel: row in the stream block data (index in channel_list, not the device channel number)
+            level: trigger level (V)
+            edge: RISING, FALLING or BOTH
+            hysteresis: the signal must cross back by this much (V) before the next edge counts,
+                        suppresses repeated triggers of a noisy signal
+        Raises: ValueError
+        """
+        if edge not in (RISING, FALLING, BOTH):
+            raise ValueError("edge must be RISING, FALLING or BOTH")
+        if hysteresis < 0:
+            raise ValueError("hysteresis must not be negative")
+        self.channel = channel
+        self.level = float(level)
+        self.edge = edge
+        self.hysteresis = float(hysteresis)
+        # low below lo, high at or above hi, between keeps the previous state
+        if edge == RISING:
+            self.lo, self.hi = self.level - hysteresis, self.level
+        elif edge == FALLING:
+            self.lo, self.hi = self.level, self.level + hysteresis
+        else:
+            self.lo, self.hi = self.level - hysteresis/2.0, self.level + hysteresis/2.0
+        self.reset()
+
+    def reset(self):
+        self.state = -1  # -1 unknown, 0 low, 1 high
+
+    def detect(self, data, start_cycle):
+        """
+        find edges in one block, the state is carried over to the next block
+        Args: data: channels x cycles array, start_cycle: cycle index of first column
+        Returns: (cycles, edges) int64 array of trigger cycles and list of RISING/FALLING
+        """
+        x = data[self.channel]
+        state = np.full(x.size, -1, dtype=np.int8)
+        state[x < self.lo] = 0
+        state[x >= self.hi] = 1
+        # forward fill the samples inside the hysteresis band with the last defined state
+        index = np.where(state >= 0, np.arange(x.size), -1)
+        np.maximum.accumulate(index, out=index)
+        filled = np.where(index >= 0, state[np.maximum(index, 0)], self.state).astype(np.int8)
+        previous = np.empty_like(filled)
+        previous[0] = self.state
+        previous[1:] = filled[:-1]
+        if filled.size:
+            self.state = int(filled[-1])
+
+        rising = (previous == 0) & (filled == 1)
+        falling = (previous == 1) & (filled == 0)
+        if self.edge == RISING:
+            hits = rising
+        elif self.edge == FALLING:
+            hits = falling
+        else:
+            hits = rising | falling
+        positions = np.flatnonzero(hits)
+        edges = [RISING if rising[i] else FALLING for i in positions]
+        return positions + start_cycle, edges
+
+
+class EventCapture(object):
+    def __init__(self, stream, pre_cycles, post_cycles, trigger=None, holdoff_cycles=0,
+                 max_events=100, callback=None):
+        """
+        Args:
+            stream: AdcStream, started and stopped by start()/stop(); None when blocks are passed to feed()
+            pre_cycles: cycles kept before the trigger cycle
+            post_cycles: cycles kept from the trigger cycle on, trigger cycle included
+            trigger: LevelTrigger or None (mark() only)
+            holdoff_cycles: triggers less than this after an accepted trigger are ignored
+            max_events: events queued for read(), further events are counted in stats()['lost_events']
+            callback: optional callback(CaptureEvent) called on the capture thread instead of queueing
+        Raises: ValueError
+        """
+        if pre_cycles < 0 or post_cycles < 1:
+            raise ValueError("pre_cycles must not be negative and post_cycles must be positive")
+        self.stream = stream
+        self.pre_cycles = int(pre_cycles)
+        self.post_cycles = int(post_cycles)
+        self.trigger = trigger
+        self.holdoff_cycles = int(holdoff_cycles)
+        self.callback = callback
+        self.frequency = None if stream is None else float(stream.frequency)
+        self.__history = None     # channels x capacity ring, column = cycle % capacity
+        self.__end_cycle = 0      # cycles of history written, next cycle expected from the stream
+        self.__valid_from = 0     # first cycle written since the history was allocated
+        self.__lost = []          # (start, end) cycle ranges lost by overrun, still inside the history
+        self.__pending = []       # (trigger cycle, timestamp, source, edge) waiting for post-trigger data
+        self.__marks = []         # mark() triggers not yet merged
+        self.__last_trigger = None
+        self.__time_base = None   # (cycle, host time) of the last block
+        self.__lock = threading.Lock()
+        self.__queue = queue.Queue(max_events)
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__reset_counters()
+
+    def __reset_counters(self):
+        self.cycles = 0
+        self.blocks = 0
+        self.triggers = 0           # detected triggers
+        self.holdoff_rejected = 0
+        self.captured = 0           # events completed
+        self.lost_events = 0        # events dropped because the queue was full
+        self.incomplete = 0         # events with lost samples
+        self.gaps = 0               # stream overruns seen
+        self.process_time = 0.0     # total time in feed()
+        self.max_process_time = 0.0
+
+    def reset(self):
+        """drop history, pending events and counters, e.g. before feeding a new recording"""
+        self.__history = None
+        self.__end_cycle = self.__valid_from = 0
+        self.__lost = []
+        self.__pending = []
+        self.__last_trigger = None
+        self.__time_base = None
+        with self.__lock:
+            self.__marks = []
+        if self.trigger is not None:
+            self.trigger.reset()
+        self.__reset_counters()
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """
+        start the stream and the capture thread
+        Returns: errorcode of starting the stream
+        """
+        if self.running:
+            return libdaq.LIBDAQ_SUCCESS
+        self.reset()
+        errorcode = self.stream.start()
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            return errorcode
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__capture, name='EventCapture', daemon=True)
+        self.__thread.start()
+        return errorcode
+
+    def stop(self):
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.stream.stop()
+
+    def __enter__(self):
+        errorcode = self.start()
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            raise RuntimeError("start ADC stream failed, errorcode %d" % errorcode)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __capture(self):
+        while not self.__stop_event.is_set():
+            block = self.stream.read(0.25)
+            if block is None:
+                if not self.stream.running:
+                    break
+                continue
+            self.feed(block)
+
+    def mark(self, cycle=None, timestamp=None):
+        """
+        external trigger, thread safe
+        Args: cycle: trigger cycle index since stream start, or
+              timestamp: host time.perf_counter() of the trigger, e.g. GpioEvent.timestamp;
+              neither: now
+        Returns: None
+        """
+        if cycle is None:
+            if timestamp is None:
+                timestamp = time.perf_counter()
+            with self.__lock:
+                base = self.__time_base
+            if base is None:
+                if self.stream is None or self.stream.start_time is None:
+                    return
+                base = (0, self.stream.start_time)
+            cycle = base[0] + int(round((timestamp - base[1])*self.frequency))
+        with self.__lock:
+            self.__marks.append(max(0, int(cycle)))
+
+    def feed(self, block):
+        """
+        process one StreamBlock, called by the capture thread; call it directly when stream is None,
+        e.g. with blocks of a replay source
+        Returns: list of CaptureEvent completed by this block
+        """
+        begin = time.perf_counter()
+        data = block.data
+        channels, count = data.shape
+        if self.frequency is None:
+            raise ValueError("frequency unknown, set EventCapture.frequency before feed()")
+        if self.__history is None or self.__history.shape[0] != channels or \
+                self.__history.shape[1] < self.pre_cycles + self.post_cycles + count:
+            self.__allocate(channels, count)
+
+        start = block.start_cycle
+        if start > self.__end_cycle:
+            self.__gap(self.__end_cycle, start)
+        elif start < self.__end_cycle:
+            # restarted stream, drop history and pending events
+            self.__allocate(channels, count)
+            self.__end_cycle = self.__valid_from = start
+        self.__write(data, start)
+        end = self.__end_cycle = start + count
+        self.__time_base = (start, block.timestamp)
+        self.cycles += count
+        self.blocks += 1
+
+        candidates = []
+        if self.trigger is not None:
+            cycles, edges = self.trigger.detect(data, start)
+            candidates.extend(zip(cycles.tolist(), ['level']*len(edges), edges))
+        with self.__lock:
+            marks = [m for m in self.__marks if m < end]
+            self.__marks = [m for m in self.__marks if m >= end]
+        candidates.extend((m, 'mark', None) for m in marks)
+        candidates.sort(key=lambda c: c[0])
+
+        for cycle, source, edge in candidates:
+            self.triggers += 1
+            if self.__last_trigger is not None and 0 <= cycle - self.__last_trigger < self.holdoff_cycles:
+                self.holdoff_rejected += 1
+                continue
+            self.__last_trigger = max(cycle, self.__last_trigger or 0)
+            timestamp = block.timestamp + (cycle - start)/self.frequency
+            self.__pending.append((cycle, timestamp, source, edge))
+
+        done = [p for p in self.__pending if p[0] + self.post_cycles <= end]
+        if done:
+            self.__pending = [p for p in self.__pending if p[0] + self.post_cycles > end]
+        events = [self.__extract(*p) for p in done]
+        for event in events:
+            self.__deliver(event)
+
+        elapsed = time.perf_counter() - begin
+        self.process_time += elapsed
+        if elapsed > self.max_process_time:
+            self.max_process_time = elapsed
+        return events
+
+    def __allocate(self, channels, block_cycles):
+        capacity = self.pre_cycles + self.post_cycles + block_cycles
+        self.__history = np.full((channels, capacity), np.nan, dtype=np.float64)
+        self.__pending = []
+        self.__lost = []
+        self.__valid_from = self.__end_cycle
+
+    def __write(self, data, start):
+        capacity = self.__history.shape[1]
+        count = data.shape[1]
+        offset = start % capacity
+        first = min(count, capacity - offset)
+        self.__history[:, offset:offset+first] = data[:, :first]
+        if first < count:
+            self.__history[:, :count-first] = data[:, first:]
+
+    def __gap(self, start, end):
+        # cycles skipped by stream overrun, keep them as NaN so windows across the gap are marked incomplete
+        self.gaps += 1
+        capacity = self.__history.shape[1]
+        if end - start >= capacity:
+            self.__history.fill(np.nan)
+        else:
+            index = np.arange(start, end) % capacity
+            self.__history[:, index] = np.nan
+        self.__lost.append((start, end))
+        self.__end_cycle = end
+
+    def __extract(self, cycle, timestamp, source, edge):
+        capacity = self.__history.shape[1]
+        first = max(cycle - self.pre_cycles, self.__valid_from, self.__end_cycle - capacity)
+        last = cycle + self.post_cycles
+        index = np.arange(first, last) % capacity
+        data = self.__history[:, index]
+        self.__lost = [(a, b) for a, b in self.__lost if b > self.__end_cycle - capacity]
+        complete = first == cycle - self.pre_cycles and not any(a < last and b > first for a, b in self.__lost)
+        if not complete:
+            self.incomplete += 1
+        self.captured += 1
+        return CaptureEvent(data, cycle - first, cycle, timestamp, source, edge, complete)
+
+    def __deliver(self, event):
+        if self.callback is not None:
+            self.callback(event)
+            return
+        try:
+            self.__queue.put_nowait(event)
+        except queue.Full:
+            self.lost_events += 1
+
+    def read(self, timeout=None):
+        """
+        next captured event
+        Args: timeout: max wait in seconds, None wait until an event is captured or capture stopped
+        Returns: CaptureEvent, or None on timeout or capture stopped
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            wait = 0.25 if deadline is None else min(0.25, deadline - time.perf_counter())
+            try:
+                return self.__queue.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if not self.running and self.__queue.empty():
+                    return None
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+
+    def events(self, count=None, timeout=None):
+        """
+        iterate over captured events
+        Args: count: number of events, None no limit
+              timeout: max wait of each event in seconds
+        Returns: generator of CaptureEvent
+        """
+        n = 0
+        while count is None or n < count:
+            event = self.read(timeout)
+            if event is None:
+                return
+            n += 1
+            yield event
+
+    def __iter__(self):
+        return self.events()
+
+    def stats(self):
+        """
+        capture counters
+        Returns: dict with cycles, blocks, triggers, holdoff_rejected, captured, pending (waiting for post data),
+                 queued, lost_events (queue full), incomplete, gaps (stream overruns),
+                 process_us (mean feed() time per block), max_process_us, load (feed() time / stream time)
+        """
+        stream_time = self.cycles/self.frequency if self.frequency and self.cycles else 0.0
+        return {'cycles': self.cycles, 'blocks': self.blocks, 'triggers': self.triggers,
+                'holdoff_rejected': self.holdoff_rejected, 'captured': self.captured,
+                'pending': len(self.__pending), 'queued': self.__queue.qsize(), 'lost_events': self.lost_events,
+                'incomplete': self.incomplete, 'gaps': self.gaps,
+                'process_us': self.process_time*1e6/self.blocks if self.blocks else 0.0,
+                'max_process_us': self.max_process_time*1e6,
+                'load': self.process_time/stream_time if stream_time else 0.0}
+
+
+if __name__ == '__main__':
+    libdaq.libdaq_init()
+    if libdaq.libdaq_device_get_count() < 1:
+        raise Exception("No device detected!")
+    (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    device = libdaq.DAQUSB401x(device_name)
+    frequency = 100000
+    stream = libdaq_stream.AdcStream(device.adc, [0, 1, 2, 3], frequency, block_cycles=1000)
+    trigger = LevelTrigger(channel=0, level=0.5, hysteresis=0.05)
+    with EventCapture(stream, pre_cycles=frequency//50, post_cycles=frequency//10, trigger=trigger,
+                      holdoff_cycles=frequency//10) as capture:
+        for event in capture.events(10, timeout=10.0):
+            print("cycle %9d  %s  peak %.4f V  %s" % (event.trigger_cycle, event.edge, np.abs(event.data[0]).max(),
+                                                      "complete" if event.complete else "incomplete"))
+        print(capture.stats())
+    libdaq.libdaq_exit()
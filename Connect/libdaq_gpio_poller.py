@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  GPIO input polling with edge events, e.g. for end-stop and e-stop lines
+
+      poller = libdaq_gpio_poller.GpioPoller(device.gpioin, rate=2000)
+      poller.subscribe(on_estop, pins=[0], edges=[libdaq_gpio_poller.FALLING])
+      poller.start()
+      ...
+      print(poller.stats())
+      poller.stop()
+
+  callbacks run on the poller thread and must return quickly, use subscribe_queue()
+  to hand events to another thread instead
+'''
+
+import collections
+import queue
+import threading
+import time
+import libdaq
+
+RISING = 'rising'
+FALLING = 'falling'
+
+# pin: pin index, edge: RISING or FALLING, timestamp: host time.perf_counter() the new level was read,
+# state: bitmask of all pins at that time
+GpioEvent = collections.namedtuple('GpioEvent', ['pin', 'edge', 'timestamp', 'state'])
+
+
+class GpioPoller(object):
+    def __init__(self, gpio, rate=1000, pins=None, spin=False):
+        """
+        Args:
+            gpio: libdaq_gpio to poll, e.g. device.gpioin
+            rate: polls per second
+            pins: list of watched pins, None all pins
+            spin: True busy-wait the last 0.5 ms before each poll for a steadier rate, costs CPU
+        Raises: ValueError
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.gpio = gpio
+        self.rate = float(rate)
+        self.pin_mask = (1 << gpio.io_count) - 1 if pins is None else sum(1 << pin for pin in pins)
+        self.spin = spin
+        self.state = None          # last read bitmask
+        self.__subscribers = {}    # token -> (callback, pin mask, edges)
+        self.__next_token = 0
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__reset_counters()
+
+    def __reset_counters(self):
+        self.polls = 0
+        self.events = 0
+        self.errors = 0
+        self.last_error = libdaq.LIBDAQ_SUCCESS
+        self.late_polls = 0         # polls started a whole period late
+        self.callback_errors = 0
+        self.read_time = 0.0        # total time in read_port_mask
+        self.max_read_time = 0.0
+        self.deliveries = 0         # callbacks called
+        self.latency_total = 0.0    # total time from read to callback start
+        self.latency_max = 0.0
+        self.start_time = None
+
+    def subscribe(self, callback, pins=None, edges=(RISING, FALLING)):
+        """
+        call callback(GpioEvent) on edges of pins
+        Args: pins: list of pin index, None all watched pins
+              edges: RISING, FALLING or both
+        Returns: token for unsubscribe
+        """
+        mask = self.pin_mask if pins is None else sum(1 << pin for pin in pins)
+        with self.__lock:
+            token = self.__next_token
+            self.__next_token += 1
+            self.__subscribers[token] = (callback, mask, frozenset(edges))
+        return token
+
+    def subscribe_queue(self, pins=None, edges=(RISING, FALLING), maxsize=0):
+        """
+        put events into a queue.Queue instead of calling back
+        Returns: token, queue
+        """
+        events = queue.Queue(maxsize)
+        return self.subscribe(events.put_nowait, pins, edges), events
+
+    def unsubscribe(self, token):
+        with self.__lock:
+            self.__subscribers.pop(token, None)
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.__reset_counters()
+        self.state = None   # first read of this run is the reference, no edges against the last run's state
+        self.__stop_event.clear()
+        libdaq.libdaq_access_begin()  # no access mode switch while the device is used by name
+        self.__thread = threading.Thread(target=self.__run, name='GpioPoller', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __run(self):
+        try:
+            self.__poll()
+        finally:
+            libdaq.libdaq_access_end()
+
+    def __poll(self):
+        period = 1.0/self.rate
+        clock = time.perf_counter
+        read_port_mask = self.gpio.read_port_mask
+        self.start_time = next_time = clock()
+        while not self.__stop_event.is_set():
+            before = clock()
+            errorcode, state = read_port_mask()
+            now = clock()
+            self.polls += 1
+            read = now - before
+            self.read_time += read
+            if read > self.max_read_time:
+                self.max_read_time = read
+            if errorcode != libdaq.LIBDAQ_SUCCESS:
+                self.errors += 1
+                self.last_error = errorcode
+                if errorcode == libdaq.LIBDAQ_ERROR_NO_DEVICE:
+                    break
+            else:
+                changed = (state ^ self.state) & self.pin_mask if self.state is not None else 0
+                self.state = state
+                if changed:
+                    self.__dispatch(changed, state, now)
+
+            # absolute schedule, a late poll does not shift the following ones
+            next_time += period
+            wait = next_time - clock()
+            if wait < -period:
+                self.late_polls += 1
+                next_time = clock()
+            elif self.spin:
+                if wait > 0.0005:
+                    self.__stop_event.wait(wait - 0.0005)
+                while clock() < next_time:
+                    pass
+            elif wait > 0:
+                self.__stop_event.wait(wait)
+
+    def __dispatch(self, changed, state, timestamp):
+        with self.__lock:
+            subscribers = list(self.__subscribers.values())
+        pin = 0
+        while changed:
+            if changed & 1:
+                event = GpioEvent(pin, RISING if state >> pin & 1 else FALLING, timestamp, state)
+                self.events += 1
+                for callback, mask, edges in subscribers:
+                    if mask >> pin & 1 and event.edge in edges:
+                        latency = time.perf_counter() - timestamp
+                        self.deliveries += 1
+                        self.latency_total += latency
+                        if latency > self.latency_max:
+                            self.latency_max = latency
+                        try:
+                            callback(event)
+                        except Exception:
+                            self.callback_errors += 1
+            changed >>= 1
+            pin += 1
+
+    def stats(self):
+        """
+        poller counters
+        Returns: dict with rate (achieved polls/s), target_rate, polls, late_polls, read_us (mean read time),
+                 max_read_us, events, latency_us (mean read-to-callback time), max_latency_us,
+                 errors, last_error, callback_errors;
+                 an edge is detected at most one poll period plus read time after it happens
+        """
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        return {'rate': self.polls/elapsed if elapsed > 0 else 0.0, 'target_rate': self.rate,
+                'polls': self.polls, 'late_polls': self.late_polls,
+                'read_us': self.read_time*1e6/self.polls if self.polls else 0.0,
+                'max_read_us': self.max_read_time*1e6, 'events': self.events,
+                'latency_us': self.latency_total*1e6/self.deliveries if self.deliveries else 0.0,
+                'max_latency_us': self.latency_max*1e6, 'errors': self.errors,
+                'last_error': self.last_error, 'callback_errors': self.callback_errors}
+
+
+if __name__ == '__main__':
+    libdaq.libdaq_init()
+    if libdaq.libdaq_device_get_count() < 1:
+        raise Exception("No device detected!")
+    (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    gpioin = libdaq.libdaq_gpio(device_name, b'GPIOIN')
+    with GpioPoller(gpioin, rate=2000) as poller:
+        poller.subscribe(print)
+        time.sleep(5)
+        print(poller.stats())
+    libdaq.libdaq_exit()
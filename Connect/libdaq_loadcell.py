@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  load-cell sensor simulator for the 4-corner force platform
+
+  turns a ground-truth force/CG trajectory into the voltages the DAQ would read
+  from the four load cells, channel order and scale as in update_data of the GUIs
+  (force = volts * map factor, channel 0 left-bottom, 1 right-bottom, 2 left-top, 3 right-top):
+
+      sim = libdaq_loadcell.LoadCellSimulator(10000, width=2.0, height=2.0, seed=1)
+      t = np.arange(100000)/10000.0
+      cg = np.column_stack([0.3*np.sin(0.5*t), 0.2*np.cos(0.3*t)])
+      volts = sim.simulate(np.full(t.size, 600.0), cg)     # cycles x 4 array
+
+  error sources, all computed for a whole block in vectorized numpy calls:
+      white noise    gaussian, V rms
+      1/f noise      Voss pink noise generator, V rms; its octave rows carry over between calls,
+                     so the spectrum is the same for any block length, 1/f down to
+                     sample_rate/2**pink_rows
+      thermal drift  linear drift (V/s) plus random walk (V/sqrt(s)), continuous between calls
+      mains hum      hum_frequency and harmonics, per channel phase
+      cross-talk     each channel picks up a fraction of the others
+      quantisation   clipped to the CHANNEL_RANGE_* limits and rounded to the ADC step
+
+  as_sim_signal() plugs the simulator into the simulated backend (LIBDAQ_BACKEND=sim),
+  so the whole acquisition path runs on realistic load-cell data
+'''
+
+import numpy as np
+import libdaq
+
+# volts -> force factors of the four load cells, as in update_data of GUI_CG_Motion/MotionLink
+DEFAULT_SCALE = (195.7555170, 198.2143588, 196.2374373, 192.8436289)
+
+
+def corner_loads(force, cg, width=2.0, height=2.0):
+    """
+    split a vertical force at the CG onto the four corner load cells
+    bilinear split, the load weighted mean of the corner positions is the CG again
+    Args: force: total force, scalar or (n,) array
+          cg: (x, y) or (n, 2) array in m, origin at the platform centre
+          width, height: distance between the load cells (m)
+    Returns: (n, 4) array of loads, channel order left-bottom, right-bottom, left-top, right-top
+    """
+    force = np.asarray(force, dtype=np.float64).reshape(-1)
+    cg = np.asarray(cg, dtype=np.float64).reshape(-1, 2)
+    u = cg[:, 0]/width + 0.5    # 0 left .. 1 right
+    v = cg[:, 1]/height + 0.5   # 0 bottom .. 1 top
+    weights = np.column_stack([(1 - u)*(1 - v), u*(1 - v), (1 - u)*v, u*v])
+    return weights*force[:, np.newaxis]
+
+
+def loads_to_cg(loads, width=2.0, height=2.0):
+    """
+    CG of corner loads, the inverse of corner_loads
+    Returns: (force (n,), cg (n, 2))
+    """
+    loads = np.asarray(loads, dtype=np.float64).reshape(-1, 4)
+    force = loads.sum(axis=1)
+    x = ((loads[:, 1] + loads[:, 3]) - (loads[:, 0] + loads[:, 2]))/force*width/2
+    y = ((loads[:, 2] + loads[:, 3]) - (loads[:, 0] + loads[:, 1]))/force*height/2
+    return force, np.column_stack([x, y])
+
+
+class PinkNoise(object):
+    """
+    stateful 1/f noise generator (Voss algorithm): the sum of rows gaussian rows, row k holds
+    a new value every 2**k samples; the rows continue between calls, so consecutive blocks are
+    one continuous 1/f signal, 1/f from sample_rate/2**rows up to sample_rate/2
+    """
+
+    def __init__(self, channels, rows=16):
+        self.channels = channels
+        self.rows = rows
+        self.reset()
+
+    def reset(self):
+        self.sample_index = 0
+        self.values = None      # current value of every row, rows x channels
+
+    def generate(self, rng, cycles, rms):
+        """
+        next cycles x channels samples, rms per channel (fixed scale, not rescaled per block)
+        Returns: cycles x channels array
+        """
+        rms = np.broadcast_to(np.asarray(rms, dtype=np.float64), (self.channels,))
+        noise = np.zeros((cycles, self.channels))
+        if cycles == 0:
+            return noise
+        if self.values is None:
+            self.values = rng.standard_normal((self.rows, self.channels))
+        n = self.sample_index + np.arange(cycles)
+        for k in range(self.rows):
+            first = self.sample_index >> k      # update number of the current row value
+            updates = n >> k
+            values = np.concatenate([self.values[k:k + 1],
+                                     rng.standard_normal((updates[-1] - first, self.channels))])
+            noise += values[updates - first]
+            self.values[k] = values[-1]
+        self.sample_index += cycles
+        noise *= rms/np.sqrt(self.rows)
+        return noise
+
+
+class LoadCellSimulator(object):
+    def __init__(self, sample_rate, width=2.0, height=2.0, scale=DEFAULT_SCALE, offset=0.0,
+                 channel_range=libdaq.CHANNEL_RANGE_N10V_P10V, adc_bits=16,
+                 white_noise=0.0005, pink_noise=0.0005, pink_rows=16, drift_rate=0.0, drift_walk=0.0001,
+                 hum_amplitude=0.002, hum_frequency=50.0, hum_harmonics=(1.0, 0.0, 0.3),
+                 crosstalk=0.002, seed=None):
+        """
+        Args:
+            sample_rate: cycles per second (Hz)
+            width, height: distance between the load cells (m)
+            scale: force per volt of each load cell (the map factors), scalar or 4 values
+            offset: zero load output of each cell (V)
+            channel_range: CHANNEL_RANGE_* of the ADC channels, None no clipping and quantisation
+            adc_bits: ADC resolution over the channel range, None no quantisation
+            white_noise, pink_noise: rms (V), scalar or per channel
+            pink_rows: octaves of the pink noise, 1/f down to sample_rate/2**pink_rows
+            drift_rate: linear thermal drift (V/s), drift_walk: random walk (V/sqrt(s)), scalar or per channel
+            hum_amplitude: mains hum amplitude (V), hum_frequency: 50 or 60 Hz,
+            hum_harmonics: relative amplitude of fundamental, 2nd, 3rd ... harmonic
+            crosstalk: fraction of every other channel added to a channel, or 4x4 matrix
+                       (output = input @ matrix.T)
+            seed: seed of the noise generator, same seed same output
+        Raises: ValueError on unknown channel_range
+        """
+        self.sample_rate = float(sample_rate)
+        self.width = width
+        self.height = height
+        self.channels = 4
+        self.scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (4,)).copy()
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), (4,)).copy()
+        if channel_range is not None and channel_range not in libdaq.CHANNEL_RANGE_LIMITS:
+            raise ValueError("unknown channel range %r" % channel_range)
+        self.channel_range = channel_range
+        self.adc_bits = adc_bits
+        self.white_noise = white_noise
+        self.pink_noise = pink_noise
+        self.pink = PinkNoise(4, pink_rows)
+        self.drift_rate = drift_rate
+        self.drift_walk = drift_walk
+        self.hum_amplitude = hum_amplitude
+        self.hum_frequency = hum_frequency
+        self.hum_harmonics = tuple(hum_harmonics)
+        if np.ndim(crosstalk) == 0:
+            self.crosstalk = np.full((4, 4), float(crosstalk))
+            np.fill_diagonal(self.crosstalk, 1.0)
+        else:
+            self.crosstalk = np.asarray(crosstalk, dtype=np.float64).reshape(4, 4)
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        """restart clock, drift and noise generator"""
+        self.rng = np.random.default_rng(self.seed)
+        self.sample_index = 0
+        self.drift = np.zeros(4)        # random walk state (V)
+        self.hum_phase = self.rng.uniform(0, 2*np.pi, 4)
+        self.pink.reset()
+
+    @property
+    def limits(self):
+        """(low, high) of the channel range, None without range"""
+        return None if self.channel_range is None else libdaq.CHANNEL_RANGE_LIMITS[self.channel_range]
+
+    @property
+    def lsb(self):
+        """ADC step (V), None without quantisation"""
+        if self.channel_range is None or not self.adc_bits:
+            return None
+        low, high = self.limits
+        return (high - low)/(2**self.adc_bits)
+
+    def ideal_volts(self, loads):
+        """noise free output of (n, 4) loads"""
+        return np.asarray(loads, dtype=np.float64)/self.scale + self.offset
+
+    def simulate(self, force=None, cg=None, loads=None, t=None):
+        """
+        sensor output of one block of the trajectory, the internal clock continues after the block
+        Args: force: total force (n,), with cg: (n, 2) or (x, y) in m; or
+              loads: (n, 4) corner loads
+              t: optional (n,) sample times (s) for the hum, default from the internal clock
+        Returns: (n, 4) float64 array of channel voltages as read by the ADC
+        """
+        if loads is None:
+            loads = corner_loads(force, (0.0, 0.0) if cg is None else cg, self.width, self.height)
+        volts = self.ideal_volts(loads)
+        cycles = volts.shape[0]
+        if t is None:
+            t = (self.sample_index + np.arange(cycles))/self.sample_rate
+        t = np.asarray(t, dtype=np.float64)[:, np.newaxis]
+        rng = self.rng
+
+        if np.any(self.drift_walk):
+            walk = np.cumsum(rng.standard_normal((cycles, 4)), axis=0)
+            walk *= np.asarray(self.drift_walk)/np.sqrt(self.sample_rate)
+            walk += self.drift
+            self.drift = walk[-1].copy()
+            volts += walk
+        if np.any(self.drift_rate):
+            volts += np.asarray(self.drift_rate)*t
+        if self.hum_amplitude:
+            for k, level in enumerate(self.hum_harmonics, 1):
+                if level:
+                    volts += self.hum_amplitude*level*np.sin(2*np.pi*k*self.hum_frequency*t + k*self.hum_phase)
+        if np.any(self.white_noise):
+            volts += rng.standard_normal((cycles, 4))*self.white_noise
+        if np.any(self.pink_noise):
+            volts += self.pink.generate(rng, cycles, self.pink_noise)
+
+        volts = volts @ self.crosstalk.T
+        if self.channel_range is not None:
+            low, high = self.limits
+            np.clip(volts, low, high, out=volts)
+            if self.lsb is not None:
+                np.round(volts/self.lsb, out=volts)
+                volts *= self.lsb
+        self.sample_index += cycles
+        return volts
+
+    def to_force(self, volts):
+        """
+        force of each channel the way update_data computes it (volts * map factor)
+        Returns: (n, 4) array
+        """
+        return (np.asarray(volts, dtype=np.float64) - self.offset)*self.scale
+
+    def as_sim_signal(self, trajectory):
+        """
+        signal callable for libdaq_sim SimAdc.signal
+        Args: trajectory: callable(t) -> (force (n,), cg (n, 2)) of sample times t (s)
+        Returns: callable(t, channel_list) -> len(t) x len(channel_list) array
+        """
+        def signal(t, channel_list):
+            force, cg = trajectory(t)
+            volts = self.simulate(force, cg, t=t)
+            return volts[:, [ch % 4 for ch in channel_list]]
+        return signal
+
+
+if __name__ == '__main__':
+    import time
+    rate = 10000
+    sim = LoadCellSimulator(rate, seed=1)
+    t = np.arange(60*rate)/float(rate)
+    force = 600.0 + 50.0*np.sin(2*np.pi*0.2*t)
+    cg = np.column_stack([0.3*np.sin(2*np.pi*0.05*t), 0.2*np.cos(2*np.pi*0.03*t)])
+    start = time.perf_counter()
+    volts = sim.simulate(force, cg)
+    elapsed = time.perf_counter() - start
+    print("%d cycles x 4 channels in %.3f s (%.1f MSa/s)" % (volts.shape[0], elapsed, volts.size/elapsed/1e6))
+    measured_force, measured_cg = loads_to_cg(sim.to_force(volts), sim.width, sim.height)
+    print("CG error rms: %.2f mm" % (np.sqrt(np.mean((measured_cg - cg)**2))*1000))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  parallel acquisition of several DAQ devices with one aligned time base
+
+  each device is opened and armed on its own worker thread and streams through its
+  own AdcStream, blocks of the same cycle index are merged into one frame:
+
+      with libdaq_multi.MultiDeviceAcquisition([0, 1, 2, 3], 100000, block_cycles=10000) as acq:
+          for frame in acq.frames(100):
+              frame.data            # (devices*channels) x block_cycles array
+      print(acq.skew_report())
+
+  start alignment:
+      ADC_TRIG_SRC_SW   software triggers are sent back to back, the measured
+                        trigger time spread is the skew
+      ADC_TRIG_SRC_HWD  all devices are armed first, then one shared digital trigger
+                        (trigger inputs wired together) starts them; pass
+                        fire_trigger to generate it, e.g. from a GPIO output, and
+                        trigger_config for channel, type, edge/level and delay
+                        (without it the configuration already on the devices is used)
+'''
+
+import collections
+import concurrent.futures
+import time
+import numpy as np
+import libdaq
+import libdaq_stream
+
+# data: (devices*channels) x cycles array, device order as device_names,
+# start_cycle: cycle index since trigger, timestamp: host time of first cycle (mean over devices),
+# skew: max - min timestamp of the devices in this frame (s), dropped: samples skipped on all devices
+MultiFrame = collections.namedtuple('MultiFrame', ['data', 'start_cycle', 'timestamp', 'skew', 'dropped'])
+
+
+def libdaq_enumerate_devices():
+    """
+    names of all attached devices
+    Returns: list of device names
+    """
+    names = []
+    for index in range(libdaq.libdaq_device_get_count()):
+        (errorcode, device_name) = libdaq.libdaq_device_get_name(index)
+        if errorcode == libdaq.LIBDAQ_SUCCESS:
+            names.append(device_name)
+    return names
+
+
+class MultiDeviceAcquisition(object):
+    def __init__(self, channel_list, frequency, block_cycles=1000, device_names=None,
+                 trigger_source=libdaq.ADC_TRIG_SRC_SW, fire_trigger=None, trigger_config=None,
+                 default_class=libdaq.DAQUSB401x, **stream_args):
+        """
+        Args:
+            channel_list: sampled channels of every device
+            frequency: sample rate of each channel (Hz), same on all devices
+            block_cycles: cycles of each merged frame
+            device_names: devices to use, default all attached devices
+            trigger_source: ADC_TRIG_SRC_SW or shared hardware trigger ADC_TRIG_SRC_HWD/ADC_TRIG_SRC_HWA
+            fire_trigger: optional callable generating the shared hardware trigger after all devices are armed
+            trigger_config: hardware trigger (trigger_channel, trigger_type, trigger_edge, trigger_level,
+                            trigger_delay) as config_triggerSrc, sent to every device before arming;
+                            None keeps the trigger configuration already set on the devices
+            default_class: device class of names without known model number
+            stream_args: other AdcStream arguments, e.g. buffer_seconds, realtime_ms
+        """
+        libdaq.libdaq_init()
+        if device_names is None:
+            device_names = libdaq_enumerate_devices()
+        if not device_names:
+            raise Exception("No device detected!")
+        self.device_names = list(device_names)
+        self.channel_list = list(channel_list)
+        self.frequency = frequency
+        self.block_cycles = block_cycles
+        self.trigger_source = trigger_source
+        self.fire_trigger = fire_trigger
+        self.trigger_config = None if trigger_config is None else tuple(trigger_config)
+        self.channel_count = len(self.channel_list)*len(self.device_names)
+
+        # one worker thread per device: open, arm and stop run on the workers in parallel; software
+        # triggers are sent back to back from the calling thread (tightest alignment), and read()
+        # only takes blocks from the AdcStream rings, the device reads run on the stream threads
+        self.executors = [concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='libdaq-%d' % i)
+                          for i in range(len(self.device_names))]
+        self.devices = self.__on_each(lambda i, name: libdaq.libdaq_device_class(name, default_class)(name))
+        self.streams = []
+        for device in self.devices:
+            adcs = libdaq.libdaq_device_adcs(device)
+            if not adcs:
+                raise ValueError("device %s has no ADC module" % type(device).__name__)
+            self.streams.append(libdaq_stream.AdcStream(adcs[0], self.channel_list, frequency, block_cycles,
+                                                        trigger_source=trigger_source, **stream_args))
+        self.trigger_times = [None]*len(self.devices)  # host time of software trigger of each device
+        self.__pending = [None]*len(self.devices)      # blocks read before a timeout, merged on the next read
+        self.__skipped = 0                             # samples discarded while aligning, reported in next frame
+
+    def __on_each(self, func):
+        # run func(index, device_name) on the worker of each device in parallel, return results in device order
+        futures = [executor.submit(func, i, name)
+                   for i, (executor, name) in enumerate(zip(self.executors, self.device_names))]
+        return [future.result() for future in futures]
+
+    def start(self):
+        """
+        arm all devices in parallel, then start them together
+        Returns: None
+        Raises: RuntimeError when a device fails to start
+        """
+        self.__pending = [None]*len(self.streams)
+        self.__skipped = 0
+        errorcodes = self.__on_each(lambda i, name: self.__arm(i))
+        failed = [(name, e) for name, e in zip(self.device_names, errorcodes) if e != libdaq.LIBDAQ_SUCCESS]
+        if failed:
+            self.stop()
+            raise RuntimeError("arm ADC failed: %s" % ", ".join("%s errorcode %d" % (n, e) for n, e in failed))
+
+        if self.trigger_source == libdaq.ADC_TRIG_SRC_SW:
+            # back to back from one thread, the tightest software alignment
+            for i, stream in enumerate(self.streams):
+                errorcode = stream.trigger()
+                if errorcode != libdaq.LIBDAQ_SUCCESS:
+                    self.stop()
+                    raise RuntimeError("trigger %s failed, errorcode %d" % (self.device_names[i], errorcode))
+                self.trigger_times[i] = stream.start_time
+        elif self.fire_trigger is not None:
+            self.fire_trigger()
+            # one trigger edge starts all devices, use its time instead of the estimate from first data
+            trigger_time = time.perf_counter()
+            for i, stream in enumerate(self.streams):
+                stream.start_time = self.trigger_times[i] = trigger_time
+
+    def __arm(self, i):
+        # on the worker of device i: hardware trigger configuration, then arm the stream
+        stream = self.streams[i]
+        if self.trigger_config is not None and self.trigger_source != libdaq.ADC_TRIG_SRC_SW:
+            errorcode = stream.adc.config_triggerSrc(self.trigger_source, *self.trigger_config)
+            if errorcode != libdaq.LIBDAQ_SUCCESS:
+                return errorcode
+        return stream.arm()
+
+    def stop(self):
+        self.__on_each(lambda i, name: self.streams[i].stop())
+
+    def close(self):
+        self.stop()
+        for executor in self.executors:
+            executor.shutdown()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, timeout=None):
+        """
+        next merged frame, blocks of devices are matched by cycle index,
+        blocks a device lost by overrun are skipped on all devices and counted in dropped;
+        on timeout the blocks already read from other devices are kept for the next read
+        Args: timeout: max wait of each device block in seconds
+        Returns: MultiFrame, or None on timeout or stream stopped
+        """
+        blocks = [self.__pending[i] if self.__pending[i] is not None else stream.read(timeout)
+                  for i, stream in enumerate(self.streams)]
+        while True:
+            if any(block is None for block in blocks):
+                self.__pending = blocks
+                return None
+            start_cycle = max(block.start_cycle for block in blocks)
+            if all(block.start_cycle == start_cycle for block in blocks):
+                break
+            for i, block in enumerate(blocks):
+                if block.start_cycle != start_cycle:
+                    self.__skipped += block.data.size + block.dropped
+                    blocks[i] = self.streams[i].read(timeout)
+        self.__pending = [None]*len(self.streams)
+
+        timestamps = np.array([block.timestamp for block in blocks])
+        data = np.concatenate([block.data for block in blocks], axis=0)
+        dropped = self.__skipped + sum(block.dropped for block in blocks)
+        self.__skipped = 0
+        return MultiFrame(data, start_cycle, float(timestamps.mean()), float(timestamps.max() - timestamps.min()),
+                          dropped)
+
+    def frames(self, count=None, timeout=None):
+        """
+        iterate over merged frames
+        Args: count: number of frames, None no limit
+              timeout: max wait of each frame in seconds
+        Returns: generator of MultiFrame
+        """
+        n = 0
+        while count is None or n < count:
+            frame = self.read(timeout)
+            if frame is None:
+                return
+            n += 1
+            yield frame
+
+    def __iter__(self):
+        return self.frames()
+
+    def skew_report(self):
+        """
+        start alignment of the devices relative to the first device
+        Returns: list of dict with device, start_offset (s), sample_offset (cycles),
+                 rate (achieved cycles/s), dropped (samples)
+        """
+        report = []
+        t0 = self.streams[0].start_time
+        for name, stream in zip(self.device_names, self.streams):
+            stats = stream.stats()
+            offset = stream.start_time - t0 if stream.start_time is not None and t0 is not None else None
+            report.append({'device': name, 'start_offset': offset,
+                           'sample_offset': None if offset is None else offset*self.frequency,
+                           'rate': stats['rate'], 'dropped': stats['dropped']})
+        return report
+
+
+if __name__ == '__main__':
+    frequency = 100000
+    with MultiDeviceAcquisition([0, 1, 2, 3], frequency, block_cycles=frequency//10) as acq:
+        print("%d devices, %d channels" % (len(acq.devices), acq.channel_count))
+        frame = None
+        for frame in acq.frames(20, timeout=2.0):
+            pass
+        if frame is None:
+            print("no frame received")
+        else:
+            print("last frame: cycle %d, shape %s, skew %.1f us" %
+                  (frame.start_cycle, frame.data.shape, frame.skew*1e6))
+        for line in acq.skew_report():
+            print("%s: offset %.1f us (%.2f samples), %.0f Sa/s, %d dropped" %
+                  (line['device'], line['start_offset']*1e6, line['sample_offset'], line['rate'], line['dropped']))
+    libdaq.libdaq_exit()
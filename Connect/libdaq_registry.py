@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  cached registry of attached DAQ devices with hot-plug detection
+
+  devices are enumerated once, name, serial, hardware version and device class are
+  cached, lookups by name or index are dict/list lookups and do not call the driver:
+
+      registry = libdaq_registry.default_registry()
+      info = registry.by_index(0)
+      device = registry.open(info.name)          # DAQUSB401x, same object on every call
+      registry.subscribe(lambda event, info: print(event, info.name))
+      registry.watch(1.0)                        # poll for plugged/unplugged devices
+
+  libdaq_init is called once per process here; refresh() rescans the bus with libdaq_scan_device
+  and reads device count and names, it does not re-init the library (each init/exit cycles libusb).
+  the rescan is skipped while streams or pollers use devices (libdaq_exclusive), devices plugged
+  meanwhile are found by the first refresh after they stop
+'''
+
+import collections
+import threading
+import libdaq
+
+ADDED = 'added'
+REMOVED = 'removed'
+
+# index: position in driver device list, name: device name, serial: serial number (None when not queried),
+# version: (firmware_major, firmware_minor, firmware_micro, pcb_ver, bom_ver), device_class: e.g. libdaq.DAQUSB401x
+DeviceInfo = collections.namedtuple('DeviceInfo', ['index', 'name', 'serial', 'version', 'device_class'])
+
+
+class DeviceRegistry(object):
+    def __init__(self, query_serial=False, default_class=libdaq.DAQUSB401x):
+        """
+        Args:
+            query_serial: True also read serial numbers; the API has no serial call, the names are read
+                          again in LIBDAQ_ACCESS_MODE_DEV_SN_ONLY mode (libdaq_with_option), then the previous
+                          access mode is restored; skipped while streams or pollers use devices, serials
+                          still missing are read on a later refresh
+            default_class: device class of names without known model number
+        """
+        self.query_serial = query_serial
+        self.default_class = default_class
+        self.__lock = threading.RLock()
+        self.__devices = []       # DeviceInfo by index
+        self.__by_name = {}       # name -> DeviceInfo
+        self.__by_serial = {}     # serial -> DeviceInfo
+        self.__opened = {}        # name -> device object
+        self.__subscribers = []
+        self.__watch_stop = None
+        self.__watch_thread = None
+        self.refreshes = 0
+        libdaq.libdaq_init()
+        self.refresh()
+
+    def __scan_names(self):
+        names = []
+        for index in range(libdaq.libdaq_device_get_count()):
+            (errorcode, name) = libdaq.libdaq_device_get_name(index)
+            names.append(name if errorcode == libdaq.LIBDAQ_SUCCESS else None)
+        return names
+
+    def __scan_serials(self, count):
+        # Returns: serial by index, None when devices are in use and the access mode cannot be switched
+        def scan():
+            serials = []
+            for index in range(count):
+                (errorcode, serial) = libdaq.libdaq_device_get_name(index)
+                serials.append(serial if errorcode == libdaq.LIBDAQ_SUCCESS else None)
+            return serials
+        switched, serials = libdaq.libdaq_with_option(libdaq.LIBDAQ_ACCESS_MODE_DEV_SN_ONLY, scan)
+        return serials if switched else None
+
+    def refresh(self):
+        """
+        rescan and enumerate devices, version and serial are only read for devices not seen before
+        Returns: (added, removed) lists of DeviceInfo
+        """
+        with self.__lock:
+            libdaq.libdaq_exclusive(libdaq.libdaq_scan_device)
+            names = self.__scan_names()
+            known = self.__by_name
+            new_names = [name for name in names if name is not None and name not in known]
+            missing_serial = [name for name in names if name in known and known[name].serial is None]
+            serials = self.__scan_serials(len(names)) if self.query_serial and (new_names or missing_serial) \
+                else None
+
+            devices = []
+            for index, name in enumerate(names):
+                if name is None:
+                    continue
+                old = known.get(name)
+                if old is not None:
+                    if old.serial is None and serials is not None and index < len(serials):
+                        old = old._replace(serial=serials[index])
+                    devices.append(old._replace(index=index))
+                    continue
+                (errorcode, hw) = libdaq.libdaq_device_get_version(name)
+                version = (hw.firmware_major, hw.firmware_minor, hw.firmware_micro, hw.pcb_ver, hw.bom_ver) \
+                    if errorcode == libdaq.LIBDAQ_SUCCESS else None
+                serial = serials[index] if serials is not None and index < len(serials) else None
+                devices.append(DeviceInfo(index, name, serial, version,
+                                          libdaq.libdaq_device_class(name, self.default_class)))
+
+            current = set(info.name for info in devices)
+            added = [info for info in devices if info.name in new_names]
+            removed = [info for name, info in known.items() if name not in current]
+            # swap in new tables, readers never see a half built table
+            self.__devices = devices
+            self.__by_name = {info.name: info for info in devices}
+            self.__by_serial = {info.serial: info for info in devices if info.serial is not None}
+            for info in removed:
+                self.__opened.pop(info.name, None)
+            # a plugged or unplugged device starts with default settings, resend configuration
+            for info in removed + added:
+                libdaq.libdaq_invalidate_config(info.name)
+            self.refreshes += 1
+            subscribers = list(self.__subscribers)
+
+        for callback in subscribers:
+            for info in removed:
+                callback(REMOVED, info)
+            for info in added:
+                callback(ADDED, info)
+        return added, removed
+
+    # lookups, no driver call
+    def devices(self):
+        return list(self.__devices)
+
+    def count(self):
+        return len(self.__devices)
+
+    def by_index(self, index):
+        """Raises: IndexError"""
+        return self.__devices[index]
+
+    def by_name(self, name):
+        """Returns: DeviceInfo or None"""
+        return self.__by_name.get(name)
+
+    def by_serial(self, serial):
+        """Returns: DeviceInfo or None, needs query_serial=True"""
+        return self.__by_serial.get(serial)
+
+    def __contains__(self, name):
+        return name in self.__by_name
+
+    def __len__(self):
+        return len(self.__devices)
+
+    def __iter__(self):
+        return iter(self.devices())
+
+    def open(self, name):
+        """
+        device object of the device class, created once per name and kept until the device is removed
+        Args: name: device name, or index
+        Returns: device object, e.g. DAQUSB401x
+        Raises: KeyError when there is no such device
+        """
+        info = self.by_index(name) if isinstance(name, int) else self.by_name(name)
+        if info is None:
+            raise KeyError("no device %s" % name)
+        with self.__lock:
+            device = self.__opened.get(info.name)
+            if device is None:
+                device = self.__opened[info.name] = info.device_class(info.name)
+            return device
+
+    # hot-plug
+    def subscribe(self, callback):
+        """
+        call callback(ADDED or REMOVED, DeviceInfo) on device changes found by refresh()
+        Returns: callback, for unsubscribe
+        """
+        with self.__lock:
+            self.__subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.__lock:
+            if callback in self.__subscribers:
+                self.__subscribers.remove(callback)
+
+    def watch(self, interval=1.0):
+        """start background thread calling refresh() every interval seconds"""
+        self.unwatch()
+        stop = self.__watch_stop = threading.Event()
+
+        def watcher():
+            while not stop.wait(interval):
+                self.refresh()
+        self.__watch_thread = threading.Thread(target=watcher, name='DeviceRegistry', daemon=True)
+        self.__watch_thread.start()
+
+    def unwatch(self):
+        if self.__watch_stop is not None:
+            self.__watch_stop.set()
+            self.__watch_thread.join()
+            self.__watch_stop = self.__watch_thread = None
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    """
+    process wide registry, created on first call
+    Returns: DeviceRegistry
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = DeviceRegistry()
+        return _default_registry
+
+
+if __name__ == '__main__':
+    import time
+    registry = default_registry()
+    for info in registry:
+        print(info)
+    registry.subscribe(lambda event, info: print(event, info))
+    registry.watch(1.0)
+    print("watching for hot-plug, Ctrl+C to exit")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        registry.unwatch()
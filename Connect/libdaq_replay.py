@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  replay of recorded captures through the AdcStream interface
+
+  a ReplayStream has start()/stop()/read()/blocks()/latest()/stats() like
+  libdaq_stream.AdcStream, so processing code (EventCapture, the GUIs, scripts)
+  runs unchanged on recorded data:
+
+      stream = libdaq_replay.ReplayStream.open('sea_trial.npy', block_cycles=1000, speed=None)
+      with stream:
+          for block in stream:
+              process(block.data)      # channels x block_cycles array
+
+  recordings:
+      .csv   as written by export_data of the GUIs: Timestamp column (s) and one column
+             per channel of forces (units 'force'), the sample rate is taken from the timestamps;
+             text parsing is slow, convert long captures once with convert_csv()
+      .npy   cycles x channels float array, opened as numpy.memmap so hours of data are not
+             loaded into memory, with JSON sidecar of the same name (.json):
+             {"frequency": 10000, "channels": [0, 1, 2, 3], "units": "volts", ...}, see save_recording()
+
+  metadata['units'] tells what the values are: 'volts' as read from the ADC (default) or
+  'force' (volts * map factor, as exported by the GUIs); convert_csv() keeps 'force'
+  export_csv() writes a .npy recording back as export_data CSV, chunk by chunk
+
+  speed: 1.0 real time, 10.0 ten times faster, None as fast as the consumer reads;
+  seek() jumps to any position, also while playing; StreamBlock.timestamp is
+  start_time + start_cycle/frequency with start_time moved on start/seek/speed change,
+  it is host time of the block only at speed 1
+'''
+
+import json
+import os
+import threading
+import time
+import numpy as np
+import libdaq
+import libdaq_stream
+
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def save_recording(path, data, frequency, channel_list=None, **metadata):
+    """
+    write a binary recording: .npy data and JSON sidecar
+    Args: data: cycles x channels array
+          frequency: sample rate (Hz)
+          channel_list: device channel of each column, default 0..channels-1
+          metadata: other values stored in the sidecar, e.g. device, start_time;
+                    units defaults to 'volts'
+    Returns: None
+    """
+    data = np.asarray(data)
+    if data.ndim != 2:
+        raise ValueError("data must be a cycles x channels array")
+    np.save(path, data)
+    write_sidecar(path, frequency, channel_list, data.shape[1], **metadata)
+
+
+def write_sidecar(path, frequency, channel_list=None, channels=None, **metadata):
+    """
+    write the JSON sidecar of a .npy recording written by other means (e.g. block by block)
+    Args: channels: number of columns, used when channel_list is None
+    Returns: None
+    """
+    metadata.update(frequency=float(frequency),
+                    channels=list(range(channels)) if channel_list is None else list(channel_list))
+    metadata.setdefault('units', 'volts')
+    with open(sidecar_path(path), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_csv(path):
+    """
+    read a CSV written by export_data, the values are forces (metadata units 'force')
+    Returns: (data cycles x channels float64 array, frequency, metadata dict)
+    Raises: ValueError when there are less than 2 rows or the timestamps are not increasing
+    """
+    with open(path) as f:
+        header = f.readline().strip().split(',')
+    table = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+    if table.shape[0] < 2:
+        raise ValueError("recording needs at least 2 rows")
+    times = table[:, 0]
+    interval = np.median(np.diff(times))
+    if interval <= 0:
+        raise ValueError("timestamps are not increasing")
+    metadata = {'columns': header[1:], 'start_time': float(times[0]), 'source': os.path.basename(path),
+                'units': 'force'}
+    return np.ascontiguousarray(table[:, 1:]), round(1.0/interval, 6), metadata
+
+
+def convert_csv(csv_path, npy_path=None):
+    """
+    convert an export_data CSV to .npy + JSON sidecar for fast replay
+    Returns: path of the .npy file
+    """
+    npy_path = npy_path or os.path.splitext(csv_path)[0] + '.npy'
+    data, frequency, metadata = load_csv(csv_path)
+    save_recording(npy_path, data, frequency, **metadata)
+    return npy_path
+
+
+def export_csv(npy_path, csv_path, chunk_cycles=100000):
+    """
+    write a .npy recording as CSV in the export_data layout (Timestamp and one column per channel),
+    chunk by chunk so long recordings are not loaded into memory; values are written as stored,
+    the GUIs record forces so the CSV matches export_data
+    Returns: path of the CSV file
+    """
+    data = np.load(npy_path, mmap_mode='r')
+    with open(sidecar_path(npy_path)) as f:
+        metadata = json.load(f)
+    frequency = metadata['frequency']
+    start_time = metadata.get('start_time', 0.0)
+    columns = metadata.get('columns') or ['Channel %d' % ch for ch in metadata['channels']]
+    with open(csv_path, 'w') as f:
+        f.write(','.join(['Timestamp'] + list(columns)) + '\n')
+        for begin in range(0, data.shape[0], chunk_cycles):
+            chunk = np.asarray(data[begin:begin + chunk_cycles], dtype=np.float64)
+            times = start_time + (begin + np.arange(chunk.shape[0]))/frequency
+            np.savetxt(f, np.column_stack([times, chunk]), delimiter=',', fmt='%.12g')
+    return csv_path
+
+
+class ReplayStream(object):
+    def __init__(self, data, frequency, block_cycles=1000, speed=1.0, loop=False, channel_list=None, gain=None,
+                 metadata=None):
+        """
+        Args:
+            data: cycles x channels array, e.g. numpy.memmap
+            frequency: sample rate of the recording (Hz)
+            block_cycles: cycles of each block returned by read(); the last block may be shorter
+            speed: playback speed relative to real time, None or 0 no pacing
+            loop: True restart at the beginning at the end of the recording
+            channel_list: device channel of each column, default from metadata or 0..channels-1
+            gain: optional factor per channel applied to the data, e.g. 1/map factor to turn
+                  the scaled values of an export_data CSV back into volts
+            metadata: dict from the recording sidecar
+        Raises: ValueError
+        """
+        if data.ndim != 2 or data.shape[0] == 0:
+            raise ValueError("data must be a non-empty cycles x channels array")
+        if frequency <= 0 or block_cycles < 1:
+            raise ValueError("frequency and block_cycles must be positive")
+        self.recording = data
+        self.metadata = metadata or {}
+        self.total_cycles = data.shape[0]
+        self.channel_count = data.shape[1]
+        self.channel_list = list(channel_list or self.metadata.get('channels') or range(self.channel_count))
+        self.frequency = float(frequency)
+        self.block_cycles = int(block_cycles)
+        self.loop = loop
+        self.gain = gain
+        self.__speed = speed or None
+        self.__lock = threading.Condition()
+        self.__running = False
+        self.__cursor = 0        # next cycle returned by read()
+        self.__cycle_base = 0    # cycle played at __time_base
+        self.__time_base = None  # host time of __cycle_base at current speed
+        self.__reset_counters()
+
+    @classmethod
+    def open(cls, path, block_cycles=1000, speed=1.0, **kwargs):
+        """
+        open a .npy recording (memory mapped, with sidecar) or an export_data .csv
+        Returns: ReplayStream
+        """
+        if path.lower().endswith('.csv'):
+            data, frequency, metadata = load_csv(path)
+        else:
+            data = np.load(path, mmap_mode='r')
+            with open(sidecar_path(path)) as f:
+                metadata = json.load(f)
+            frequency = metadata['frequency']
+        return cls(data, frequency, block_cycles, speed, metadata=metadata, **kwargs)
+
+    def __reset_counters(self):
+        self.start_time = None
+        self.play_time = None    # host time playback started
+        self.reads = 0
+        self.cycles_read = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.loops = 0
+
+    @property
+    def running(self):
+        return self.__running
+
+    @property
+    def gain(self):
+        return self.__gain
+
+    @gain.setter
+    def gain(self, gain):
+        """factor per channel applied to the data, None no scaling; may be set after open()"""
+        self.__gain = None if gain is None else np.asarray(gain, dtype=np.float64).reshape(-1, 1)
+
+    @property
+    def speed(self):
+        return self.__speed
+
+    @speed.setter
+    def speed(self, speed):
+        """change playback speed, also while playing"""
+        with self.__lock:
+            self.__rebase(self.__cursor)
+            self.__speed = speed or None
+            self.__lock.notify_all()
+
+    @property
+    def position(self):
+        """next cycle returned by read()"""
+        return self.__cursor
+
+    @property
+    def duration(self):
+        """recording length (s)"""
+        return self.total_cycles/self.frequency
+
+    def __rebase(self, cycle):
+        # pacing restarts at cycle now, timestamps stay on the recording time axis
+        self.__cycle_base = cycle
+        self.__time_base = time.perf_counter()
+        if self.start_time is not None:
+            self.start_time = self.__time_base - cycle/self.frequency
+
+    def start(self):
+        """start playback at the current position, Returns: errorcode"""
+        with self.__lock:
+            if not self.__running:
+                self.__reset_counters()
+                self.start_time = self.play_time = time.perf_counter()
+                self.__rebase(self.__cursor)
+                self.__running = True
+        return libdaq.LIBDAQ_SUCCESS
+
+    def arm(self):
+        return libdaq.LIBDAQ_SUCCESS
+
+    def trigger(self):
+        return self.start()
+
+    def stop(self):
+        with self.__lock:
+            self.__running = False
+            self.__lock.notify_all()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def seek(self, seconds=None, cycle=None):
+        """
+        jump to a position of the recording, also while playing
+        Args: seconds: time from the start of the recording, or cycle: cycle index
+        Returns: new position (cycle)
+        """
+        if cycle is None:
+            cycle = int(round((seconds or 0.0)*self.frequency))
+        cycle = min(max(int(cycle), 0), self.total_cycles)
+        with self.__lock:
+            self.__cursor = cycle
+            if self.__running:
+                self.__rebase(cycle)
+            self.__lock.notify_all()
+        return cycle
+
+    def __due(self, end_cycle):
+        # host time at which the cycle before end_cycle has been "acquired"
+        return self.__time_base + (end_cycle - self.__cycle_base)/(self.frequency*self.__speed)
+
+    def read(self, timeout=None):
+        """
+        get next block, paced by speed
+        Args: timeout: max wait in seconds, None wait until block is due or playback stopped
+        Returns: StreamBlock, or None on timeout, when stopped or at the end of the recording
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.__lock:
+            while True:
+                if not self.__running:
+                    return None
+                if self.__cursor >= self.total_cycles:
+                    if not self.loop:
+                        self.__running = False
+                        return None
+                    self.loops += 1
+                    self.__cursor = 0
+                    self.__rebase(0)
+                start = self.__cursor
+                end = min(start + self.block_cycles, self.total_cycles)
+                if self.__speed is None:
+                    break
+                now = time.perf_counter()
+                wait = self.__due(end) - now
+                if wait <= 0:
+                    break
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = min(wait, deadline - now)
+                self.waits += 1
+                self.wait_time += wait
+                self.__lock.wait(wait)
+            self.__cursor = end
+            self.reads += 1
+            self.cycles_read += end - start
+            timestamp = self.start_time + start/self.frequency
+
+        data = np.array(self.recording[start:end].T, dtype=np.float64)
+        if self.__gain is not None:
+            data *= self.__gain
+        return libdaq_stream.StreamBlock(data, start, timestamp, 0)
+
+    def blocks(self, count=None, timeout=None):
+        """
+        iterate over blocks until count blocks are read, read() times out or the recording ends
+        Returns: generator of StreamBlock
+        """
+        n = 0
+        while count is None or n < count:
+            block = self.read(timeout)
+            if block is None:
+                return
+            n += 1
+            yield block
+
+    def __iter__(self):
+        return self.blocks()
+
+    def latest(self, cycles):
+        """
+        newest cycles up to the current playback position (time paced when speed is set,
+        else the read position), does not move the read position
+        Returns: channels x n float64 array, n <= cycles
+        """
+        with self.__lock:
+            end = self.__cursor
+            if self.__running and self.__speed is not None:
+                played = self.__cycle_base + int((time.perf_counter() - self.__time_base)*self.frequency*self.__speed)
+                end = min(max(played, end), self.total_cycles)
+        data = np.array(self.recording[max(0, end - cycles):end].T, dtype=np.float64)
+        if self.__gain is not None:
+            data *= self.__gain
+        return data
+
+    def stats(self):
+        """
+        replay counters
+        Returns: dict with cycles (read), rate (cycles/s delivered), position, total_cycles, speed,
+                 pending (0), dropped (0), overruns (0), reads, waits, wait_s, loops, errors (0), last_error
+        """
+        elapsed = time.perf_counter() - self.play_time if self.play_time else 0.0
+        return {'cycles': self.cycles_read, 'rate': self.cycles_read/elapsed if elapsed > 0 else 0.0,
+                'position': self.__cursor, 'total_cycles': self.total_cycles, 'speed': self.__speed,
+                'pending': 0, 'dropped': 0, 'overruns': 0, 'reads': self.reads, 'waits': self.waits,
+                'wait_s': self.wait_time, 'loops': self.loops, 'timeouts': 0, 'errors': 0,
+                'last_error': libdaq.LIBDAQ_SUCCESS}
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print("usage: python libdaq_replay.py recording.npy|recording.csv [speed]")
+        sys.exit(1)
+    path = sys.argv[1]
+    if path.lower().endswith('.csv'):
+        path = convert_csv(path)
+        print("converted to %s" % path)
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    stream = ReplayStream.open(path, block_cycles=10000, speed=speed)
+    print("%d channels, %.1f s at %.0f Hz" % (stream.channel_count, stream.duration, stream.frequency))
+    with stream:
+        for block in stream:
+            pass
+    print(stream.stats())
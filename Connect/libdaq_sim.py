@@ -0,0 +1,745 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  simulated daqlib backend, implements the libdaq C API in python so that libdaq.py,
+  the sample scripts and the GUIs run without DAQ hardware
+
+  select it by environment variable LIBDAQ_BACKEND=sim, or in code:
+      libdaq.libdaq_set_backend('sim')                       # default simulated devices
+      libdaq.libdaq_set_backend(libdaq_sim.SimulatedDaqlib(device_count=2, pacing=0))
+
+  every API function is exported as a C function pointer built from libdaq.LIBDAQ_PROTOTYPES,
+  calls go through the same ctypes argument conversion as the native library.
+
+  environment variables, used when SimulatedDaqlib arguments are not given:
+      LIBDAQ_SIM_DEVICES  number of simulated devices, default 1
+      LIBDAQ_SIM_PACING   ADC data rate relative to real time, 1 real time (default),
+                          10 ten times faster, 0 as fast as reads are issued
+      LIBDAQ_SIM_SEED     seed of noise generator
+'''
+
+import ctypes
+import math
+import os
+import threading
+import time
+import numpy as np
+import libdaq
+
+SIM_DEVICE_NAME = b'DAQ-USB4012-SIM%d'
+SIM_ADC_CHANNELS = 8            # analog input channels of each ADC module
+SIM_ADC_MAX_FREQUENCY = 200000  # max sample rate of each channel (Hz)
+SIM_ADC_BUFFER_SAMPLES = 8 * 1024 * 1024  # device + driver buffer, older samples are lost when reader is late
+SIM_GPIO_COUNT = 8
+SIM_LIBRARY_VERSION = (2, 2, 0)
+SIM_HW_VERSION = (1, 0, 0, 1, 1)  # firmware major, minor, micro, pcb, bom
+
+_error_desc = {
+    libdaq.LIBDAQ_SUCCESS: (b'LIBDAQ_SUCCESS', b'Success (no error)'),
+    libdaq.LIBDAQ_ERROR_INVALID_PARAM: (b'LIBDAQ_ERROR_INVALID_PARAM', b'Invalid parameter'),
+    libdaq.LIBDAQ_ERROR_NO_DEVICE: (b'LIBDAQ_ERROR_NO_DEVICE', b'No such device (it may have been disconnected)'),
+    libdaq.LIBDAQ_ERROR_TIMEOUT: (b'LIBDAQ_ERROR_TIMEOUT', b'Operation timed out'),
+    libdaq.LIBDAQ_ERROR_NOT_SUPPORTED: (b'LIBDAQ_ERROR_NOT_SUPPORTED', b'Operation not supported'),
+    libdaq.LIBDAQ_ERROR_NO_MODULE: (b'LIBDAQ_ERROR_NO_MODULE', b'no such module'),
+    libdaq.LIBDAQ_ERROR_GPIO_INDEX: (b'LIBDAQ_ERROR_GPIO_INDEX', b'gpio pin with index error'),
+    libdaq.LIBDAQ_ERROR_OTHER: (b'LIBDAQ_ERROR_OTHER', b'Other error'),
+}
+
+
+def _str(ptr):
+    return ctypes.string_at(ptr) if ptr else b''
+
+
+def _set_uint(ptr, value):
+    ctypes.c_uint.from_address(ptr).value = value
+
+
+def _read_array(ptr, ctype, length):
+    return (ctype * length).from_address(ptr)
+
+
+class SimAdc(object):
+    """simulated ADC module, sample data is computed from the sample index when it is read"""
+
+    def __init__(self, device, channel_count=SIM_ADC_CHANNELS):
+        self.device = device
+        self.channel_count = channel_count
+        self.channel_config = {ch: (libdaq.CHANNEL_RANGE_N10V_P10V, libdaq.ADC_CHANNEL_DC_COUPLE,
+                                    libdaq.ADC_CHANNEL_REFGND_RSE) for ch in range(channel_count)}
+        self.gain = np.ones(channel_count)
+        self.offset = np.zeros(channel_count)
+        self.channel_list = [0]
+        self.sample_mode = libdaq.ADC_SAMPLE_MODE_SYNC
+        self.frequency = 1000
+        self.cycles = 0
+        self.group_interval = 0
+        self.trigger_source = libdaq.ADC_TRIG_SRC_SW
+        self.trigger_config = None
+        self.realtime_ms = 0
+        self.running = False
+        self.trigger_time = None  # host time of first sample, None: not triggered yet
+        self.read_pos = 0         # samples read by host since trigger
+        self.lost_samples = 0     # samples overwritten before host read them
+        # per channel test signal: amplitude*sin(2*pi*frequency*t+phase)+dc, plus gaussian noise
+        self.signal_amplitude = np.ones(channel_count)
+        self.signal_frequency = np.arange(1, channel_count + 1, dtype=np.float64)
+        self.signal_phase = np.zeros(channel_count)
+        self.signal_dc = np.zeros(channel_count)
+        self.noise = 0.001
+        self.signal = None  # optional callable(t, channel_list) -> (len(t) x len(channel_list)) array
+
+    # sample generation
+    def generate(self, first_cycle, cycles):
+        """return (cycles x channels) data of cycle index first_cycle.. as device output"""
+        channels = np.asarray(self.channel_list, dtype=np.intp)
+        t = (first_cycle + np.arange(cycles)) / float(self.frequency)
+        if self.signal is not None:
+            data = np.asarray(self.signal(t, self.channel_list), dtype=np.float64).reshape(cycles, len(channels))
+        else:
+            phase = 2 * np.pi * np.outer(t, self.signal_frequency[channels]) + self.signal_phase[channels]
+            data = self.signal_amplitude[channels] * np.sin(phase) + self.signal_dc[channels]
+        if self.noise:
+            data = data + self.device.rng.normal(0.0, self.noise, data.shape)
+        data = data * self.gain[channels] + self.offset[channels]
+        for index, ch in enumerate(self.channel_list):
+            low, high = libdaq.CHANNEL_RANGE_LIMITS.get(self.channel_config[ch][0], (-10.0, 10.0))
+            np.clip(data[:, index], low, high, out=data[:, index])
+        return data
+
+    def available_samples(self, now):
+        """samples produced by device since trigger"""
+        if not self.running or self.trigger_time is None or now < self.trigger_time:
+            return 0
+        nch = len(self.channel_list)
+        pacing = self.device.sim.pacing
+        if pacing > 0:
+            cycles = int((now - self.trigger_time) * self.frequency * pacing)
+        else:
+            cycles = self.read_pos // nch + (1 << 40)  # as fast as reads are issued
+        if self.cycles > 0:
+            cycles = min(cycles, self.cycles)
+        return cycles * nch
+
+    def time_of_samples(self, samples):
+        """host time when samples are available"""
+        pacing = self.device.sim.pacing
+        if pacing <= 0 or self.trigger_time is None:
+            return 0.0
+        cycles = -(-samples // len(self.channel_list))
+        return self.trigger_time + cycles / (float(self.frequency) * pacing)
+
+    def read(self, buf, buflen, wait_until=None):
+        """copy available data to buf, wait for buflen data until host time wait_until"""
+        while True:
+            with self.device.lock:
+                now = time.perf_counter()
+                available = self.available_samples(now)
+                if self.device.sim.pacing > 0 and available - self.read_pos > SIM_ADC_BUFFER_SAMPLES:
+                    lost = available - self.read_pos - SIM_ADC_BUFFER_SAMPLES
+                    lost -= lost % len(self.channel_list)
+                    self.lost_samples += lost
+                    self.read_pos += lost
+                count = min(buflen, available - self.read_pos)
+                done = count >= buflen or wait_until is None or now >= wait_until or not self.running
+                if done or (self.cycles > 0 and available >= self.cycles * len(self.channel_list)):
+                    if count > 0:
+                        self.copy_out(buf, self.read_pos, count)
+                        self.read_pos += count
+                    return count
+                ready_at = self.time_of_samples(self.read_pos + buflen) if self.trigger_time is not None else wait_until
+            # short sleeps while not triggered, so a trigger during the wait is seen
+            time.sleep(max(0.0, min(ready_at, wait_until, now + 0.01) - now) + 1e-4)
+
+    def copy_out(self, buf, first_sample, count):
+        nch = len(self.channel_list)
+        first_cycle = first_sample // nch
+        last_cycle = -(-(first_sample + count) // nch)
+        data = self.generate(first_cycle, last_cycle - first_cycle).reshape(-1)
+        skip = first_sample - first_cycle * nch
+        ctypes.memmove(buf, data[skip:skip + count].ctypes.data, count * 8)
+
+
+class SimDac(object):
+    """simulated DAC module, keeps last uploaded wave and playback state"""
+
+    def __init__(self, device):
+        self.device = device
+        self.wave = np.zeros(0)
+        self.cycles = 0
+        self.frequency = 0.0
+        self.trigger_mode = libdaq.DAC_TRIGGER_MODE_AUTO
+        self.value = 0.0
+        self.start_time = None  # None: not playing
+        self.uploads = 0
+
+    def set_wavepara(self, wave, cycles, frequency, trigger_mode):
+        self.wave = np.array(wave, dtype=np.float64)
+        self.cycles = cycles
+        self.frequency = frequency
+        self.trigger_mode = trigger_mode
+        self.uploads += 1
+        self.start_time = time.perf_counter() if trigger_mode == libdaq.DAC_TRIGGER_MODE_AUTO else None
+
+    def playing(self, now=None):
+        if self.start_time is None:
+            return False
+        if self.cycles == 0 or self.frequency <= 0:
+            return True
+        now = time.perf_counter() if now is None else now
+        return (now - self.start_time) * self.frequency < self.cycles * len(self.wave)
+
+    def output(self, now=None):
+        """current output voltage"""
+        now = time.perf_counter() if now is None else now
+        if not self.playing(now) or len(self.wave) == 0:
+            return self.value
+        index = int((now - self.start_time) * self.frequency)
+        return float(self.wave[index % len(self.wave)])
+
+
+class SimGpio(object):
+    """simulated GPIO module, input pins can be driven by set_input() or input_function"""
+
+    def __init__(self, device, iomode, io_count=SIM_GPIO_COUNT):
+        self.device = device
+        self.io_count = io_count
+        self.iomode = iomode
+        self.config = [libdaq.IOCONF_IN if iomode == libdaq.IOMODE_IN else libdaq.IOCONF_OUT] * io_count
+        self.state = [0] * io_count
+        self.input_function = None  # optional callable(host_time) -> bitmask of input pins
+
+    def set_input(self, ioIndex, value):
+        self.state[ioIndex] = 1 if value else 0
+
+    def read(self):
+        if self.input_function is not None:
+            mask = int(self.input_function(time.perf_counter()))
+            return [(mask >> bit) & 1 for bit in range(self.io_count)]
+        return list(self.state)
+
+
+class SimDevice(object):
+    """simulated DAQ device, modules are created by name on first access (ADC, ADC1, DAC2, GPIOIN...)"""
+
+    def __init__(self, sim, name, seed=None):
+        self.sim = sim
+        self.name = name
+        self.hw_version = SIM_HW_VERSION
+        self.uid = libdaq.UID_OFF
+        self.lock = threading.RLock()
+        self.rng = np.random.default_rng(seed)
+        self.modules = {}
+
+    def module(self, module_name, kind):
+        module = self.modules.get(module_name)
+        if module is None:
+            if not module_name.startswith(kind):
+                return None
+            if kind == b'ADC':
+                module = SimAdc(self)
+            elif kind == b'DAC':
+                module = SimDac(self)
+            elif kind == b'GPIO':
+                module = SimGpio(self, libdaq.IOMODE_IN if module_name == b'GPIOIN' else libdaq.IOMODE_OUT)
+            self.modules[module_name] = module
+        return module if isinstance(module, _MODULE_CLASS[kind]) else None
+
+
+_MODULE_CLASS = {b'ADC': SimAdc, b'DAC': SimDac, b'GPIO': SimGpio}
+
+
+class SimulatedDaq(object):
+    """
+    python implementation of the libdaq C API on simulated devices,
+    pointer arguments are passed as integer address, return libdaq error code
+    """
+
+    def __init__(self, device_count=1, pacing=1.0, seed=None):
+        self.pacing = pacing
+        # hardware trigger of armed ADC fires this long (s) after start_task, None: wait for fire_hw_trigger()
+        self.hw_trigger_delay = 0.0
+        self.lock = threading.RLock()
+        self.seed = seed
+        self.devices = []
+        self.pending = []       # plugged or unplugged devices the driver sees after libdaq_scan_device
+        for index in range(device_count):
+            self.add_device(SIM_DEVICE_NAME % index)
+        self.option = libdaq.LIBDAQ_ACCESS_MODE_DEV_NAME_SN_BOTH
+        self.desc_buf = {}
+
+    # device plug/unplug for tests
+    def add_device(self, name):
+        with self.lock:
+            seed = None if self.seed is None else self.seed + len(self.devices)
+            device = SimDevice(self, name, seed)
+            self.devices.append(device)
+            return device
+
+    def remove_device(self, name):
+        with self.lock:
+            self.devices = [device for device in self.devices if device.name != name]
+
+    def plug_device(self, name):
+        """hot-plug: the device appears after the next libdaq_scan_device"""
+        with self.lock:
+            self.pending.append((self.add_device, name))
+
+    def unplug_device(self, name):
+        """hot-unplug: the device disappears after the next libdaq_scan_device"""
+        with self.lock:
+            self.pending.append((self.remove_device, name))
+
+    def device(self, device_name):
+        name = _str(device_name)
+        for device in self.devices:
+            if device.name == name:
+                return device
+        return None
+
+    def fire_hw_trigger(self, device_name=None):
+        """hardware trigger of armed ADC modules, all devices when device_name is None (shared trigger line)"""
+        now = time.perf_counter()
+        for device in list(self.devices):
+            if device_name is not None and device.name != device_name:
+                continue
+            with device.lock:
+                for module in device.modules.values():
+                    if isinstance(module, SimAdc) and module.running and module.trigger_time is None \
+                            and module.trigger_source != libdaq.ADC_TRIG_SRC_SW:
+                        module.trigger_time = now
+
+    def _module(self, device_name, module_name, kind):
+        device = self.device(device_name)
+        if device is None:
+            return None, libdaq.LIBDAQ_ERROR_NO_DEVICE
+        module = device.module(_str(module_name), kind)
+        if module is None:
+            return None, libdaq.LIBDAQ_ERROR_NO_MODULE
+        return module, libdaq.LIBDAQ_SUCCESS
+
+    # API for library
+    def libdaq_init(self):
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_exit(self):
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_scan_device(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+            for change, name in pending:
+                change(name)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_set_option(self, option):
+        self.option = option
+
+    def libdaq_get_version(self, major_ver, minor_ver, micro_ver):
+        for ptr, value in zip((major_ver, minor_ver, micro_ver), SIM_LIBRARY_VERSION):
+            ctypes.c_byte.from_address(ptr).value = value
+        return libdaq.LIBDAQ_SUCCESS
+
+    def _error_text(self, error_code, index):
+        text = _error_desc.get(error_code, _error_desc[libdaq.LIBDAQ_ERROR_OTHER])[index]
+        buf = self.desc_buf.get(text)
+        if buf is None:
+            buf = self.desc_buf[text] = ctypes.create_string_buffer(text)
+        return ctypes.addressof(buf)
+
+    def libdaq_get_error_desc(self, error_code):
+        return self._error_text(error_code, 1)
+
+    def libdaq_get_error_str(self, error_code):
+        return self._error_text(error_code, 0)
+
+    # API for devices
+    def libdaq_device_get_count(self):
+        return len(self.devices)
+
+    def libdaq_device_get_name(self, index, device_name, length):
+        if index >= len(self.devices):
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        name = self.devices[index].name[:max(length - 1, 0)]
+        ctypes.memmove(device_name, name + b'\0', len(name) + 1)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_device_rename_byindex(self, index, newname):
+        if index >= len(self.devices):
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        self.devices[index].name = _str(newname)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_device_rename_byname(self, device_name, newname):
+        device = self.device(device_name)
+        if device is None:
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        device.name = _str(newname)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_device_get_version(self, device_name, hw_version):
+        device = self.device(device_name)
+        if device is None:
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        version = libdaq.hw_version_c.from_address(hw_version)
+        (version.firmware_major, version.firmware_minor, version.firmware_micro,
+         version.pcb_ver, version.bom_ver) = device.hw_version
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_device_setUID_byindex(self, index, state):
+        if index >= len(self.devices):
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        self.devices[index].uid = state
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_device_setUID_byname(self, device_name, state):
+        device = self.device(device_name)
+        if device is None:
+            return libdaq.LIBDAQ_ERROR_NO_DEVICE
+        device.uid = state
+        return libdaq.LIBDAQ_SUCCESS
+
+    # API for GPIO
+    def libdaq_gpio_get_iocount(self, device_name, module_name, iocount):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            ctypes.c_ubyte.from_address(iocount).value = gpio.io_count
+        return errorcode
+
+    def libdaq_gpio_get_ioattrs(self, device_name, module_name, ioattr):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            for attr in (libdaq.ioattr_c * gpio.io_count).from_address(ioattr):
+                attr.iomode = gpio.iomode
+        return errorcode
+
+    def libdaq_gpio_get_config(self, device_name, module_name, confs):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            _read_array(confs, ctypes.c_int, gpio.io_count)[:] = gpio.config
+        return errorcode
+
+    def libdaq_gpio_set_config(self, device_name, module_name, confs):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            gpio.config = list(_read_array(confs, ctypes.c_int, gpio.io_count))
+        return errorcode
+
+    def libdaq_gpio_write_bit(self, device_name, module_name, ioIndex, BitVal):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is None:
+            return errorcode
+        if ioIndex >= gpio.io_count:
+            return libdaq.LIBDAQ_ERROR_GPIO_INDEX
+        gpio.state[ioIndex] = 1 if BitVal else 0
+        return errorcode
+
+    def libdaq_gpio_write_port(self, device_name, module_name, PortVal):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            gpio.state = [1 if value else 0 for value in _read_array(PortVal, ctypes.c_ubyte, gpio.io_count)]
+        return errorcode
+
+    def libdaq_gpio_read_bit(self, device_name, module_name, ioIndex, BitVal):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is None:
+            return errorcode
+        if ioIndex >= gpio.io_count:
+            return libdaq.LIBDAQ_ERROR_GPIO_INDEX
+        ctypes.c_ubyte.from_address(BitVal).value = gpio.read()[ioIndex]
+        return errorcode
+
+    def libdaq_gpio_read_port(self, device_name, module_name, PortVal):
+        gpio, errorcode = self._module(device_name, module_name, b'GPIO')
+        if gpio is not None:
+            _read_array(PortVal, ctypes.c_ubyte, gpio.io_count)[:] = gpio.read()
+        return errorcode
+
+    # API for DAC
+    def libdaq_dac_set_wavepara(self, device_name, module_name, wavepara):
+        dac, errorcode = self._module(device_name, module_name, b'DAC')
+        if dac is None:
+            return errorcode
+        para = libdaq.dac_wavepara_c.from_address(wavepara)
+        if para.buflen == 0 or not para.buf or para.frequency <= 0:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        wave = np.ctypeslib.as_array(para.buf, shape=(para.buflen,))
+        dac.set_wavepara(wave, para.cycles, para.frequency, para.trigger_mode)
+        return errorcode
+
+    def libdaq_dac_set_value(self, device_name, module_name, value):
+        dac, errorcode = self._module(device_name, module_name, b'DAC')
+        if dac is not None:
+            dac.value = value
+            dac.start_time = None
+        return errorcode
+
+    def libdaq_dac_start(self, device_name, module_name):
+        dac, errorcode = self._module(device_name, module_name, b'DAC')
+        if dac is not None:
+            dac.start_time = time.perf_counter()
+        return errorcode
+
+    def libdaq_dac_stop(self, device_name, module_name):
+        dac, errorcode = self._module(device_name, module_name, b'DAC')
+        if dac is not None:
+            dac.start_time = None
+        return errorcode
+
+    # API for ADC
+    def _config_channel(self, adc, channel, chrange, couplemode, refground):
+        if channel >= adc.channel_count or chrange not in libdaq.CHANNEL_RANGE_LIMITS:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        adc.channel_config[channel] = (chrange, couplemode, refground)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_adc_config_channel(self, device_name, module_name, adc_channelpara, channel_count):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        for para in (libdaq.adc_channelpara_c * channel_count).from_address(adc_channelpara):
+            errorcode = self._config_channel(adc, para.channel, para.range, para.couplemode, para.refground)
+            if errorcode != libdaq.LIBDAQ_SUCCESS:
+                break
+        return errorcode
+
+    def libdaq_adc_config_channel_ex(self, device_name, module_name, channel, chrange, couplemode, refground):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        return self._config_channel(adc, channel, chrange, couplemode, refground)
+
+    def libdaq_adc_calibrate_channel(self, device_name, module_name, channel, gain, offset):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        if channel == 0xFF:
+            adc.gain[:] = gain
+            adc.offset[:] = offset
+        elif channel < adc.channel_count:
+            adc.gain[channel] = gain
+            adc.offset[channel] = offset
+        else:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        return errorcode
+
+    def libdaq_adc_singleSample(self, device_name, module_name, channellist, listlen, resultbuf):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        channel_list = list(_read_array(channellist, ctypes.c_ubyte, listlen))
+        if not channel_list or max(channel_list) >= adc.channel_count:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        with adc.device.lock:
+            saved = adc.channel_list, adc.frequency
+            adc.channel_list, adc.frequency = channel_list, 1000
+            data = adc.generate(int(time.perf_counter() * 1000), 1).reshape(-1)
+            adc.channel_list, adc.frequency = saved
+        ctypes.memmove(resultbuf, data.ctypes.data, listlen * 8)
+        return errorcode
+
+    def _set_sample_parameter(self, adc, channel_list, sample_mode, frequency, cycles, group_interval):
+        if not channel_list or max(channel_list) >= adc.channel_count \
+                or frequency <= 0 or frequency > SIM_ADC_MAX_FREQUENCY:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        with adc.device.lock:
+            adc.channel_list = channel_list
+            adc.sample_mode = sample_mode
+            adc.frequency = frequency
+            adc.cycles = cycles
+            adc.group_interval = group_interval
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_adc_set_sample_parameter(self, device_name, module_name, samplepara):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        para = libdaq.adc_samplepara_c.from_address(samplepara)
+        channel_list = list(para.channel_list[0:para.channel_count]) if para.channel_list else []
+        return self._set_sample_parameter(adc, channel_list, para.sample_mode, para.frequency,
+                                          para.cycles, para.group_interval)
+
+    def libdaq_adc_set_sample_parameter_ex(self, device_name, module_name, channel_list, channel_count,
+                                           sample_mode, frequency, cycles, group_interval):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        channel_list = list(_read_array(channel_list, ctypes.c_ubyte, channel_count)) if channel_list else []
+        return self._set_sample_parameter(adc, channel_list, sample_mode, frequency, cycles, group_interval)
+
+    def libdaq_adc_clear_buffer(self, device_name, module_name):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is not None:
+            with adc.device.lock:
+                available = adc.available_samples(time.perf_counter())
+                adc.read_pos = max(adc.read_pos, available - available % len(adc.channel_list))
+        return errorcode
+
+    def libdaq_adc_read_analog(self, device_name, module_name, databuf, buflen, actuallen):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            _set_uint(actuallen, 0)
+            return errorcode
+        _set_uint(actuallen, adc.read(databuf, buflen))
+        return errorcode
+
+    def libdaq_adc_read_analog_sync(self, device_name, module_name, databuf, buflen, actuallen, timeout):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            _set_uint(actuallen, 0)
+            return errorcode
+        count = adc.read(databuf, buflen, time.perf_counter() + max(timeout, 0) / 1000.0)
+        _set_uint(actuallen, count)
+        if count < buflen:
+            return libdaq.LIBDAQ_ERROR_TIMEOUT
+        return errorcode
+
+    def libdaq_adc_send_trigger(self, device_name, module_name):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is not None:
+            with adc.device.lock:
+                if adc.running and adc.trigger_time is None and \
+                        adc.trigger_source in (libdaq.ADC_TRIG_SRC_SW, libdaq.ADC_TRIG_SRC_ANY):
+                    adc.trigger_time = time.perf_counter()
+        return errorcode
+
+    def libdaq_adc_stop(self, device_name, module_name):
+        return self.libdaq_adc_stop_task(device_name, module_name)
+
+    def libdaq_adc_start_task(self, device_name, module_name):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        with adc.device.lock:
+            adc.running = True
+            adc.trigger_time = None
+            adc.read_pos = 0
+            delay = self.hw_trigger_delay
+            if adc.trigger_source in (libdaq.ADC_TRIG_SRC_HWD, libdaq.ADC_TRIG_SRC_HWA) and delay is not None:
+                adc.trigger_time = time.perf_counter() + delay
+        return errorcode
+
+    def libdaq_adc_stop_task(self, device_name, module_name):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is not None:
+            with adc.device.lock:
+                adc.running = False
+        return errorcode
+
+    def libdaq_adc_config_triggerSrc(self, device_name, module_name, trigger_source, trigger_channel,
+                                     trigger_type, trigger_edge, trigger_level, trigger_delay):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is not None:
+            adc.trigger_config = (trigger_source, trigger_channel, trigger_type, trigger_edge,
+                                  trigger_level, trigger_delay)
+        return errorcode
+
+    def libdaq_adc_select_triggerSrc(self, device_name, module_name, trigger_source):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is None:
+            return errorcode
+        if trigger_source not in (libdaq.ADC_TRIG_SRC_SW, libdaq.ADC_TRIG_SRC_HWD,
+                                  libdaq.ADC_TRIG_SRC_HWA, libdaq.ADC_TRIG_SRC_ANY):
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        adc.trigger_source = trigger_source
+        return errorcode
+
+    def libdaq_adc_extractChannelData(self, all_databuf, all_datalen, ch_listlen, ch_index, ch_databuf):
+        if ch_listlen == 0 or ch_index >= ch_listlen:
+            return libdaq.LIBDAQ_ERROR_INVALID_PARAM
+        all_data = np.ctypeslib.as_array(_read_array(all_databuf, ctypes.c_double, all_datalen))
+        ch_data = np.ascontiguousarray(all_data[ch_index::ch_listlen])
+        ctypes.memmove(ch_databuf, ch_data.ctypes.data, ch_data.size * 8)
+        return libdaq.LIBDAQ_SUCCESS
+
+    def libdaq_adc_set_realtime(self, device_name, module_name, realtime_ms):
+        adc, errorcode = self._module(device_name, module_name, b'ADC')
+        if adc is not None:
+            adc.realtime_ms = realtime_ms
+        return errorcode
+
+
+def _callback_type(ctype):
+    """callback takes/returns pointer as integer address, so python code can write through it"""
+    if ctype is None:
+        return None
+    if ctype in (ctypes.c_char_p, ctypes.c_void_p) or issubclass(ctype, ctypes._Pointer):
+        return ctypes.c_void_p
+    return ctype
+
+
+class SimulatedDaqlib(object):
+    """
+    library object used in place of ctypes.CDLL('daqlib'),
+    attribute libdaq_xxx is a C function pointer calling SimulatedDaq.libdaq_xxx
+    """
+
+    def __init__(self, device_count=None, pacing=None, seed=None):
+        if device_count is None:
+            device_count = int(os.environ.get('LIBDAQ_SIM_DEVICES', '1'))
+        if pacing is None:
+            pacing = float(os.environ.get('LIBDAQ_SIM_PACING', '1'))
+        if seed is None and os.environ.get('LIBDAQ_SIM_SEED'):
+            seed = int(os.environ['LIBDAQ_SIM_SEED'])
+        self.daq = SimulatedDaq(device_count, pacing, seed)
+        self._functions = {}
+
+    def _function(self, name):
+        func = self._functions.get(name)
+        if func is None:
+            restype, argtypes = libdaq.LIBDAQ_PROTOTYPES[name]
+            impl = getattr(self.daq, name)
+            error = 0 if restype is ctypes.c_char_p else libdaq.LIBDAQ_ERROR_OTHER
+
+            def call(*args):
+                try:
+                    return impl(*args)
+                except Exception:  # an exception must not cross the C callback
+                    import traceback
+                    traceback.print_exc()
+                    return error if restype is not None else None
+
+            functype = ctypes.CFUNCTYPE(_callback_type(restype), *[_callback_type(t) for t in argtypes])
+            func = self._functions[name] = functype(call)
+        return func
+
+    def __getattr__(self, name):
+        if name.startswith('libdaq_') and name in libdaq.LIBDAQ_PROTOTYPES:
+            return self._function(name)
+        raise AttributeError(name)
+
+    def __getitem__(self, name):
+        """function without argtypes, same as ctypes.CDLL[name]"""
+        restype = libdaq.LIBDAQ_PROTOTYPES[name][0]
+        return ctypes.cast(self._function(name), ctypes.CFUNCTYPE(_callback_type(restype)))
+
+    @property
+    def pacing(self):
+        return self.daq.pacing
+
+    @pacing.setter
+    def pacing(self, value):
+        self.daq.pacing = value
+
+
+if __name__ == '__main__':
+    libdaq.libdaq_set_backend(SimulatedDaqlib(pacing=1.0, seed=1))
+    libdaq.libdaq_init()
+    (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    device = libdaq.DAQUSB401x(device_name)
+    samplepara = libdaq.adc_samplepara()
+    samplepara.channel_list = [0, 1, 2, 3]
+    samplepara.sample_mode = libdaq.ADC_SAMPLE_MODE_SYNC
+    samplepara.frequency = 200000
+    samplepara.cycles = 0
+    device.adc.set_sample_parameter(samplepara)
+    device.adc.start_task()
+    device.adc.send_trigger()
+    start = time.perf_counter()
+    total = 0
+    while time.perf_counter() - start < 1.0:
+        (errorcode, data) = device.adc.read_analog_sync(4 * 2000, 100, as_array=True)
+        total += len(data)
+    device.adc.stop_task()
+    elapsed = time.perf_counter() - start
+    print("%s: %d samples in %.3fs, %.0f Sa/s per channel" % (device_name, total, elapsed, total / 4 / elapsed))
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  continuous ADC streaming on top of libdaq_adc
+
+  the ADC runs in continuous mode (cycles=0), a reader thread drains the device
+  into a preallocated ring buffer with zero-copy reads, consumers take fixed-size
+  blocks from the ring:
+
+      stream = libdaq_stream.AdcStream(device.adc, [0, 1, 2, 3], 200000, block_cycles=20000)
+      with stream:
+          for block in stream.blocks(50):
+              process(block.data)      # channels x block_cycles array
+
+  when a consumer falls more than the ring length behind, the oldest blocks are
+  skipped and counted in StreamBlock.dropped and stats()
+
+  DacStream plays waves of any length, e.g. a recorded profile in a numpy.memmap
+  or a generator, in chunks uploaded by a background thread, so the wave is never held in memory at once:
+
+      with libdaq_stream.DacStream(device.dac, np.load('sea_state.npy', mmap_mode='r'), 10000) as player:
+          player.wait()
+'''
+
+import collections
+import threading
+import time
+import numpy as np
+import libdaq
+
+# data: channels x cycles float64 array, start_cycle: index of first cycle since stream start,
+# timestamp: host time.perf_counter() of first cycle (estimated from first data with hardware trigger), dropped: samples skipped before this block
+StreamBlock = collections.namedtuple('StreamBlock', ['data', 'start_cycle', 'timestamp', 'dropped'])
+
+
+class AdcStream(object):
+    def __init__(self, adc, channel_list, frequency, block_cycles=1000, buffer_seconds=2.0,
+                 read_cycles=None, sample_mode=libdaq.ADC_SAMPLE_MODE_SYNC,
+                 trigger_source=libdaq.ADC_TRIG_SRC_SW, realtime_ms=None):
+        """
+        Args:
+            adc: libdaq_adc of the device, e.g. DAQUSB401x(name).adc
+            channel_list: sampled channel list
+            frequency: sample rate of each channel (Hz)
+            block_cycles: cycles in each block handed to consumers
+            buffer_seconds: ring length in seconds of data, rounded up to whole blocks
+            read_cycles: cycles in each device read of the reader thread, default block_cycles
+            sample_mode: ADC_SAMPLE_MODE_SYNC or ADC_SAMPLE_MODE_SEQUENCE
+            trigger_source: ADC_TRIG_SRC_SW send trigger on start(), others wait for the hardware trigger
+            realtime_ms: optional driver realtime setting passed to adc.set_realtime()
+        Raises: ValueError
+        """
+        if len(channel_list) == 0:
+            raise ValueError("channel_list must not be empty")
+        if frequency <= 0 or block_cycles <= 0:
+            raise ValueError("frequency and block_cycles must be positive")
+
+        self.adc = adc
+        self.channel_list = list(channel_list)
+        self.channel_count = len(self.channel_list)
+        self.frequency = frequency
+        self.block_cycles = block_cycles
+        self.read_cycles = read_cycles or block_cycles
+        self.sample_mode = sample_mode
+        self.trigger_source = trigger_source
+        self.realtime_ms = realtime_ms
+
+        self.block_samples = block_cycles*self.channel_count
+        blocks = max(2, -(-int(buffer_seconds*frequency) // block_cycles))
+        self.ring = np.zeros(blocks*self.block_samples, dtype=np.float64)
+        self.read_samples = min(self.read_cycles*self.channel_count, self.ring.size)
+        # read timeout: twice the time the device needs for one read, at least 100 ms
+        self.read_timeout = max(100, int(2000.0*self.read_cycles/frequency))
+
+        self.__cond = threading.Condition()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__written = 0    # samples written to ring since start
+        self.__reserved = 0   # end of ring region the driver may be writing into
+        self.__read_pos = 0   # next sample of consumer
+        self.__reset_counters()
+
+    def __reset_counters(self):
+        self.start_time = None
+        self.dropped_samples = 0
+        self.overruns = 0
+        self.reads = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.last_error = libdaq.LIBDAQ_SUCCESS
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        """
+        configure continuous sampling, start ADC task and reader thread, send software trigger
+        Returns: errorcode of the first failing libdaq call, LIBDAQ_SUCCESS when started
+        """
+        if self.running:
+            return libdaq.LIBDAQ_SUCCESS
+        errorcode = self.arm()
+        if errorcode == libdaq.LIBDAQ_SUCCESS and self.trigger_source == libdaq.ADC_TRIG_SRC_SW:
+            errorcode = self.trigger()
+            if errorcode != libdaq.LIBDAQ_SUCCESS:
+                self.stop()
+        return errorcode
+
+    def arm(self):
+        """
+        configure continuous sampling, start ADC task and reader thread, sampling begins on trigger
+        Returns: errorcode of the first failing libdaq call, LIBDAQ_SUCCESS when armed
+        """
+        if self.running:
+            return libdaq.LIBDAQ_SUCCESS
+        libdaq.libdaq_access_begin()  # no access mode switch while the device is used by name
+        adc = self.adc
+        errorcode = adc.set_sample_parameter_ex(self.channel_list, self.sample_mode, self.frequency, 0, 0)
+        if errorcode == libdaq.LIBDAQ_SUCCESS:
+            errorcode = adc.select_triggerSrc(self.trigger_source)
+        if errorcode == libdaq.LIBDAQ_SUCCESS and self.realtime_ms is not None:
+            errorcode = adc.set_realtime(self.realtime_ms)
+        if errorcode == libdaq.LIBDAQ_SUCCESS:
+            adc.clear_buffer()
+            errorcode = adc.start_task()
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            libdaq.libdaq_access_end()
+            return errorcode
+
+        with self.__cond:
+            self.__written = self.__reserved = self.__read_pos = 0
+            self.__reset_counters()
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, name='AdcStream', daemon=True)
+        self.__thread.start()
+        return libdaq.LIBDAQ_SUCCESS
+
+    def trigger(self):
+        """
+        send software trigger to armed stream, start_time is taken right after the trigger
+        Returns: errorcode
+        """
+        errorcode = self.adc.send_trigger()
+        if errorcode == libdaq.LIBDAQ_SUCCESS:
+            self.start_time = time.perf_counter()
+        return errorcode
+
+    def stop(self):
+        """stop reader thread and ADC task, blocks already in the ring can still be read"""
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+            self.adc.stop_task()
+        with self.__cond:
+            self.__cond.notify_all()
+
+    def __enter__(self):
+        errorcode = self.start()
+        if errorcode != libdaq.LIBDAQ_SUCCESS:
+            raise RuntimeError("start ADC stream failed, errorcode %d" % errorcode)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __run(self):
+        try:
+            self.__reader()
+        finally:
+            libdaq.libdaq_access_end()
+
+    def __reader(self):
+        ring = self.ring
+        size = ring.size
+        while not self.__stop_event.is_set():
+            with self.__cond:
+                offset = self.__written % size
+                count = min(self.read_samples, size - offset)
+                self.__reserved = self.__written + count
+            errorcode, data = self.adc.read_analog_sync(count, self.read_timeout, out=ring[offset:offset+count])
+            self.reads += 1
+            if errorcode == libdaq.LIBDAQ_ERROR_TIMEOUT:
+                self.timeouts += 1
+            elif errorcode != libdaq.LIBDAQ_SUCCESS:
+                self.errors += 1
+                self.last_error = errorcode
+                if errorcode == libdaq.LIBDAQ_ERROR_NO_DEVICE:
+                    break
+                self.__stop_event.wait(0.01)  # do not spin on a failing device
+            if len(data) > 0:
+                with self.__cond:
+                    if self.start_time is None:
+                        # hardware trigger: estimate trigger time from the first data
+                        self.start_time = time.perf_counter() - (len(data)//self.channel_count)/float(self.frequency)
+                    self.__written += len(data)
+                    self.__reserved = self.__written
+                    self.__cond.notify_all()
+        with self.__cond:
+            self.__reserved = self.__written
+            self.__cond.notify_all()
+
+    def __skip_overrun(self):
+        # called with lock held: blocks the driver may have overwritten are dropped
+        oldest = self.__reserved - self.ring.size
+        if self.__read_pos < oldest:
+            skip_to = -(-oldest // self.block_samples)*self.block_samples
+            self.dropped_samples += skip_to - self.__read_pos
+            self.overruns += 1
+            self.__read_pos = skip_to
+
+    def read(self, timeout=None):
+        """
+        get next block, wait until it is complete
+        Args: timeout: max wait in seconds, None wait until block is ready or stream stopped
+        Returns: StreamBlock, or None on timeout or when stream stopped and ring is drained
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.__cond:
+            dropped = self.dropped_samples
+            while True:
+                self.__skip_overrun()
+                if self.__written - self.__read_pos >= self.block_samples:
+                    break
+                if not self.running:
+                    return None
+                wait = None if deadline is None else deadline - time.perf_counter()
+                if wait is not None and wait <= 0:
+                    return None
+                self.__cond.wait(wait)
+            start = self.__read_pos
+            offset = start % self.ring.size
+            block = self.ring[offset:offset+self.block_samples].reshape(self.block_cycles, self.channel_count)
+            data = np.ascontiguousarray(block.T)
+            self.__read_pos += self.block_samples
+            dropped = self.dropped_samples - dropped
+        start_cycle = start//self.channel_count
+        return StreamBlock(data, start_cycle, self.start_time + start_cycle/float(self.frequency), dropped)
+
+    def blocks(self, count=None, timeout=None):
+        """
+        iterate over blocks until count blocks are read, read() times out or stream stopped
+        Args: count: number of blocks, None no limit
+              timeout: max wait of each block in seconds
+        Returns: generator of StreamBlock
+        """
+        n = 0
+        while count is None or n < count:
+            block = self.read(timeout)
+            if block is None:
+                return
+            n += 1
+            yield block
+
+    def __iter__(self):
+        return self.blocks()
+
+    def latest(self, cycles):
+        """
+        copy of the newest data in the ring, does not move the block read position
+        Args: cycles: cycles to return, at most the ring length
+        Returns: channels x n float64 array, n <= cycles
+        """
+        with self.__cond:
+            end = self.__written - self.__written % self.channel_count
+            oldest = max(0, self.__reserved - self.ring.size)
+            count = min(cycles, (end - oldest)//self.channel_count)*self.channel_count
+            index = np.arange(end - count, end) % self.ring.size
+            data = self.ring[index]
+        return data.reshape(-1, self.channel_count).T.copy()
+
+    def stats(self):
+        """
+        stream counters
+        Returns: dict with cycles (read from device), rate (achieved cycles/s of each channel),
+                 pending (samples not yet taken by read()), dropped (samples skipped by overrun),
+                 overruns, reads, timeouts, errors, last_error
+        """
+        with self.__cond:
+            written = self.__written
+            pending = written - self.__read_pos
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        cycles = written//self.channel_count
+        return {'cycles': cycles, 'rate': cycles/elapsed if elapsed > 0 else 0.0,
+                'pending': pending, 'dropped': self.dropped_samples, 'overruns': self.overruns,
+                'reads': self.reads, 'timeouts': self.timeouts, 'errors': self.errors,
+                'last_error': self.last_error}
+
+
+
+class DacStream(object):
+    def __init__(self, dac, source, frequency, chunk_points=None):
+        """
+        Args:
+            dac: libdaq_dac of the device
+            source: wave data, numpy.ndarray (numpy.memmap is read chunk by chunk), list,
+                    or iterable of values or arrays, e.g. a generator
+            frequency: DAC output rate (Hz)
+            chunk_points: points of each upload, default 0.5 s of data, at most DAC_MAX_WAVE_POINTS
+        Raises: ValueError
+        """
+        if frequency <= 0:
+            raise ValueError("frequency must be positive")
+        if chunk_points is None:
+            chunk_points = int(frequency*0.5)
+        self.chunk_points = max(1, min(int(chunk_points), libdaq.DAC_MAX_WAVE_POINTS))
+        self.dac = dac
+        self.source = source
+        self.frequency = float(frequency)
+        # two chunk buffers: one is on the device while the next one is filled
+        self.buffers = [np.zeros(self.chunk_points, dtype=np.float64) for i in range(2)]
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.chunks = 0
+        self.points = 0
+        self.underruns = 0       # chunks started later than the end of the previous chunk
+        self.gap_time = 0.0      # total output gap of underruns (s)
+        self.upload_time = 0.0   # total upload time (s)
+        self.errors = 0
+        self.last_error = libdaq.LIBDAQ_SUCCESS
+        self.finished = False
+
+    def __chunks(self):
+        # fill the two buffers alternately, yield filled part
+        index = 0
+        if isinstance(self.source, np.ndarray):
+            source = self.source.reshape(-1)
+            for start in range(0, source.size, self.chunk_points):
+                part = source[start:start+self.chunk_points]
+                buf = self.buffers[index][0:part.size]
+                buf[:] = part
+                index ^= 1
+                yield buf
+            return
+
+        buf = self.buffers[index]
+        fill = 0
+        for item in self.source:
+            values = np.asarray(item, dtype=np.float64).reshape(-1)
+            while values.size:
+                count = min(values.size, self.chunk_points - fill)
+                buf[fill:fill+count] = values[0:count]
+                values = values[count:]
+                fill += count
+                if fill == self.chunk_points:
+                    yield buf
+                    index ^= 1
+                    buf = self.buffers[index]
+                    fill = 0
+        if fill:
+            yield buf[0:fill]
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.__stop_event.clear()
+        self.finished = False
+        libdaq.libdaq_access_begin()  # no access mode switch while the device is used by name
+        self.__thread = threading.Thread(target=self.__run, name='DacStream', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """stop playback and DAC output"""
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.dac.stop()
+
+    def wait(self, timeout=None):
+        """
+        wait until the whole source is played
+        Returns: True when finished
+        """
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+        return self.finished
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __run(self):
+        try:
+            self.__player()
+        finally:
+            libdaq.libdaq_access_end()
+
+    def __player(self):
+        chunks = self.__chunks()
+        end_time = None   # host time the chunk on the device finishes
+        lead = 0.0        # upload latency estimate, next upload starts this early
+        chunk = next(chunks, None)
+        while chunk is not None and not self.__stop_event.is_set():
+            if end_time is not None and self.__stop_event.wait(max(0.0, end_time - lead - time.perf_counter())):
+                break
+            start = time.perf_counter()
+            errorcode = self.dac.write_wave(chunk, 1, self.frequency, libdaq.DAC_TRIGGER_MODE_AUTO)
+            now = time.perf_counter()
+            if errorcode != libdaq.LIBDAQ_SUCCESS:
+                self.errors += 1
+                self.last_error = errorcode
+                if errorcode == libdaq.LIBDAQ_ERROR_NO_DEVICE:
+                    break
+            upload = now - start
+            self.upload_time += upload
+            lead = upload if self.chunks == 0 else 0.8*lead + 0.2*upload
+            if end_time is not None and now - end_time > 1.0/self.frequency:
+                self.underruns += 1
+                self.gap_time += now - end_time
+            self.chunks += 1
+            self.points += chunk.size
+            end_time = now + chunk.size/self.frequency
+            # prepare the next chunk while this one plays
+            chunk = next(chunks, None)
+        else:
+            if end_time is not None:
+                self.__stop_event.wait(max(0.0, end_time - time.perf_counter()))
+            self.finished = not self.__stop_event.is_set()
+
+    def stats(self):
+        """
+        playback counters
+        Returns: dict with chunks, points, seconds (played wave time), underruns, gap_ms,
+                 upload_ms (mean upload time), errors, last_error, finished
+        """
+        return {'chunks': self.chunks, 'points': self.points, 'seconds': self.points/self.frequency,
+                'underruns': self.underruns, 'gap_ms': self.gap_time*1000.0,
+                'upload_ms': self.upload_time*1000.0/self.chunks if self.chunks else 0.0,
+                'errors': self.errors, 'last_error': self.last_error, 'finished': self.finished}
+
+if __name__ == '__main__':
+    import sys
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    libdaq.libdaq_init()
+    if libdaq.libdaq_device_get_count() < 1:
+        raise Exception("No device detected!")
+    (errorcode, device_name) = libdaq.libdaq_device_get_name(0)
+    device = libdaq.DAQUSB401x(device_name)
+
+    channel_list = [0, 1, 2, 3]
+    frequency = 200000
+    stream = AdcStream(device.adc, channel_list, frequency, block_cycles=frequency//10)
+    with stream:
+        start = time.perf_counter()
+        for block in stream.blocks(timeout=2.0):
+            if time.perf_counter() - start >= seconds:
+                break
+            if block.dropped:
+                print("overrun, %d samples dropped" % block.dropped)
+        stats = stream.stats()
+    print("%s: %d cycles, %.0f Sa/s per channel, %d dropped, %d timeouts, %d errors" %
+          (device_name, stats['cycles'], stats['rate'], stats['dropped'], stats['timeouts'], stats['errors']))
+    libdaq.libdaq_exit()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+  DAC waveform synthesis
+
+  every function builds the whole buffer in one vectorized numpy call, clips it to the
+  DAC output range and returns a read-only float64 array that can be passed to
+  libdaq_dac.set_wavepara_ex directly. results are memoized per parameter set, so
+  selecting the same profile again costs neither synthesis nor (libdaq_dac skips a wave
+  already on the device) a device upload, the array is uploaded without copy:
+
+      wave = libdaq_waveform.sine(100, 10000, amplitude=1.0, offset=1.2)   # 100 points per period
+      device.dac.set_wavepara_ex(wave, 0, 10000, libdaq.DAC_TRIGGER_MODE_AUTO)
+
+  periodic waves (sine, square, triangle, sawtooth) hold whole periods, use cycles=0 to repeat them;
+  when a period is not a whole number of points (sine(3, 10)), periods is raised to the smallest
+  multiple that is, so the repeated buffer has no phase jump (sine(3, 10) holds 3 periods, 10 points);
+  when that needs more than MAX_PERIODIC_POINTS, the shortest buffer of whole periods within
+  FREQUENCY_TOLERANCE of frequency is used instead (exact=True raises ValueError), periods
+  longer than MAX_PERIODIC_POINTS are rounded to whole points
+'''
+
+import fractions
+import functools
+import math
+import numpy as np
+import libdaq
+
+CACHE_SIZE = 128
+MAX_PERIODIC_POINTS = 1 << 22   # longest buffer periods may be raised to for whole periods
+FREQUENCY_TOLERANCE = 1e-6      # relative frequency error accepted when exact whole periods are too long
+
+
+def _points(frequency, sample_rate, periods):
+    if frequency <= 0 or sample_rate <= 0 or periods <= 0:
+        raise ValueError("frequency, sample_rate and periods must be positive")
+    points = int(round(periods*sample_rate/float(frequency)))
+    if points < 2:
+        raise ValueError("less than 2 points, sample_rate too low for frequency")
+    return points
+
+
+def _periodic_points(frequency, sample_rate, periods, exact):
+    # (points, periods) of the buffer: the smallest multiple of periods that is a whole number of points,
+    # or when that is longer than MAX_PERIODIC_POINTS the shortest one within FREQUENCY_TOLERANCE
+    if frequency <= 0 or sample_rate <= 0 or periods <= 0 or periods != int(periods):
+        raise ValueError("frequency and sample_rate must be positive, periods a positive integer")
+    periods = int(periods)
+    ratio = (fractions.Fraction(sample_rate).limit_denominator(1000000) /
+             fractions.Fraction(frequency).limit_denominator(1000000))    # points per period
+    whole = periods*ratio.denominator//math.gcd(periods, ratio.denominator)
+    points = whole*ratio
+    if points > MAX_PERIODIC_POINTS:
+        if exact:
+            raise ValueError("whole periods need %d points, more than %d, choose a frequency dividing sample_rate"
+                             % (points, MAX_PERIODIC_POINTS))
+        target = 1/(periods*ratio)     # buffers of periods per point
+        limit = 2
+        while True:
+            approx = target.limit_denominator(limit)
+            if limit >= MAX_PERIODIC_POINTS or \
+                    (approx.numerator and abs(approx - target) <= FREQUENCY_TOLERANCE*target):
+                break
+            limit = min(2*limit, MAX_PERIODIC_POINTS)
+        if approx.numerator:
+            whole, points = periods*approx.numerator, approx.denominator
+        else:
+            whole, points = periods, round(periods*ratio)   # periods alone are longer than the limit
+    if points < 2:
+        raise ValueError("less than 2 points, sample_rate too low for frequency")
+    return int(points), whole
+
+
+def _finish(wave, limits):
+    if limits is not None:
+        np.clip(wave, limits[0], limits[1], out=wave)
+    wave.setflags(write=False)
+    return wave
+
+
+def _cycle_phase(frequency, sample_rate, periods, phase, exact):
+    # phase of each point in cycles, 0 <= x < 1, the buffer holds whole periods
+    points, periods = _periodic_points(frequency, sample_rate, periods, exact)
+    x = np.arange(points, dtype=np.float64)*(periods/float(points)) + phase/(2*np.pi)
+    return x - np.floor(x)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def sine(frequency, sample_rate, amplitude=1.0, offset=0.0, phase=0.0, periods=1,
+         limits=libdaq.DAC_OUTPUT_RANGE, exact=False):
+    """
+    sine wave amplitude*sin(2*pi*frequency*t+phase)+offset
+    Args:
+        frequency: wave frequency (Hz)
+        sample_rate: DAC update rate (Hz), the frequency argument of set_wavepara_ex
+        amplitude, offset: in V
+        phase: start phase in rad
+        periods: number of whole periods in the buffer, raised to the smallest multiple that is a whole
+                 number of points when sample_rate/frequency is not an integer
+        limits: (min, max) output is clipped to, None no clipping
+        exact: True raise ValueError when whole periods need more than MAX_PERIODIC_POINTS points,
+               False use the shortest buffer of whole periods within FREQUENCY_TOLERANCE of frequency
+    Returns: read-only float64 ndarray
+    Raises: ValueError
+    """
+    x = _cycle_phase(frequency, sample_rate, periods, phase, exact)
+    return _finish(amplitude*np.sin(2*np.pi*x) + offset, limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def square(frequency, sample_rate, amplitude=1.0, offset=0.0, duty=0.5, phase=0.0, periods=1,
+           limits=libdaq.DAC_OUTPUT_RANGE, exact=False):
+    """
+    square wave between offset-amplitude and offset+amplitude, high for duty part of each period
+    Args: as sine, duty: 0..1
+    Returns: read-only float64 ndarray
+    """
+    x = _cycle_phase(frequency, sample_rate, periods, phase, exact)
+    return _finish(np.where(x < duty, amplitude, -amplitude) + float(offset), limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def triangle(frequency, sample_rate, amplitude=1.0, offset=0.0, phase=0.0, periods=1,
+             limits=libdaq.DAC_OUTPUT_RANGE, exact=False):
+    """
+    triangle wave starting at offset-amplitude, peak at half period
+    Args: as sine
+    Returns: read-only float64 ndarray
+    """
+    x = _cycle_phase(frequency, sample_rate, periods, phase, exact)
+    return _finish(amplitude*(1.0 - 4.0*np.abs(x - 0.5)) + offset, limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def sawtooth(frequency, sample_rate, amplitude=1.0, offset=0.0, phase=0.0, periods=1, rising=True,
+             limits=libdaq.DAC_OUTPUT_RANGE, exact=False):
+    """
+    sawtooth wave from offset-amplitude to offset+amplitude, falling when rising is False
+    Args: as sine
+    Returns: read-only float64 ndarray
+    """
+    x = _cycle_phase(frequency, sample_rate, periods, phase, exact)
+    ramp = 2.0*x - 1.0
+    return _finish(amplitude*(ramp if rising else -ramp) + offset, limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def chirp(f0, f1, duration, sample_rate, amplitude=1.0, offset=0.0, phase=0.0, method='linear',
+          limits=libdaq.DAC_OUTPUT_RANGE):
+    """
+    frequency sweep from f0 to f1 in duration seconds
+    Args:
+        f0, f1: start and end frequency (Hz)
+        duration: sweep time (s)
+        method: 'linear' or 'exponential' (f0 and f1 must be positive)
+        others as sine
+    Returns: read-only float64 ndarray
+    Raises: ValueError
+    """
+    points = _points(1.0/duration, sample_rate, 1)
+    t = np.arange(points, dtype=np.float64)/sample_rate
+    if method == 'linear':
+        angle = 2*np.pi*(f0*t + (f1 - f0)/(2.0*duration)*t*t)
+    elif method == 'exponential':
+        if f0 <= 0 or f1 <= 0:
+            raise ValueError("exponential chirp needs positive f0 and f1")
+        if f0 == f1:
+            angle = 2*np.pi*f0*t
+        else:
+            k = np.log(f1/float(f0))/duration
+            angle = 2*np.pi*f0*np.expm1(k*t)/k
+    else:
+        raise ValueError("method must be 'linear' or 'exponential'")
+    return _finish(amplitude*np.sin(angle + phase) + offset, limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _multisine(frequencies, duration, sample_rate, amplitudes, phases, offset, limits):
+    points = _points(1.0/duration, sample_rate, 1)
+    t = np.arange(points, dtype=np.float64)/sample_rate
+    f = np.asarray(frequencies, dtype=np.float64)
+    a = np.ones(f.size) if amplitudes is None else np.asarray(amplitudes, dtype=np.float64)
+    if phases is None:
+        # Schroeder phases keep the crest factor low
+        k = np.arange(1, f.size + 1)
+        p = -np.pi*k*(k - 1)/f.size
+    else:
+        p = np.asarray(phases, dtype=np.float64)
+    if a.size != f.size or p.size != f.size:
+        raise ValueError("amplitudes and phases must have one value per frequency")
+    return _finish(np.sin(np.outer(t, 2*np.pi*f) + p) @ a + offset, limits)
+
+
+def multisine(frequencies, duration, sample_rate, amplitudes=None, phases=None, offset=0.0,
+              limits=libdaq.DAC_OUTPUT_RANGE):
+    """
+    sum of sine waves
+    Args:
+        frequencies: list of frequencies (Hz)
+        duration: buffer length (s), repeats seamlessly when every frequency is a multiple of 1/duration
+        amplitudes: list of amplitudes (V), default 1.0 each
+        phases: list of phases (rad), default Schroeder phases
+        others as sine
+    Returns: read-only float64 ndarray
+    Raises: ValueError
+    """
+    return _multisine(tuple(frequencies), duration, sample_rate,
+                      None if amplitudes is None else tuple(amplitudes),
+                      None if phases is None else tuple(phases), offset, limits)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _piecewise(points, sample_rate, kind, limits):
+    t, value = np.asarray(points, dtype=np.float64).reshape(-1, 2).T
+    if t.size < 2 or np.any(np.diff(t) < 0):
+        raise ValueError("points need at least 2 (time, value) pairs in time order")
+    n = _points(1.0/(t[-1] - t[0]), sample_rate, 1) if t[-1] > t[0] else 1
+    x = t[0] + np.arange(n, dtype=np.float64)/sample_rate
+    if kind == 'linear':
+        wave = np.interp(x, t, value)
+    elif kind == 'step':
+        wave = value[np.searchsorted(t, x, side='right') - 1]
+    else:
+        raise ValueError("kind must be 'linear' or 'step'")
+    return _finish(wave, limits)
+
+
+def piecewise(points, sample_rate, kind='linear', limits=libdaq.DAC_OUTPUT_RANGE):
+    """
+    arbitrary profile through (time, value) points, e.g. a motion profile
+    Args:
+        points: list of (time s, value V) in time order
+        sample_rate: DAC update rate (Hz)
+        kind: 'linear' interpolate between points, 'step' hold each value until the next point
+        limits: as sine
+    Returns: read-only float64 ndarray covering points[0] time to points[-1] time
+    Raises: ValueError
+    """
+    return _piecewise(tuple((float(t), float(v)) for t, v in points), sample_rate, kind, limits)
+
+
+def clear_cache():
+    """free all memoized waves"""
+    for func in (sine, square, triangle, sawtooth, chirp, _multisine, _piecewise):
+        func.cache_clear()